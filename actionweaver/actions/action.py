@@ -1,12 +1,15 @@
 from __future__ import annotations
 
 import logging
+import time
 from typing import Any, Callable, Dict, List, Optional
 
 from openai import AzureOpenAI, OpenAI
 
-from actionweaver.telemetry import traceable
+from actionweaver.telemetry import get_current_tracer, start_span, traceable
+from actionweaver.telemetry.metrics import ACTION_DURATION, ACTION_ERRORS
 from actionweaver.utils import DEFAULT_ACTION_SCOPE
+from actionweaver.utils.schema import compact_model_schema
 
 
 class ActionException(Exception):
@@ -58,7 +61,13 @@ class Action:
         self.__annotations__ = self.function.__annotations__
         self.__doc__ = self.function.__doc__
 
-    def json_schema(self):
+    def json_schema(self, compact: bool = False):
+        """JSON schema of the action's parameters, see `compact_schema` for `compact`.
+
+        The compact schema is computed once per pydantic model, don't mutate it.
+        """
+        if compact:
+            return compact_model_schema(self.pydantic_model)
         return self.pydantic_model.model_json_schema()
 
     def invoke(
@@ -113,9 +122,22 @@ class Action:
         )
 
     def __call__(self, *args: Any, **kwargs: Any) -> Any:
-        response = self.function(*args, **kwargs)
-
-        return response
+        started = time.perf_counter()
+        try:
+            if get_current_tracer() is None:
+                return self.function(*args, **kwargs)
+
+            with start_span(
+                "actionweaver.action", {"actionweaver.action.name": self.name}
+            ):
+                response = self.function(*args, **kwargs)
+
+            return response
+        except Exception:
+            ACTION_ERRORS.inc(action=self.name)
+            raise
+        finally:
+            ACTION_DURATION.observe(time.perf_counter() - started, action=self.name)
 
     def __get__(self, instance, owner) -> InstanceAction:
         """
@@ -158,9 +180,7 @@ class InstanceAction(Action):
         self.pydantic_model = pydantic_model
 
     def __call__(self, *args: Any, **kwargs: Any) -> Any:
-        response = self.function(self.instance, *args, **kwargs)
-
-        return response
+        return super().__call__(self.instance, *args, **kwargs)
 
 
 class ActionHandlers:
@@ -4,6 +4,7 @@ from typing import List
 from actionweaver.actions import Action
 from actionweaver.actions.factories.function import action
 from actionweaver.utils.pydantic_utils import create_pydantic_model_from_func
+from actionweaver.utils.schema import FlatSchemaModel
 
 
 def combine(
@@ -50,6 +51,9 @@ def combine(
     return action(
         name=name.title(),
         pydantic_model=create_pydantic_model_from_func(
-            func.__name__.title(), func, override_params=params
+            func.__name__.title(),
+            func,
+            base_model=FlatSchemaModel,
+            override_params=params,
         ),
     )(func)
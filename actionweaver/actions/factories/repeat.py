@@ -3,6 +3,7 @@ from typing import List
 from actionweaver.actions import Action
 from actionweaver.actions.factories.function import action
 from actionweaver.utils.pydantic_utils import create_pydantic_model_from_func
+from actionweaver.utils.schema import FlatSchemaModel
 
 
 def repeat(
@@ -51,6 +52,7 @@ def repeat(
         pydantic_model=create_pydantic_model_from_func(
             func.__name__.title(),
             func,
+            base_model=FlatSchemaModel,
             override_params={act.name: (List[act.pydantic_model], ...)},
         ),
         stop=act.stop,
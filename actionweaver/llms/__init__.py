@@ -1,3 +1,4 @@
+from .conversation import Conversation
 from .exception_handler import (
     ChatLoopInfo,
     Continue,
@@ -6,5 +7,26 @@ from .exception_handler import (
     Return,
     Unknown,
 )
+from .hedging import HedgingPolicy
+from .history import (
+    HistoryPolicy,
+    SlidingWindowPolicy,
+    SummarizationPolicy,
+    TokenBudgetPolicy,
+    summarizer_from_client,
+)
+from .hooks import ChatLoopHooks, CompositeHooks
+from .loop_guard import LoopGuard, LoopLimitException
 from .patch import patch
+from .session_store import Session, SessionStore
+from .tool_output import (
+    HeadTailTruncation,
+    OutputLimit,
+    OutputLimiter,
+    OutputStore,
+    OutputStrategy,
+    SpillToStore,
+    StructuredSummary,
+)
+from .tool_selection import BM25ToolSelector, EmbeddingToolSelector, ToolSelector
 from .wrapper import wrap
@@ -11,7 +11,7 @@ class Functions:
         self.function_call = function_call
 
     @classmethod
-    def from_expr(cls, expr):
+    def from_expr(cls, expr, compact_schema: bool = False):
         if expr is None:
             return cls()
         elif isinstance(expr, Action):
@@ -21,7 +21,7 @@ class Functions:
                     {
                         "name": expr.name,
                         "description": expr.description,
-                        "parameters": expr.json_schema(),
+                        "parameters": expr.json_schema(compact_schema),
                     }
                 ],
             )
@@ -31,7 +31,7 @@ class Functions:
                     {
                         "name": action.name,
                         "description": action.description,
-                        "parameters": action.json_schema(),
+                        "parameters": action.json_schema(compact_schema),
                     }
                     for action in expr
                 ],
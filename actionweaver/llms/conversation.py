@@ -0,0 +1,83 @@
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Union
+
+
+def to_wire_message(message) -> Dict[str, Any]:
+    """Return a chat message in the format sent to the API, OpenAI message objects are dumped to dicts."""
+    if isinstance(message, dict):
+        return message
+    if hasattr(message, "model_dump"):
+        return message.model_dump(exclude_none=True)
+    raise TypeError(f"Unsupported chat message type: {type(message).__name__}")
+
+
+class Conversation:
+    """Append-only chat history, accepted as `messages` by the function calling loops.
+
+    Forks share the messages appended before them, `fork` is O(1) and the log is only copied when a fork appends
+    after another one did, so retries or trying other tools don't deep-copy the history. Each message is converted
+    to the wire format once, later API calls of the loop only convert the messages appended since the previous one.
+
+    It behaves like a list of messages for reading, and `+=`, `append` and `extend` append to it.
+    """
+
+    def __init__(self, messages: Optional[Iterable[Any]] = None):
+        # `_log` and `_wire` may be shared with forks, only the first `_length` messages belong to this conversation
+        self._log: List[Any] = []
+        self._wire: List[Dict[str, Any]] = []
+        self._length = 0
+        if messages is not None:
+            self.extend(messages)
+
+    def fork(self) -> "Conversation":
+        """Return a conversation with the same messages, appending to either one doesn't change the other."""
+        fork = Conversation()
+        fork._log, fork._wire, fork._length = self._log, self._wire, self._length
+        return fork
+
+    def append(self, message) -> None:
+        if self._length != len(self._log):
+            # a fork appended to the shared log, copy the messages of this conversation before diverging
+            self._log = self._log[: self._length]
+            self._wire = self._wire[: self._length]
+        self._log.append(message)
+        self._length += 1
+
+    def extend(self, messages: Iterable[Any]) -> None:
+        for message in messages:
+            self.append(message)
+
+    def __iadd__(self, messages: Iterable[Any]) -> "Conversation":
+        self.extend(messages)
+        return self
+
+    def to_wire(self) -> List[Dict[str, Any]]:
+        """Messages in the format sent to the API, only messages not converted yet are."""
+        for i in range(len(self._wire), self._length):
+            self._wire.append(to_wire_message(self._log[i]))
+        return self._wire[: self._length]
+
+    def __len__(self) -> int:
+        return self._length
+
+    def __iter__(self) -> Iterator[Any]:
+        for i in range(self._length):
+            yield self._log[i]
+
+    def __getitem__(self, index: Union[int, slice]):
+        if isinstance(index, slice):
+            return self._log[: self._length][index]
+        if index < 0:
+            index += self._length
+        if not 0 <= index < self._length:
+            raise IndexError("conversation index out of range")
+        return self._log[index]
+
+    def __repr__(self) -> str:
+        return f"Conversation({self[:]!r})"
+
+
+def wire_messages(messages) -> List[Any]:
+    """Messages to send in a request, a `Conversation` is converted with its cached wire format."""
+    if isinstance(messages, Conversation):
+        return messages.to_wire()
+    return messages
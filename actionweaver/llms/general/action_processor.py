@@ -1,8 +1,39 @@
-from typing import Any, Callable, Dict, Optional, Union
+import asyncio
+import concurrent.futures
+import inspect
+from typing import Any, Callable, Dict, Iterable, List, Optional, Union
+
+from pydantic import BaseModel
+
+from actionweaver.llms.general.extractor import (
+    StreamingJSONExtractor,
+    extract_json,
+    is_function_call,
+    to_function,
+)
 
 ExtractorType = Callable[[str], Dict[str, Any]]
 
 
+class ActionResult(BaseModel):
+    """Outcome of processing one model output: the extracted function, and the tool response or the error."""
+
+    text: Optional[str] = None
+    function: Optional[Dict[str, Any]] = None
+    response: Any = None
+    ok: bool = False
+    error: Optional[str] = None
+
+
+def _format_exception(e: Exception) -> str:
+    return f"{type(e).__name__}: {e}"
+
+
+def default_extractor(text: str) -> Dict[str, Any]:
+    """Extract the first `{"function": ..., "parameters": ...}` object, surrounding prose and code fences are ignored."""
+    return to_function(extract_json(text, is_function_call))
+
+
 class ActionProcessor:
     def __init__(
         self,
@@ -12,53 +43,129 @@ class ActionProcessor:
         self.tools = tools or {}
         self.dict = {tool.name: tool for tool in tools}
         self.custom_extractor = custom_extractor
+        # resolved once, and shared by all texts of a batch
+        self.extractor = custom_extractor or default_extractor
 
     def extract_function(self, text: str) -> Union[Dict[str, Any], None]:
-        if self.custom_extractor:
-            extracted = self.custom_extractor(text)
-            if (
-                not isinstance(extracted, dict)
-                or "name" not in extracted
-                or "parameters" not in extracted
-            ):
-                raise ValueError(
-                    "Custom extractor must return a dictionary with 'name' and 'parameters' keys."
-                )
-            return extracted
-        else:
-            import json
-
-            j = json.loads(text)
-            return {"name": j["function"], "parameters": j["parameters"]}
+        extracted = self.extractor(text)
+        if self.custom_extractor and (
+            not isinstance(extracted, dict)
+            or "name" not in extracted
+            or "parameters" not in extracted
+        ):
+            raise ValueError(
+                "Custom extractor must return a dictionary with 'name' and 'parameters' keys."
+            )
+        return extracted
 
-    def respond(self, text: str):
-        function = None
+    def _extract(self, text: str) -> ActionResult:
         try:
             function = self.extract_function(text)
         except Exception as e:
-            exception_type = type(e).__name__
-            exception_message = str(e)
-            full_exception_string = f"{exception_type}: {exception_message}"
-            return (
-                None,
-                False,
-                f"Unable to extract a valid function from the input. Error encountered in extractor: {full_exception_string}",
-            )
+            return self._extraction_error(text, e)
+        return self._check(function, text)
 
+    @staticmethod
+    def _extraction_error(text: str, e: Exception) -> ActionResult:
+        return ActionResult(
+            text=text,
+            error=f"Unable to extract a valid function from the input. Error encountered in extractor: {_format_exception(e)}",
+        )
+
+    def _check(self, function: Dict[str, Any], text: Optional[str] = None):
         if function["name"] not in self.dict:
-            return None, False, "Function or tool not found"
+            return ActionResult(
+                text=text, function=function, error="Function or tool not found"
+            )
+        return ActionResult(text=text, function=function, ok=True)
+
+    def _invocation_error(self, result: ActionResult, e: Exception) -> ActionResult:
+        function = result.function
+        result.ok = False
+        result.error = f"Unable to invoke valid function {function['name']}, parameters: {function['parameters']}. Error encountered: {_format_exception(e)}"
+        return result
+
+    def _call(self, result: ActionResult) -> ActionResult:
+        if not result.ok:
+            return result
 
-        response = ""
         try:
-            response = self.dict[function["name"]](**function["parameters"])
+            result.response = self.dict[result.function["name"]](
+                **result.function["parameters"]
+            )
         except Exception as e:
-            exception_type = type(e).__name__
-            exception_message = str(e)
-            full_exception_string = f"{exception_type}: {exception_message}"
-            return (
-                None,
-                False,
-                f"Unable to invoke valid function {function['name']}, parameters: {function['parameters']}. Error encountered: {full_exception_string}",
+            return self._invocation_error(result, e)
+        return result
+
+    def process(self, text: str) -> ActionResult:
+        """Extract a function from `text` and invoke it."""
+        return self._call(self._extract(text))
+
+    def process_stream(self, chunks: Iterable[str]) -> ActionResult:
+        """Like `process` for streamed text, the function is invoked as soon as its JSON object closes and the rest
+        of the stream is not consumed.
+
+        A custom extractor needs the whole text, the stream is read to the end before it is called.
+        """
+        if self.custom_extractor:
+            return self.process("".join(chunks))
+
+        extractor = StreamingJSONExtractor(accept=is_function_call)
+        parts = []
+        for chunk in chunks:
+            parts.append(chunk)
+            if extractor.feed(chunk) is not None:
+                break
+
+        text = "".join(parts)
+        if extractor.result is None:
+            return self._extraction_error(
+                text, ValueError("No JSON object found in the text")
             )
+        return self._call(self._check(to_function(extractor.result), text))
+
+    async def aprocess(self, text: str) -> ActionResult:
+        """Like `process`, sync tools run in a worker thread and async tools are awaited."""
+        result = self._extract(text)
+        if not result.ok:
+            return result
+
+        tool = self.dict[result.function["name"]]
+        try:
+            response = await asyncio.to_thread(tool, **result.function["parameters"])
+            if inspect.isawaitable(response):
+                response = await response
+            result.response = response
+        except Exception as e:
+            return self._invocation_error(result, e)
+        return result
+
+    def respond(self, text: str):
+        result = self.process(text)
+        return result.response, result.ok, result.error
+
+    def invoke(self, function: Dict[str, Any]):
+        """Call the tool of an extracted function, returns `(response, ok, error)` like `respond`."""
+        result = self._call(self._check(function))
+        return result.response, result.ok, result.error
+
+    def respond_many(
+        self, texts: Iterable[str], max_workers: Optional[int] = None
+    ) -> List[ActionResult]:
+        """Process many model outputs in a thread pool, results are in the order of `texts`."""
+        with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+            return list(executor.map(self.process, texts))
+
+    async def arespond_many(
+        self, texts: Iterable[str], max_concurrency: Optional[int] = None
+    ) -> List[ActionResult]:
+        """Process many model outputs concurrently, with at most `max_concurrency` tool calls in flight."""
+        semaphore = asyncio.Semaphore(max_concurrency) if max_concurrency else None
+
+        async def process(text):
+            if semaphore is None:
+                return await self.aprocess(text)
+            async with semaphore:
+                return await self.aprocess(text)
 
-        return response, True, None
+        return list(await asyncio.gather(*(process(text) for text in texts)))
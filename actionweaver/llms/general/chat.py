@@ -0,0 +1,142 @@
+from __future__ import annotations
+
+from typing import Any, Callable, Dict, Iterable, List, Optional, Union
+
+from actionweaver.actions.action import Action
+from actionweaver.llms.conversation import wire_messages
+from actionweaver.llms.general.action_processor import ActionProcessor, ExtractorType
+from actionweaver.llms.general.tools import Tools
+from actionweaver.llms.loop_engine import (
+    FunctionCallingLoopException,
+    build_orch,
+    validate_orch,
+)
+from actionweaver.utils import DEFAULT_ACTION_SCOPE
+from actionweaver.utils.messages import message_content, message_role
+
+# text generation backend: chat messages in, generated text, or an iterator of text chunks, out
+GenerateType = Callable[..., Union[str, Iterable[str]]]
+
+DEFAULT_SYSTEM_PROMPT = (
+    "You can use the following tools:\n{tools}\n\n"
+    "To use a tool, reply with a JSON object only, in the format "
+    '{{"function": "<tool name>", "parameters": {{<tool arguments>}}}}. '
+    "Otherwise, answer the user directly."
+)
+TOOL_RESULT_PROMPT = "Output of {name}: {output}"
+
+
+def generate_from_client(client, model: str, **defaults) -> GenerateType:
+    """Text generation with an OpenAI compatible client, e.g. `OpenAI(base_url=...)` for a local vLLM, llama.cpp or
+    Ollama server."""
+
+    def generate(messages: List[Any], **kwargs) -> str:
+        response = client.chat.completions.create(
+            model=model, messages=messages, **{**defaults, **kwargs}
+        )
+        return response.choices[0].message.content
+
+    return generate
+
+
+def render_prompt(messages: List[Any]) -> str:
+    """Render chat messages into a single prompt for a raw completion endpoint."""
+    lines = [
+        f"{message_role(message)}: {message_content(message)}" for message in messages
+    ]
+    return "\n".join(lines + ["assistant:"])
+
+
+def generate_from_completion(
+    complete: Callable[..., str],
+    render: Callable[[List[Any]], str] = render_prompt,
+) -> GenerateType:
+    """Text generation with a raw completion callable taking a prompt, e.g. a local model's `generate` method."""
+
+    def generate(messages: List[Any], **kwargs) -> str:
+        return complete(render(messages), **kwargs)
+
+    return generate
+
+
+def create_chat_loop(
+    generate: GenerateType,
+    system_prompt: str = DEFAULT_SYSTEM_PROMPT,
+    custom_extractor: Optional[ExtractorType] = None,
+    max_iterations: int = 10,
+):
+    """Function calling loop for models without a function calling API, e.g. self-hosted models.
+
+    The tools are described in a system prompt, and each generated text is passed to `ActionProcessor`: if a function
+    call is extracted, the action is invoked and its output is sent back to the model, otherwise the text is the
+    answer. Invalid calls are sent back to the model as errors, at most `max_iterations` texts are generated.
+
+    If `generate` streams text chunks, a function call is dispatched as soon as its JSON object closes.
+    """
+
+    def chat(
+        messages: List[Dict[str, Any]],
+        actions: List[Action] = [],
+        orch=None,
+        **kwargs,
+    ):
+        validate_orch(orch)
+        action_handler, orch = build_orch(actions, orch)
+        tools = Tools.from_expr(orch[DEFAULT_ACTION_SCOPE])
+
+        for _ in range(max_iterations):
+            if not tools:
+                generated = generate(wire_messages(messages), **kwargs)
+                # the answer is a string whether `generate` streams or not
+                return generated if isinstance(generated, str) else "".join(generated)
+
+            request = [
+                {
+                    "role": "system",
+                    "content": system_prompt.format(tools=tools.to_arguments()),
+                }
+            ] + wire_messages(messages)
+            generated = generate(request, **kwargs)
+
+            processor = ActionProcessor(
+                tools=tools.tools, custom_extractor=custom_extractor
+            )
+            if isinstance(generated, str):
+                result = processor.process(generated)
+            else:
+                # streamed text, the action is invoked as soon as its JSON object closes
+                result = processor.process_stream(generated)
+
+            if result.function is None:
+                # not a function call, the model answered
+                return result.text
+
+            messages += [{"role": "assistant", "content": result.text}]
+            if not result.ok:
+                messages += [{"role": "user", "content": result.error}]
+                continue
+
+            output = result.response
+            name = result.function["name"]
+            messages += [
+                {
+                    "role": "user",
+                    "content": TOOL_RESULT_PROMPT.format(name=name, output=output),
+                }
+            ]
+            if action_handler[name].stop:
+                return output
+
+            # use tools in orch[DEFAULT_ACTION_SCOPE] if expr is DEFAULT_ACTION_SCOPE
+            expr = (
+                orch[name]
+                if orch[name] != DEFAULT_ACTION_SCOPE
+                else orch[DEFAULT_ACTION_SCOPE]
+            )
+            tools = Tools.from_expr(expr)
+
+        raise FunctionCallingLoopException(
+            f"No answer after {max_iterations} iterations"
+        )
+
+    return chat
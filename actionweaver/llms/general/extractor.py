@@ -0,0 +1,122 @@
+import json
+import re
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# characters changing the scanner state, everything else is skipped by the regex engine
+_SPECIAL_CHARACTERS = re.compile(r'[{}"\\]')
+
+# offsets of an object's braces in the candidate text, and the spans of the objects nested in it
+_Span = Tuple[int, int, list]
+
+
+def is_function_call(obj: Any) -> bool:
+    return isinstance(obj, dict) and "function" in obj and "parameters" in obj
+
+
+class StreamingJSONExtractor:
+    """Find the first balanced JSON object in incrementally generated text, in a single pass.
+
+    Text before and after the object, e.g. prose or code fences, is ignored, and braces inside JSON strings are
+    handled. Candidates that do not parse, or are rejected by `accept`, are skipped and the objects nested in them
+    are tried, outer ones first. `feed` returns the object as soon as it closes, so it can be used before the model
+    finishes generating.
+    """
+
+    def __init__(self, accept: Optional[Callable[[Any], bool]] = None):
+        self.accept = accept or (lambda obj: isinstance(obj, dict))
+        self.result = None
+
+        self._parts = (
+            []
+        )  # text of the current top-level candidate, from its opening brace
+        self._buffered = 0  # length of `_parts`
+        # open objects of the current candidate: offset of their opening brace, and the objects closed in them
+        self._frames: List[Tuple[int, List[_Span]]] = []
+        self._in_string = False
+        self._escape = False
+
+    def feed(self, chunk: str) -> Optional[Dict[str, Any]]:
+        """Scan the next chunk of text, returns the object once found and None before."""
+        if self.result is not None:
+            return self.result
+
+        start = 0 if self._frames else None
+        # index of the character escaped by a backslash, it is not special
+        skip = 0 if self._escape else -1
+        self._escape = False
+
+        for match in _SPECIAL_CHARACTERS.finditer(chunk):
+            i = match.start()
+            if i == skip:
+                continue
+            char = match.group()
+
+            if not self._frames:
+                if char == "{":
+                    start, self._buffered = i, 0
+                    self._frames.append((0, []))
+                continue
+
+            if self._in_string:
+                if char == "\\":
+                    skip = i + 1
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"':
+                self._in_string = True
+            elif char == "{":
+                self._frames.append((self._buffered + i - start, []))
+            elif char == "}":
+                opened, children = self._frames.pop()
+                span = (opened, self._buffered + i - start + 1, children)
+                if self._frames:
+                    # nested objects are only tried if the top-level one is rejected
+                    self._frames[-1][1].append(span)
+                    continue
+
+                text = "".join(self._parts) + chunk[start : i + 1]
+                self._parts = []
+                start = None
+                if self._search(text, span):
+                    return self.result
+
+        if self._frames:
+            self._parts.append(chunk[start:])
+            self._buffered += len(chunk) - start
+            self._escape = skip == len(chunk)
+        return None
+
+    def _search(self, text: str, root: "_Span") -> bool:
+        """Try the top-level object, then the objects nested in it, outer ones and in document order first."""
+        pending = [root]
+        while pending:
+            opened, closed, children = pending.pop()
+            if self._try_accept(text[opened:closed]):
+                return True
+            pending.extend(reversed(children))
+        return False
+
+    def _try_accept(self, candidate: str) -> bool:
+        try:
+            obj = json.loads(candidate)
+        except (ValueError, RecursionError):
+            # too deeply nested for the JSON decoder, the objects nested in it are tried next
+            return False
+        if not self.accept(obj):
+            return False
+        self.result = obj
+        return True
+
+
+def extract_json(
+    text: str, accept: Optional[Callable[[Any], bool]] = None
+) -> Dict[str, Any]:
+    """Return the first JSON object in `text` accepted by `accept`, raises ValueError if there is none."""
+    obj = StreamingJSONExtractor(accept).feed(text)
+    if obj is None:
+        raise ValueError("No JSON object found in the text")
+    return obj
+
+
+def to_function(obj: Dict[str, Any]) -> Dict[str, Any]:
+    return {"name": obj["function"], "parameters": obj["parameters"]}
@@ -1,4 +1,6 @@
 # TODO: assume all actions are functions for now
+import json
+
 from actionweaver.actions import Action
 
 
@@ -14,6 +16,9 @@ class Tools:
     def from_expr(cls, expr):
         if expr is None:
             return cls()
+        elif isinstance(expr, Action):
+            # forced calls can't be enforced with a prompt, the action is the only one offered
+            return cls(tools=[expr])
         elif isinstance(expr, list):
             return cls(
                 tools=expr,
@@ -21,10 +26,18 @@ class Tools:
         else:
             raise ToolException(f"Invalid orchestration expression: {expr}")
 
+    def __bool__(self):
+        return bool(self.tools)
+
+    @staticmethod
+    def _params(action: Action) -> str:
+        # compact JSON rather than the dict's repr, the prompt is sent with every request
+        return json.dumps(action.json_schema(compact=True), separators=(",", ":"))
+
     def to_arguments(self):
         return "\n".join(
             [
-                f"""{a.name}: \n description: {a.description} \n params: {a.json_schema()}"""
+                f"""{a.name}: \n description: {a.description} \n params: {self._params(a)}"""
                 for a in self.tools
             ]
         )
@@ -0,0 +1,134 @@
+import collections
+import concurrent.futures
+import contextvars
+import math
+import threading
+import time
+from typing import Any, Callable, Optional
+
+
+class HedgingPolicy:
+    """Hedge slow API calls: if a call has not returned after `delay` seconds, send a duplicate and take the first
+    successful response.
+
+    Without a fixed `delay`, the delay is the `percentile` of the latencies observed over the last `window` calls,
+    and no call is hedged until `min_samples` latencies are observed.
+
+    The sync OpenAI client cannot abort a request in flight, so the losing call runs to completion in the background.
+    Its response is passed to `on_discarded`, so the chat loop can track the extra tokens. Streamed requests are
+    never hedged.
+    """
+
+    # attribution of the tokens of discarded responses in `TokenUsageTracker.by_action`
+    ATTRIBUTION = "(hedge)"
+
+    def __init__(
+        self,
+        delay: Optional[float] = None,
+        percentile: float = 0.95,
+        min_samples: int = 20,
+        window: int = 200,
+        max_workers: int = 8,
+    ):
+        self.delay = delay
+        self.percentile = percentile
+        self.min_samples = min_samples
+        self.stats = collections.Counter()
+
+        self._latencies = collections.deque(maxlen=window)
+        self._lock = threading.Lock()
+        self._max_workers = max_workers
+        self._executor = None
+
+    @property
+    def executor(self) -> concurrent.futures.ThreadPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = concurrent.futures.ThreadPoolExecutor(
+                    max_workers=self._max_workers,
+                    thread_name_prefix="actionweaver-hedging",
+                )
+            return self._executor
+
+    def observe(self, latency: float):
+        with self._lock:
+            self._latencies.append(latency)
+
+    def hedge_delay(self) -> Optional[float]:
+        """Seconds to wait before hedging, None if the call should not be hedged."""
+        if self.delay is not None:
+            return self.delay
+        with self._lock:
+            if len(self._latencies) < self.min_samples:
+                return None
+            latencies = sorted(self._latencies)
+        index = max(math.ceil(self.percentile * len(latencies)) - 1, 0)
+        return latencies[index]
+
+    def _submit(self, create, args, kwargs) -> concurrent.futures.Future:
+        # each call runs in a copy of the caller's context, e.g. for the parent run id of `traceable`
+        return self.executor.submit(
+            contextvars.copy_context().run, create, *args, **kwargs
+        )
+
+    def call(
+        self,
+        create: Callable,
+        *args,
+        on_discarded: Optional[Callable[[Any], None]] = None,
+        **kwargs,
+    ):
+        delay = self.hedge_delay()
+        if delay is None or kwargs.get("stream"):
+            started = time.perf_counter()
+            response = create(*args, **kwargs)
+            self.observe(time.perf_counter() - started)
+            return response
+
+        self.stats["requests"] += 1
+        started = time.perf_counter()
+        primary = self._submit(create, args, kwargs)
+        done, _ = concurrent.futures.wait([primary], timeout=delay)
+        if done:
+            response = primary.result()
+            self.observe(time.perf_counter() - started)
+            return response
+
+        self.stats["hedged"] += 1
+        hedge = self._submit(create, args, kwargs)
+        pending = {primary, hedge}
+        error = None
+        while pending:
+            done, pending = concurrent.futures.wait(
+                pending, return_when=concurrent.futures.FIRST_COMPLETED
+            )
+            for future in done:
+                if future.exception() is not None:
+                    error = error or future.exception()
+                    continue
+
+                self.observe(time.perf_counter() - started)
+                if future is hedge:
+                    self.stats["hedge_wins"] += 1
+                for loser in pending:
+                    if not loser.cancel():
+                        loser.add_done_callback(
+                            lambda f: self._discard(f, on_discarded)
+                        )
+                for loser in done - {future}:
+                    self._discard(loser, on_discarded)
+                return future.result()
+        raise error
+
+    def _discard(self, future: concurrent.futures.Future, on_discarded):
+        if future.cancelled() or future.exception() is not None:
+            return
+        self.stats["discarded_responses"] += 1
+        if on_discarded is not None:
+            on_discarded(future.result())
+
+    def shutdown(self, wait: bool = True):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=wait)
+                self._executor = None
@@ -0,0 +1,176 @@
+import collections
+from abc import ABC, abstractmethod
+from typing import Any, Callable, List, Optional
+
+from actionweaver.utils.messages import message_blocks, message_content, message_role
+from actionweaver.utils.tokens import TokenEstimator
+
+
+class HistoryPolicy(ABC):
+    """Base class for history policies.
+
+    A history policy decides which part of the conversation is sent to the LLM before each API call of the
+    function calling loop. The caller's `messages` list keeps the full history, only the request is reduced.
+
+    `stats` counts requests, tokens before and after the policy was applied, and tokens saved.
+    """
+
+    def __init__(self, token_estimator: Optional[TokenEstimator] = None):
+        self.token_estimator = token_estimator or TokenEstimator()
+        self.stats = collections.Counter()
+
+    @abstractmethod
+    def select(self, blocks: List[List[Any]], counts: List[int]) -> List[List[Any]]:
+        """Return the message blocks to send, given the blocks of the history and their token counts."""
+        pass
+
+    def apply(self, messages: List[Any]) -> List[Any]:
+        blocks = message_blocks(messages)
+        counts = [sum(self.token_estimator.message_counts(block)) for block in blocks]
+
+        selected = self.select(blocks, counts)
+        result = [message for block in selected for message in block]
+
+        before = sum(counts)
+        after = sum(self.token_estimator.message_counts(result))
+        self.stats["requests"] += 1
+        self.stats["tokens_before"] += before
+        self.stats["tokens_after"] += after
+        self.stats["tokens_saved"] += before - after
+        self.stats["messages_dropped"] += max(len(messages) - len(result), 0)
+        return result
+
+    @staticmethod
+    def _system_head_size(blocks):
+        """Number of leading system message blocks, they are always kept."""
+        n = 0
+        while n < len(blocks) - 1 and message_role(blocks[n][0]) == "system":
+            n += 1
+        return n
+
+
+class SlidingWindowPolicy(HistoryPolicy):
+    """Keep leading system messages and the most recent `max_messages` messages.
+
+    Tool calls and their tool responses are kept or dropped together, and the latest block is always kept.
+    """
+
+    def __init__(self, max_messages: int, token_estimator=None):
+        super().__init__(token_estimator)
+        self.max_messages = max_messages
+
+    def select(self, blocks, counts):
+        n = self._system_head_size(blocks)
+        start = len(blocks) - 1
+        kept = len(blocks[start])
+        while start > n and kept + len(blocks[start - 1]) <= self.max_messages:
+            start -= 1
+            kept += len(blocks[start])
+        return blocks[:n] + blocks[start:]
+
+
+class TokenBudgetPolicy(HistoryPolicy):
+    """Keep leading system messages and the most recent messages fitting in `max_tokens`."""
+
+    def __init__(self, max_tokens: int, token_estimator=None):
+        super().__init__(token_estimator)
+        self.max_tokens = max_tokens
+
+    def select(self, blocks, counts):
+        n = self._system_head_size(blocks)
+        total = sum(counts[:n]) + counts[-1]
+        start = len(blocks) - 1
+        while start > n and total + counts[start - 1] <= self.max_tokens:
+            start -= 1
+            total += counts[start]
+        return blocks[:n] + blocks[start:]
+
+
+Summarizer = Callable[[List[Any]], str]
+
+
+def summarizer_from_client(client, model: str, instructions: Optional[str] = None):
+    """Create a summarizer calling `client.chat.completions.create`, typically with a cheaper model."""
+    instructions = instructions or (
+        "Summarize the following conversation between a user, an assistant and tools. "
+        "Keep facts, decisions, tool results and open questions needed to continue the conversation."
+    )
+
+    def summarize(messages: List[Any]) -> str:
+        transcript = "\n".join(
+            f"{message_role(message)}: {message_content(message)}"
+            for message in messages
+        )
+        response = client.chat.completions.create(
+            model=model,
+            messages=[
+                {"role": "system", "content": instructions},
+                {"role": "user", "content": transcript},
+            ],
+        )
+        return response.choices[0].message.content
+
+    return summarize
+
+
+class SummarizationPolicy(HistoryPolicy):
+    """Replace older messages with a summary once the history exceeds `max_tokens`.
+
+    The most recent messages up to `keep_recent_tokens` are sent verbatim. The summary is updated incrementally,
+    only messages that left the recent window since the last summary are passed to `summarizer`, together with the
+    previous summary.
+    """
+
+    SUMMARY_PREFIX = "Summary of the earlier conversation: "
+
+    def __init__(
+        self,
+        summarizer: Summarizer,
+        max_tokens: int,
+        keep_recent_tokens: Optional[int] = None,
+        token_estimator=None,
+    ):
+        super().__init__(token_estimator)
+        self.summarizer = summarizer
+        self.max_tokens = max_tokens
+        self.keep_recent_tokens = (
+            keep_recent_tokens if keep_recent_tokens is not None else max_tokens // 2
+        )
+
+        self.summary_message = None
+        self._summarized = []
+
+    def select(self, blocks, counts):
+        if sum(counts) <= self.max_tokens:
+            return blocks
+
+        n = self._system_head_size(blocks)
+        start = len(blocks) - 1
+        recent = counts[start]
+        while start > n and recent + counts[start - 1] <= self.keep_recent_tokens:
+            start -= 1
+            recent += counts[start]
+
+        to_summarize = [message for block in blocks[n:start] for message in block]
+        if not to_summarize:
+            return blocks
+
+        # messages already covered by the previous summary are not summarized again
+        done = len(self._summarized)
+        if done > len(to_summarize) or any(
+            a is not b for a, b in zip(to_summarize, self._summarized)
+        ):
+            done = 0
+            self.summary_message = None
+
+        if done < len(to_summarize):
+            previous = [self.summary_message] if self.summary_message else []
+            summary = self.summarizer(previous + to_summarize[done:])
+            self.summary_message = {
+                "role": "system",
+                "content": self.SUMMARY_PREFIX + summary,
+            }
+            self.stats["summaries"] += 1
+        self._summarized = to_summarize
+
+        return blocks[:n] + [[self.summary_message]] + blocks[start:]
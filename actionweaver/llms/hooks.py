@@ -0,0 +1,86 @@
+from typing import Any, Dict, List, Optional, Union
+
+
+class ChatLoopHooks:
+    """Base class for chat loop hooks, override the methods you need.
+
+    Hooks are called by the function calling loop around API calls and action calls, e.g. for profiling, caching,
+    rate limiting or cost attribution. Hooks run synchronously on the loop's thread, keep them cheap.
+    """
+
+    def before_request(self, request: Dict[str, Any]) -> Optional[Any]:
+        """Called before each API call with its keyword arguments (`model`, `messages`, `tools`...).
+
+        `request` may be modified in place. Return a response to skip the API call, e.g. a cached response.
+        """
+        return None
+
+    def after_response(self, request: Dict[str, Any], response: Any):
+        """Called with each API response, or stream, before it is handled by the loop."""
+        pass
+
+    def before_tool(self, name: str, arguments: Dict[str, Any]) -> Optional[Any]:
+        """Called before each action call. Return a value other than None to use it as output and skip the action."""
+        return None
+
+    def after_tool(self, name: str, arguments: Dict[str, Any], output: Any):
+        """Called with the output of each action call."""
+        pass
+
+    def on_stream_chunk(self, chunk: Any):
+        """Called with each chunk of a streamed API response."""
+        pass
+
+    def on_loop_end(
+        self, messages: List[Any], result: Any, error: Optional[Exception] = None
+    ):
+        """Called once when the loop returns `result`, or raises `error`."""
+        pass
+
+
+class CompositeHooks(ChatLoopHooks):
+    """Call several hooks in order. The first response or output returned by a `before_*` hook is used."""
+
+    def __init__(self, hooks: List[ChatLoopHooks]):
+        self.hooks = list(hooks)
+
+    def before_request(self, request):
+        for hook in self.hooks:
+            response = hook.before_request(request)
+            if response is not None:
+                return response
+        return None
+
+    def after_response(self, request, response):
+        for hook in self.hooks:
+            hook.after_response(request, response)
+
+    def before_tool(self, name, arguments):
+        for hook in self.hooks:
+            output = hook.before_tool(name, arguments)
+            if output is not None:
+                return output
+        return None
+
+    def after_tool(self, name, arguments, output):
+        for hook in self.hooks:
+            hook.after_tool(name, arguments, output)
+
+    def on_stream_chunk(self, chunk):
+        for hook in self.hooks:
+            hook.on_stream_chunk(chunk)
+
+    def on_loop_end(self, messages, result, error=None):
+        for hook in self.hooks:
+            hook.on_loop_end(messages, result, error)
+
+
+def as_hooks(
+    hooks: Optional[Union[ChatLoopHooks, List[ChatLoopHooks]]],
+) -> Optional[ChatLoopHooks]:
+    """Normalize the `hooks` argument of the chat loop, None when no hooks are registered."""
+    if not hooks:
+        return None
+    if isinstance(hooks, ChatLoopHooks):
+        return hooks
+    return hooks[0] if len(hooks) == 1 else CompositeHooks(hooks)
@@ -0,0 +1,615 @@
+from __future__ import annotations
+
+import json
+import logging
+import time
+from collections import defaultdict
+from typing import List, Optional, Union
+
+from openai import Stream
+
+import actionweaver.llms.loop_action as la
+from actionweaver.actions.action import Action, ActionHandlers
+from actionweaver.llms.conversation import wire_messages
+from actionweaver.llms.exception_handler import ChatLoopInfo, ExceptionHandler
+from actionweaver.llms.hedging import HedgingPolicy
+from actionweaver.llms.history import HistoryPolicy
+from actionweaver.llms.hooks import ChatLoopHooks, as_hooks
+from actionweaver.llms.loop_guard import (
+    LoopGuard,
+    LoopGuardState,
+    LoopLimitException,
+    canonical_arguments,
+)
+from actionweaver.llms.tool_output import OutputLimiter
+from actionweaver.llms.tool_selection import ToolSelector
+from actionweaver.llms.transports import FunctionCallingLoopException, Transport
+from actionweaver.telemetry import Tracer, get_current_span, start_span, traceable
+from actionweaver.telemetry.metrics import (
+    API_REQUEST_DURATION,
+    DEDUPLICATED_TOOL_CALLS,
+    LOOP_ITERATIONS,
+    TIME_TO_FIRST_TOKEN,
+    TOKENS_PER_REQUEST,
+)
+from actionweaver.utils import DEFAULT_ACTION_SCOPE
+from actionweaver.utils.deadline import (
+    Deadline,
+    DeadlineExceededException,
+    get_current_deadline,
+    use_deadline,
+)
+from actionweaver.utils.tokens import (
+    TokenEstimator,
+    TokenUsageTracker,
+    TokenUsageTrackerException,
+    call_tracker,
+    get_current_tracker,
+    usage_to_dict,
+    use_tracker,
+)
+
+
+def invoke_tool(
+    transport: Transport,
+    messages,
+    model,
+    response_msg,
+    tool_calls,
+    tools,
+    orch,
+    action_handler: ActionHandlers,
+    output_limiter: Optional[OutputLimiter] = None,
+    hooks: Optional[ChatLoopHooks] = None,
+    loop_state: Optional[LoopGuardState] = None,
+    dedupe_tool_calls: bool = False,
+):
+    messages += [transport.assistant_message(response_msg, tool_calls)]
+    deadline = get_current_deadline()
+
+    # (name, canonical arguments) -> (output, content) of the calls already made for this response
+    responses = {}
+
+    # if multiple type of functions are invoked, ignore orch and `stop` option
+    called_tools = defaultdict(list)
+
+    # TODO: right now invoke all tools iteratively, implement async tool invocation
+    for tool_call in tool_calls:
+        name = tool_call["function"]["name"]
+        arguments = tool_call["function"]["arguments"]
+
+        if action_handler.contains(name):
+            try:
+                arguments = json.loads(tool_call["function"]["arguments"])
+            except json.decoder.JSONDecodeError as e:
+                raise FunctionCallingLoopException(
+                    f"Failed to parse function call arguments from OpenAI response",
+                    extra_info={
+                        "arguments": tool_call["function"]["arguments"],
+                        "timestamp": time.time(),
+                        "model": model,
+                    },
+                ) from e
+
+            key = None
+            if dedupe_tool_calls and len(tool_calls) > 1:
+                key = (name, canonical_arguments(arguments))
+
+            if key is not None and key in responses:
+                # identical call in the same response, its output is fanned out to this tool call id
+                tool_response, content = responses[key]
+                DEDUPLICATED_TOOL_CALLS.inc(action=name)
+            else:
+                if deadline is not None:
+                    deadline.check()
+
+                # Invoke action, unless the same call was already made in this loop
+                memoized, tool_response = False, None
+                if loop_state is not None:
+                    memoized, tool_response = loop_state.lookup(name, arguments)
+                if not memoized:
+                    if hooks is not None:
+                        tool_response = hooks.before_tool(name, arguments)
+                    if tool_response is None:
+                        tool_response = action_handler[name](**arguments)
+                    if hooks is not None:
+                        hooks.after_tool(name, arguments, tool_response)
+                    if loop_state is not None:
+                        loop_state.store(name, arguments, tool_response)
+
+                content = (
+                    output_limiter.render(name, tool_response)
+                    if output_limiter
+                    else str(tool_response)
+                )
+                if key is not None:
+                    responses[key] = (tool_response, content)
+
+            called_tools[name].append(tool_response)
+
+            stop = action_handler[name].stop
+            messages += [transport.result_message(tool_call, name, content)]
+
+        else:
+            raise FunctionCallingLoopException(
+                f"{name} is not a valid function name",
+                extra_info={
+                    "timestamp": time.time(),
+                    "model": model,
+                },
+            )
+
+    if len(called_tools) == 1:
+        # Update new functions for next OpenAI api call
+        name = list(called_tools.keys())[0]
+
+        # use tools in orch[DEFAULT_ACTION_SCOPE] if expr is DEFAULT_ACTION_SCOPE
+        expr = (
+            orch[name]
+            if orch[name] != DEFAULT_ACTION_SCOPE
+            else orch[DEFAULT_ACTION_SCOPE]
+        )
+        return (
+            transport.from_expr(expr),
+            (stop, transport.stop_content(called_tools[name])),
+        )
+    else:
+        # if multiple type of functions are invoked, use the same set of tools next api call
+        return (
+            tools,
+            (False, list(called_tools.values())),
+        )
+
+
+def observe_stream(chunks, model=None, request_started=None, hooks=None):
+    """Pass the chunks of a streamed response through, recording the time to first token and calling the hooks."""
+    first = True
+    for chunk in chunks:
+        if first and request_started is not None:
+            TIME_TO_FIRST_TOKEN.observe(
+                time.perf_counter() - request_started, model=model
+            )
+        first = False
+        if hooks is not None:
+            hooks.on_stream_chunk(chunk)
+        yield chunk
+
+
+def select_tools(
+    transport: Transport,
+    tools,
+    messages,
+    action_handler: ActionHandlers,
+    tool_selector=None,
+):
+    """Narrow down the tools sent in the next API call with the tool selector, forced tool choices are left untouched."""
+    if tool_selector is None or not transport.is_auto(tools):
+        return tools
+
+    actions = [action_handler[name] for name in transport.names(tools)]
+    selected = tool_selector.select(actions, messages)
+    if len(selected) == len(actions):
+        return tools
+    return transport.from_expr(selected)
+
+
+def build_orch(actions: List[Action] = None, orch=None):
+    action_handler = ActionHandlers()
+
+    if orch is None:
+        orch = {}
+    if DEFAULT_ACTION_SCOPE not in orch:
+        orch[DEFAULT_ACTION_SCOPE] = actions
+
+    buf = actions + list(orch.values())
+    for element in buf:
+        if isinstance(element, list):
+            for e in element:
+                action_handler.name_to_action[e.name] = e
+        elif isinstance(element, Action):
+            action_handler.name_to_action[element.name] = element
+    # default action scope if not following actions not specified
+    for _, action in action_handler.name_to_action.items():
+        if action.name not in orch:
+            orch[action.name] = DEFAULT_ACTION_SCOPE
+
+    return action_handler, orch
+
+
+def validate_orch(orch):
+    if orch is not None:
+        for key in orch.keys():
+            if not isinstance(key, str):
+                raise FunctionCallingLoopException(
+                    f"Orch keys must be action name (str), found {type(key)}"
+                )
+
+
+def create_chat_loop(original_create_method, transport: Transport):
+    """Wrap a chat completion `create` method into the function calling loop, `transport` adapts the loop to the
+    request and response shapes of the API."""
+
+    def wrapper_for_logging(
+        *args,
+        logger: Optional[logging.Logger] = None,
+        logging_name: Optional[str] = None,
+        logging_metadata: Optional[dict] = None,
+        logging_level=logging.INFO,
+        logging_sample_rate: Optional[float] = None,
+        logging_max_payload_chars: Optional[int] = None,
+        exception_handler: ExceptionHandler = None,
+        tool_selector: Optional[ToolSelector] = None,
+        token_estimator: Optional[TokenEstimator] = None,
+        history_policy: Optional[HistoryPolicy] = None,
+        output_limiter: Optional[OutputLimiter] = None,
+        tracer: Optional[Tracer] = None,
+        hooks: Optional[Union[ChatLoopHooks, List[ChatLoopHooks]]] = None,
+        hedging: Optional[HedgingPolicy] = None,
+        deadline: Optional[Union[float, Deadline]] = None,
+        on_deadline: str = "raise",
+        loop_guard: Optional[LoopGuard] = None,
+        # run identical tool calls of a response once, only safe if all actions are idempotent
+        dedupe_tool_calls: bool = False,
+        compact_schemas: bool = False,
+        **kwargs,
+    ):
+        DEFAULT_LOGGING_NAME = "actionweaver_initial_chat_completion"
+        hooks = as_hooks(hooks)
+        loop_transport = transport.with_compact_schema(compact_schemas)
+        if on_deadline not in ("raise", "return"):
+            raise FunctionCallingLoopException(
+                f"on_deadline must be 'raise' or 'return', found {on_deadline}"
+            )
+
+        def new_create(
+            actions: List[Action] = [],
+            orch=None,
+            token_usage_tracker=None,
+            *args,
+            **kwargs,
+        ):
+            validate_orch(orch)
+
+            chat_completion_create_method = original_create_method
+            if logger:
+                chat_completion_create_method = traceable(
+                    name=(logging_name or DEFAULT_LOGGING_NAME)
+                    + ".chat.completions.create",
+                    logger=logger,
+                    metadata=logging_metadata,
+                    level=logging_level,
+                    max_payload_chars=logging_max_payload_chars,
+                )(original_create_method)
+
+            argument_check(loop_transport, *args, **kwargs)
+
+            messages = kwargs.get("messages")
+            model = kwargs.get("model")
+
+            action_handler, orch = build_orch(actions, orch)
+
+            limiter_actions = output_limiter.actions() if output_limiter else []
+            for limiter_action in limiter_actions:
+                action_handler.name_to_action[limiter_action.name] = limiter_action
+                orch.setdefault(limiter_action.name, DEFAULT_ACTION_SCOPE)
+            limited_outputs = (
+                output_limiter.stats["limited_outputs"] if output_limiter else 0
+            )
+
+            tools = loop_transport.from_expr(orch[DEFAULT_ACTION_SCOPE])
+            chat_loop_action = la.Unknown
+
+            def track_discarded(response):
+                # tokens of the losing hedged request are billed too
+                try:
+                    token_usage_tracker.track_usage(
+                        response.usage, model=model, actions=[hedging.ATTRIBUTION]
+                    )
+                except TokenUsageTrackerException:
+                    # raised again by the next API call of the loop, if any
+                    pass
+
+            loop_deadline = get_current_deadline()
+            last_response = None
+
+            def deadline_exceeded(error):
+                # the partial result is the latest API response, tool outputs so far are in `messages`
+                if on_deadline == "return" and last_response is not None:
+                    return la.ReturnRightAway(content=last_response)
+                if isinstance(error, DeadlineExceededException):
+                    raise error
+                raise DeadlineExceededException(
+                    f"Deadline exceeded after {iterations} iterations"
+                ) from error
+
+            loop_state = loop_guard.new_state() if loop_guard else None
+            force_final_answer = False
+
+            loop_span = get_current_span()
+            iterations = 0
+            # actions whose outputs are sent in the next API call, its usage is attributed to them
+            triggered_by = None
+
+            while True:
+                iterations += 1
+                if loop_span is not None:
+                    loop_span.set_attribute("actionweaver.iterations", iterations)
+
+                if loop_state is not None and loop_state.limit_reached(iterations):
+                    if force_final_answer:
+                        raise LoopLimitException(
+                            "Tools were called again after a final answer was forced"
+                        )
+                    loop_guard.stats["limits_reached"] += 1
+                    if loop_guard.on_limit == "raise":
+                        raise LoopLimitException(
+                            f"Function calling loop stopped after {iterations - 1} API calls, "
+                            f"repeated calls: {dict(loop_state.repeats)}"
+                        )
+                    force_final_answer = True
+
+                api_response = None
+                try:
+                    if loop_deadline is not None:
+                        loop_deadline.check()
+
+                    tools_argument = {}
+                    if bool(tools):
+                        # with `force_final_answer` the model must answer with the tool outputs it already has
+                        tools_argument = loop_transport.to_arguments(
+                            select_tools(
+                                loop_transport,
+                                tools,
+                                messages,
+                                action_handler,
+                                tool_selector,
+                            ),
+                            force_final_answer,
+                        )
+
+                    # a `Conversation` only converts the messages appended since the previous request
+                    request_messages = wire_messages(messages)
+                    if history_policy is not None:
+                        request_messages = history_policy.apply(request_messages)
+                    if token_estimator is not None:
+                        request_messages = token_estimator.preflight(
+                            request_messages,
+                            tools_argument.get(loop_transport.toolset_name),
+                            token_usage_tracker,
+                        )
+                    request = {**kwargs, **tools_argument}
+                    if request_messages is not messages:
+                        request["messages"] = request_messages
+
+                    if loop_deadline is not None:
+                        # without tools, or with a forced final answer, the loop ends with this call
+                        timeout = loop_deadline.request_timeout(
+                            iterations, final=not tools_argument or force_final_answer
+                        )
+                        if isinstance(request.get("timeout"), (int, float)):
+                            timeout = min(timeout, request["timeout"])
+                        request["timeout"] = timeout
+
+                    request_started = None
+                    if hooks is not None:
+                        api_response = hooks.before_request(request)
+
+                    if api_response is None:
+                        with start_span(
+                            "chat.completions.create", {"gen_ai.request.model": model}
+                        ) as span:
+                            request_started = time.perf_counter()
+                            if hedging is not None:
+                                api_response = hedging.call(
+                                    chat_completion_create_method,
+                                    *args,
+                                    on_discarded=track_discarded,
+                                    **request,
+                                )
+                            else:
+                                api_response = chat_completion_create_method(
+                                    *args, **request
+                                )
+                            API_REQUEST_DURATION.observe(
+                                time.perf_counter() - request_started, model=model
+                            )
+
+                            usage = usage_to_dict(getattr(api_response, "usage", None))
+                            for token_type in ("prompt_tokens", "completion_tokens"):
+                                if token_type in usage:
+                                    TOKENS_PER_REQUEST.observe(
+                                        usage[token_type], model=model, type=token_type
+                                    )
+                            if span is not None:
+                                span.set_attributes(
+                                    {
+                                        f"gen_ai.usage.{key}": value
+                                        for key, value in usage.items()
+                                    }
+                                )
+
+                    if hooks is not None:
+                        hooks.after_response(request, api_response)
+                    last_response = api_response
+
+                    messages_before = len(messages)
+                    chat_loop_action = handle_response(
+                        loop_transport,
+                        api_response,
+                        token_usage_tracker,
+                        messages,
+                        model,
+                        tools,
+                        orch,
+                        action_handler,
+                        logger,
+                        output_limiter,
+                        request_started,
+                        hooks,
+                        triggered_by,
+                        loop_state,
+                        dedupe_tool_calls,
+                    )
+                    triggered_by = [
+                        message["name"]
+                        for message in messages[messages_before:]
+                        if isinstance(message, dict)
+                        and message.get("role") == loop_transport.result_role
+                    ]
+                except Exception as e:
+                    if loop_deadline is not None and loop_deadline.expired():
+                        chat_loop_action = deadline_exceeded(e)
+                    elif exception_handler:
+                        chat_loop_action = exception_handler.handle_exception(
+                            e,
+                            ChatLoopInfo(
+                                context={
+                                    "response": api_response,
+                                    loop_transport.toolset_name: tools,
+                                    "messages": messages,
+                                    "model": model,
+                                    "orch": orch,
+                                }
+                            ),
+                        )
+
+                    else:
+                        raise e
+
+                if isinstance(chat_loop_action, la.ReturnRightAway):
+                    LOOP_ITERATIONS.observe(iterations, model=model)
+                    return chat_loop_action.content
+                elif isinstance(chat_loop_action, la.Continue):
+                    tools = chat_loop_action.functions
+
+                    # once an output is stored, the LLM can page through it until the loop ends
+                    if (
+                        limiter_actions
+                        and output_limiter.stats["limited_outputs"] > limited_outputs
+                    ):
+                        tools = loop_transport.extend(tools, limiter_actions)
+                else:
+                    raise FunctionCallingLoopException(
+                        f"Unsupported chat loop action: {chat_loop_action}"
+                    )
+
+        def traced_create(*args, token_usage_tracker=None, **kwargs):
+            # usage is tracked in a child of the enclosing budget, and loops started by actions nest under this one
+            if token_usage_tracker is None:
+                token_usage_tracker = TokenUsageTracker(parent=get_current_tracker())
+            else:
+                # a tracker passed in is charged to the enclosing budget as well
+                token_usage_tracker = call_tracker(token_usage_tracker)
+            kwargs["token_usage_tracker"] = token_usage_tracker
+
+            with use_tracker(token_usage_tracker), use_deadline(deadline), start_span(
+                "actionweaver.chat_loop",
+                {"gen_ai.request.model": kwargs.get("model")},
+                tracer,
+            ):
+                if hooks is None:
+                    return new_create(*args, **kwargs)
+
+                try:
+                    result = new_create(*args, **kwargs)
+                except Exception as e:
+                    hooks.on_loop_end(kwargs.get("messages"), None, e)
+                    raise
+                hooks.on_loop_end(kwargs.get("messages"), result)
+                return result
+
+        if logger:
+            return traceable(
+                name=logging_name or DEFAULT_LOGGING_NAME,
+                logger=logger,
+                metadata=logging_metadata,
+                level=logging_level,
+                sample_rate=logging_sample_rate,
+                max_payload_chars=logging_max_payload_chars,
+            )(traced_create)(*args, **kwargs)
+        else:
+            return traced_create(*args, **kwargs)
+
+    return wrapper_for_logging
+
+
+def argument_check(
+    transport: Transport,
+    *args,
+    **kwargs,
+):
+    if "messages" not in kwargs:
+        raise FunctionCallingLoopException(
+            "messages keyword argument is required for chat completion"
+        )
+    if "model" not in kwargs:
+        raise FunctionCallingLoopException(
+            "model keyword argument is required for chat completion"
+        )
+
+    for argument in transport.reserved_arguments:
+        if argument in kwargs:
+            raise FunctionCallingLoopException(
+                f"{argument} keyword argument is not allowed for this method, use actions instead"
+            )
+
+
+def handle_response(
+    transport: Transport,
+    api_response,
+    token_usage_tracker,
+    messages,
+    model,
+    tools,
+    orch,
+    action_handler,
+    logger=None,
+    output_limiter=None,
+    request_started=None,
+    hooks=None,
+    triggered_by=None,
+    loop_state=None,
+    dedupe_tool_calls=False,
+) -> la.LoopAction:
+
+    # logic to handle streaming API response
+    if isinstance(api_response, Stream):
+        stream, message = transport.handle_stream(
+            observe_stream(api_response, model, request_started, hooks)
+        )
+        if stream is not None:
+            # a streamed answer is returned right away
+            return la.ReturnRightAway(content=stream)
+    else:
+        token_usage_tracker.track_usage(
+            api_response.usage, model=model, actions=triggered_by
+        )
+        message = api_response.choices[0].message
+
+    tool_calls = transport.tool_calls(message)
+    if tool_calls:
+        tools, (stop, resp) = invoke_tool(
+            transport,
+            messages,
+            model,
+            message,
+            tool_calls,
+            tools,
+            orch,
+            action_handler,
+            output_limiter,
+            hooks,
+            loop_state,
+            dedupe_tool_calls,
+        )
+        if stop:
+            return la.ReturnRightAway(content=resp)
+        else:
+            return la.Continue(functions=tools)
+    elif message.content is not None:
+        # the answer is returned whatever the finish reason, e.g. `stop` or `length`, asking again would only repeat it
+        return la.ReturnRightAway(content=api_response)
+    else:
+        raise FunctionCallingLoopException(
+            f"Unsupported response from OpenAI api: {api_response}"
+        )
@@ -0,0 +1,74 @@
+import collections
+import json
+from typing import Any, Dict, Optional, Tuple
+
+
+class LoopLimitException(Exception):
+    pass
+
+
+def canonical_arguments(arguments: Dict[str, Any]) -> str:
+    """Serialize tool call arguments so that identical calls get the same key, whatever the key order."""
+    return json.dumps(arguments, sort_keys=True, separators=(",", ":"), default=str)
+
+
+class LoopGuard:
+    """Detect cycles in the function calling loop.
+
+    Within a loop, a tool call with the same action name and arguments as an earlier call is served from the loop's
+    memo instead of calling the action again. Once any call is repeated more than `max_repeated_calls` times, or the
+    loop has made `max_iterations` API calls, the loop either raises `LoopLimitException` (`on_limit="raise"`), or makes
+    one last API call with `tool_choice="none"` to force a final answer (`on_limit="final_answer"`).
+
+    `stats` counts memo hits and reached limits across loops.
+    """
+
+    def __init__(
+        self,
+        max_repeated_calls: int = 2,
+        max_iterations: Optional[int] = None,
+        on_limit: str = "final_answer",
+    ):
+        if on_limit not in ("final_answer", "raise"):
+            raise ValueError(
+                f"on_limit must be 'final_answer' or 'raise', found {on_limit}"
+            )
+        self.max_repeated_calls = max_repeated_calls
+        self.max_iterations = max_iterations
+        self.on_limit = on_limit
+        self.stats = collections.Counter()
+
+    def new_state(self) -> "LoopGuardState":
+        return LoopGuardState(self)
+
+
+class LoopGuardState:
+    """Memo and repeat counts of a single loop."""
+
+    def __init__(self, guard: LoopGuard):
+        self.guard = guard
+        self.memo: Dict[Tuple[str, str], Any] = {}
+        self.repeats = collections.Counter()
+        self.repeat_limit_reached = False
+
+    def lookup(self, name: str, arguments: Dict[str, Any]) -> Tuple[bool, Any]:
+        """Return `(True, output)` if the call was already made in this loop, `(False, None)` otherwise."""
+        key = (name, canonical_arguments(arguments))
+        if key not in self.memo:
+            return False, None
+
+        self.repeats[key] += 1
+        self.guard.stats["memo_hits"] += 1
+        if self.repeats[key] > self.guard.max_repeated_calls:
+            self.repeat_limit_reached = True
+        return True, self.memo[key]
+
+    def store(self, name: str, arguments: Dict[str, Any], output: Any):
+        self.memo[(name, canonical_arguments(arguments))] = output
+
+    def limit_reached(self, iterations: int) -> bool:
+        """Whether the API call `iterations`, starting at 1, is past a limit."""
+        max_iterations = self.guard.max_iterations
+        return self.repeat_limit_reached or (
+            max_iterations is not None and iterations > max_iterations
+        )
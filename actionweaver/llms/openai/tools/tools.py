@@ -12,7 +12,7 @@ class Tools:
         self.tool_choice = tool_choice
 
     @classmethod
-    def from_expr(cls, expr):
+    def from_expr(cls, expr, compact_schema: bool = False):
 
         if expr is None:
             return cls()
@@ -28,7 +28,7 @@ class Tools:
                         "function": {
                             "name": expr.name,
                             "description": expr.description,
-                            "parameters": expr.json_schema(),
+                            "parameters": expr.json_schema(compact_schema),
                         },
                     }
                 ],
@@ -41,7 +41,7 @@ class Tools:
                         "function": {
                             "name": action.name,
                             "description": action.description,
-                            "parameters": action.json_schema(),
+                            "parameters": action.json_schema(compact_schema),
                         },
                     }
                     for action in expr
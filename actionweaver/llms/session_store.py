@@ -0,0 +1,294 @@
+import collections
+import json
+import mmap
+import os
+import re
+import threading
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from actionweaver.actions.action import Action
+from actionweaver.llms.conversation import Conversation
+from actionweaver.utils.tokens import TokenUsageTracker
+
+_SESSION_ID = re.compile(r"^[A-Za-z0-9_.-]+$")
+
+
+class SessionStoreException(Exception):
+    pass
+
+
+def _encode_orch(orch: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """Orch with actions replaced by their names, a single action is encoded as `{"action": name}`."""
+    if orch is None:
+        return None
+
+    def encode(value):
+        if isinstance(value, list):
+            return [action.name for action in value]
+        if isinstance(value, Action):
+            return {"action": value.name}
+        return value
+
+    return {key: encode(value) for key, value in orch.items()}
+
+
+def _decode_orch(
+    orch: Optional[Dict[str, Any]], actions: List[Action]
+) -> Optional[Dict[str, Any]]:
+    if orch is None:
+        return None
+    by_name = {action.name: action for action in actions}
+
+    def resolve(name):
+        if name not in by_name:
+            raise SessionStoreException(
+                f"Action {name} of the session orch is missing, pass it in `actions`"
+            )
+        return by_name[name]
+
+    def decode(value):
+        if isinstance(value, list):
+            return [resolve(name) for name in value]
+        if isinstance(value, dict):
+            return resolve(value["action"])
+        return value
+
+    return {key: decode(value) for key, value in orch.items()}
+
+
+class SessionState:
+    """State of a session replayed from its log: messages, latest orch, and total token usage and cost."""
+
+    def __init__(self):
+        self.messages: List[Dict[str, Any]] = []
+        self.orch: Optional[Dict[str, Any]] = None
+        self.usage = collections.Counter()
+        self.cost = 0.0
+        # records appended since the last compaction
+        self.records = 0
+
+    def apply(self, record: Dict[str, Any]) -> None:
+        kind = record.get("type")
+        if kind == "snapshot":
+            self.messages = list(record["messages"])
+            self.orch = record["orch"]
+            self.usage = collections.Counter(record["usage"])
+            self.cost = record["cost"]
+            self.records = 0
+            return
+
+        if kind == "message":
+            self.messages.append(record["message"])
+        elif kind == "orch":
+            self.orch = record["orch"]
+        elif kind == "usage":
+            self.usage.update(record["usage"])
+            self.cost += record["cost"]
+        else:
+            raise SessionStoreException(f"Unknown session record type: {kind}")
+        self.records += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "type": "snapshot",
+            "messages": self.messages,
+            "orch": self.orch,
+            "usage": dict(self.usage),
+            "cost": self.cost,
+        }
+
+
+class Session:
+    """A conversation persisted in a `SessionStore`, resumed by any worker with `SessionStore.open`.
+
+    Pass `messages`, `orch` and `tracker` to the chat loop, then call `save` to append what changed to the log:
+    new messages, the orch if it changed, and the token usage since the last save.
+
+    Example:
+        session = store.open("user-42", actions=[get_current_time])
+        session.messages += [{"role": "user", "content": "what time is it"}]
+        client.create(
+            model="gpt-4o",
+            messages=session.messages,
+            actions=[get_current_time],
+            orch=session.orch,
+            token_usage_tracker=session.tracker,
+        )
+        session.save()
+    """
+
+    def __init__(
+        self,
+        store: "SessionStore",
+        session_id: str,
+        state: SessionState,
+        actions: Optional[List[Action]] = None,
+    ):
+        self.store = store
+        self.session_id = session_id
+        self.messages = Conversation(state.messages)
+        self.orch = _decode_orch(state.orch, actions or [])
+
+        self.tracker = TokenUsageTracker()
+        self.tracker.tracker = collections.Counter(state.usage)
+        self.tracker.cost = state.cost
+
+        # what the log already contains
+        self._saved_messages = len(state.messages)
+        self._saved_orch = state.orch
+        self._saved_usage = collections.Counter(state.usage)
+        self._saved_cost = state.cost
+
+    def save(self) -> int:
+        """Append the changes since the last save to the log, returns the number of records appended."""
+        records = [
+            {"type": "message", "message": message}
+            for message in self.messages.to_wire()[self._saved_messages :]
+        ]
+
+        orch = _encode_orch(self.orch)
+        if orch != self._saved_orch:
+            records.append({"type": "orch", "orch": orch})
+
+        usage = collections.Counter(self.tracker.tracker)
+        usage.subtract(self._saved_usage)
+        usage = {key: value for key, value in usage.items() if value}
+        cost = self.tracker.cost - self._saved_cost
+        if usage or cost:
+            records.append({"type": "usage", "usage": usage, "cost": cost})
+
+        self.store.append(self.session_id, records)
+
+        self._saved_messages = len(self.messages)
+        self._saved_orch = orch
+        self._saved_usage = collections.Counter(self.tracker.tracker)
+        self._saved_cost = self.tracker.cost
+        return len(records)
+
+
+class SessionStore:
+    """Append-only log of records per session in `directory`, one JSON record per line in `<session_id>.jsonl`.
+
+    Logs are read through a memory map to resume a session. A log is compacted into a single snapshot record
+    once `compact_every` records were appended after the previous snapshot, the snapshot replaces the file
+    atomically. A partial last line, e.g. left by a crashed worker, is ignored and removed on the next `open`.
+
+    A session must have a single writer at a time, appends are serialized within a store only.
+    """
+
+    def __init__(
+        self, directory: str, compact_every: Optional[int] = 1000, fsync=False
+    ):
+        self.directory = directory
+        self.compact_every = compact_every
+        self.fsync = fsync
+        self._lock = threading.Lock()
+        # records appended since the last compaction, per session
+        self._records: Dict[str, int] = {}
+        os.makedirs(directory, exist_ok=True)
+
+    def path(self, session_id: str) -> str:
+        if not _SESSION_ID.match(session_id):
+            raise SessionStoreException(f"Invalid session id: {session_id!r}")
+        return os.path.join(self.directory, f"{session_id}.jsonl")
+
+    def exists(self, session_id: str) -> bool:
+        return os.path.exists(self.path(session_id))
+
+    def sessions(self) -> List[str]:
+        return sorted(
+            name[: -len(".jsonl")]
+            for name in os.listdir(self.directory)
+            if name.endswith(".jsonl")
+        )
+
+    def delete(self, session_id: str) -> None:
+        with self._lock:
+            self._records.pop(session_id, None)
+            if self.exists(session_id):
+                os.remove(self.path(session_id))
+
+    def open(self, session_id: str, actions: Optional[List[Action]] = None) -> Session:
+        """Resume a session from its log, or start a new one. `actions` resolve the action names of the orch."""
+        return Session(self, session_id, self.load(session_id), actions)
+
+    def load(self, session_id: str) -> SessionState:
+        with self._lock:
+            state = SessionState()
+            records, size = self._read(session_id)
+            for record in records:
+                state.apply(record)
+
+            path = self.path(session_id)
+            if os.path.exists(path) and os.path.getsize(path) > size:
+                # drop a partial last line, so the next append starts on a new line
+                os.truncate(path, size)
+            self._records[session_id] = state.records
+            return state
+
+    def records(self, session_id: str) -> Iterator[Dict[str, Any]]:
+        records, _ = self._read(session_id)
+        return iter(records)
+
+    def append(self, session_id: str, records: List[Dict[str, Any]]) -> None:
+        if not records:
+            return
+        data = "".join(json.dumps(record) + "\n" for record in records)
+
+        with self._lock:
+            # a single write per save, with O_APPEND the records land at the end of the log together
+            with open(self.path(session_id), "a", encoding="utf-8") as f:
+                f.write(data)
+                if self.fsync:
+                    f.flush()
+                    os.fsync(f.fileno())
+
+            count = self._records.get(session_id, 0) + len(records)
+            self._records[session_id] = count
+            if self.compact_every is not None and count >= self.compact_every:
+                self._compact(session_id)
+
+    def compact(self, session_id: str) -> None:
+        """Replace the log of a session with a single snapshot record."""
+        with self._lock:
+            self._compact(session_id)
+
+    def _compact(self, session_id: str) -> None:
+        state = SessionState()
+        for record in self._read(session_id)[0]:
+            state.apply(record)
+
+        path = self.path(session_id)
+        tmp = f"{path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(json.dumps(state.snapshot()) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+        self._records[session_id] = 0
+
+    def _read(self, session_id: str) -> Tuple[List[Dict[str, Any]], int]:
+        """Records of the complete lines of a session log, and the size of these lines in bytes."""
+        path = self.path(session_id)
+        if not os.path.exists(path) or os.path.getsize(path) == 0:
+            return [], 0
+
+        records = []
+        with open(path, "rb") as f, mmap.mmap(
+            f.fileno(), 0, access=mmap.ACCESS_READ
+        ) as mm:
+            start = 0
+            while True:
+                end = mm.find(b"\n", start)
+                if end == -1:
+                    break
+                line = mm[start:end]
+                if line.strip():
+                    try:
+                        records.append(json.loads(line))
+                    except ValueError as e:
+                        raise SessionStoreException(
+                            f"Corrupt record at byte {start} of {path}"
+                        ) from e
+                start = end + 1
+        return records, start
@@ -0,0 +1,263 @@
+import collections
+import json
+import uuid
+from abc import ABC, abstractmethod
+from typing import Any, Dict, List, Optional, Tuple
+
+from actionweaver.actions.action import Action
+from actionweaver.actions.factories.function import action
+
+
+class OutputStrategy(ABC):
+    """Base class for strategies shrinking a tool output that exceeds its size limit."""
+
+    @abstractmethod
+    def render(self, name: str, text: str, output: Any, max_chars: int) -> str:
+        """Return the content sent to the LLM for the output of action `name`.
+
+        `text` is `str(output)`, and is longer than `max_chars`.
+        """
+        pass
+
+    def actions(self) -> List[Action]:
+        """Extra actions the LLM needs to use the rendered content, registered in the chat loop."""
+        return []
+
+    def stores(self) -> List["OutputStore"]:
+        """Stores the full outputs are kept in, read by the LLM with a single `ReadToolOutput` action."""
+        return []
+
+
+class HeadTailTruncation(OutputStrategy):
+    """Keep the beginning and the end of the output, and drop the middle."""
+
+    def __init__(self, head_ratio: float = 0.7):
+        self.head_ratio = head_ratio
+
+    @staticmethod
+    def _marker(omitted: int) -> str:
+        return f"\n... [{omitted} characters truncated] ...\n"
+
+    def render(self, name, text, output, max_chars):
+        # the marker is part of the budget, it is at most as long as with `len(text)` omitted characters
+        available = max_chars - len(self._marker(len(text)))
+        if available <= 0:
+            return text[:max_chars]
+
+        head = int(available * self.head_ratio)
+        tail = available - head
+        omitted = len(text) - head - tail
+        return text[:head] + self._marker(omitted) + (text[-tail:] if tail > 0 else "")
+
+
+class StructuredSummary(OutputStrategy):
+    """Describe the shape of list and dict outputs (size, keys, first items) instead of dumping them.
+
+    Other outputs fall back to `fallback`, head/tail truncation by default.
+    """
+
+    def __init__(self, max_items: int = 3, fallback: Optional[OutputStrategy] = None):
+        self.max_items = max_items
+        self.fallback = fallback or HeadTailTruncation()
+
+    def _describe(self, output, max_chars) -> str:
+        if isinstance(output, dict):
+            keys = list(output.keys())
+            preview = {key: output[key] for key in keys[: self.max_items]}
+            lines = [
+                f"dict with {len(keys)} keys: {', '.join(str(key) for key in keys)}",
+                f"first {len(preview)} entries: {self._dumps(preview)}",
+            ]
+        elif isinstance(output, (list, tuple)):
+            lines = [f"{type(output).__name__} with {len(output)} items"]
+            if output and isinstance(output[0], dict):
+                lines.append(f"item keys: {', '.join(str(k) for k in output[0])}")
+            lines.append(
+                f"first {min(len(output), self.max_items)} items: {self._dumps(list(output[: self.max_items]))}"
+            )
+        else:
+            return None
+        summary = "\n".join(lines)
+        return summary if len(summary) <= max_chars else None
+
+    @staticmethod
+    def _dumps(value) -> str:
+        try:
+            return json.dumps(value, default=str)
+        except (TypeError, ValueError):
+            return str(value)
+
+    def render(self, name, text, output, max_chars):
+        summary = self._describe(output, max_chars)
+        if summary is None:
+            return self.fallback.render(name, text, output, max_chars)
+        return summary
+
+    def actions(self):
+        return self.fallback.actions()
+
+    def stores(self):
+        return self.fallback.stores()
+
+
+class OutputStore:
+    """In-memory store for full tool outputs, paged through by the LLM with the `ReadToolOutput` action."""
+
+    def __init__(self, page_size: int = 4000, max_entries: int = 128):
+        self.page_size = page_size
+        self.max_entries = max_entries
+        # handle -> (text, page size)
+        self._outputs: Dict[str, Tuple[str, int]] = collections.OrderedDict()
+        self._action = None
+
+    def put(self, text: str, page_size: Optional[int] = None) -> str:
+        """Store `text`, paged by `page_size` instead of the store's page size if given."""
+        handle = f"out_{uuid.uuid4().hex[:12]}"
+        self._outputs[handle] = (text, page_size or self.page_size)
+        while len(self._outputs) > self.max_entries:
+            self._outputs.popitem(last=False)
+        return handle
+
+    def pages(self, handle: str) -> int:
+        text, page_size = self._outputs[handle]
+        return max(1, -(-len(text) // page_size))
+
+    def read(self, handle: str, page: int = 1) -> str:
+        if handle not in self._outputs:
+            return f"Unknown or expired output handle: {handle}"
+        pages = self.pages(handle)
+        if page < 1 or page > pages:
+            return f"Page {page} out of range, {handle} has {pages} pages"
+
+        text, page_size = self._outputs[handle]
+        start = (page - 1) * page_size
+        return f"[page {page}/{pages}]\n" + text[start : start + page_size]
+
+    def __len__(self):
+        return len(self._outputs)
+
+    def __contains__(self, handle: str) -> bool:
+        return handle in self._outputs
+
+    def action(self) -> Action:
+        if self._action is None:
+            self._action = read_action([self])
+        return self._action
+
+
+def read_action(stores: List[OutputStore]) -> Action:
+    """The `ReadToolOutput` action, reading a page of the output of a handle from the store holding it."""
+
+    def read_tool_output(handle: str, page: int = 1):
+        """Read a page of a large tool output stored under a handle."""
+        for store in stores:
+            if handle in store:
+                return store.read(handle, page)
+        return stores[0].read(handle, page)
+
+    return action("ReadToolOutput")(read_tool_output)
+
+
+class SpillToStore(OutputStrategy):
+    """Store the full output and send the first page with a handle, the LLM reads further pages on demand."""
+
+    def __init__(self, store: Optional[OutputStore] = None):
+        self.store = store if store is not None else OutputStore()
+
+    def _notice(self, name, text, handle, pages, next_page):
+        return (
+            f"[Output of {name} has {len(text)} characters, stored as {handle} in {pages} pages. "
+            f"Call {self.store.action().name} with the handle and page {next_page} to read more.]\n"
+        )
+
+    def render(self, name, text, output, max_chars):
+        # pages are as long as what fits next to the notice, so the first page is sent whole and the LLM goes on
+        # with the second one; handles and page numbers are at most as long as their placeholders
+        placeholder = self._notice(name, text, "out_" + "0" * 12, len(text), 2)
+        overhead = len(placeholder) + len(f"[page 1/{len(text)}]\n")
+        page_size = min(self.store.page_size, max_chars - overhead)
+
+        if page_size < 1:
+            # nothing fits next to the notice, the LLM reads from the first page
+            handle = self.store.put(text)
+            return self._notice(name, text, handle, self.store.pages(handle), 1)
+
+        handle = self.store.put(text, page_size)
+        return self._notice(
+            name, text, handle, self.store.pages(handle), 2
+        ) + self.store.read(handle, 1)
+
+    def actions(self):
+        return [self.store.action()]
+
+    def stores(self):
+        return [self.store]
+
+
+class OutputLimit:
+    def __init__(self, max_chars: int, strategy: Optional[OutputStrategy] = None):
+        self.max_chars = max_chars
+        self.strategy = strategy or HeadTailTruncation()
+
+
+class OutputLimiter:
+    """Cap the size of tool outputs sent back to the LLM in the function calling loop.
+
+    `max_chars` and `strategy` apply to every action, `per_action` overrides them by action name.
+    `stats` counts limited outputs and characters saved.
+    """
+
+    def __init__(
+        self,
+        max_chars: Optional[int] = None,
+        strategy: Optional[OutputStrategy] = None,
+        per_action: Optional[Dict[str, OutputLimit]] = None,
+    ):
+        self.default = (
+            OutputLimit(max_chars, strategy) if max_chars is not None else None
+        )
+        self.per_action = per_action or {}
+        self.stats = collections.Counter()
+        # read action of several stores, rebuilt if the stores change
+        self._read_action = None
+        self._read_stores = ()
+
+        # outputs of the limiter's own actions, e.g. pages of a stored output, are never limited again
+        self._exempt = {act.name for act in self.actions()}
+
+    def limit_for(self, name: str) -> Optional[OutputLimit]:
+        return self.per_action.get(name, self.default)
+
+    def render(self, name: str, output: Any) -> str:
+        text = str(output)
+        if name in self._exempt:
+            return text
+
+        limit = self.limit_for(name)
+        if limit is None or len(text) <= limit.max_chars:
+            return text
+
+        content = limit.strategy.render(name, text, output, limit.max_chars)
+        self.stats["limited_outputs"] += 1
+        self.stats["chars_saved"] += len(text) - len(content)
+        return content
+
+    def actions(self) -> List[Action]:
+        limits = list(self.per_action.values())
+        if self.default is not None:
+            limits.append(self.default)
+
+        actions, stores = {}, {}
+        for limit in limits:
+            for act in limit.strategy.actions():
+                actions[act.name] = act
+            for store in limit.strategy.stores():
+                stores[id(store)] = store
+
+        if len(stores) > 1:
+            # actions are registered by name, a single read action looks handles up in every store
+            if tuple(stores) != self._read_stores:
+                self._read_action = read_action(list(stores.values()))
+                self._read_stores = tuple(stores)
+            actions[self._read_action.name] = self._read_action
+        return list(actions.values())
@@ -0,0 +1,225 @@
+import collections
+import hashlib
+import math
+import os
+import re
+from abc import ABC, abstractmethod
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from actionweaver.actions.action import Action
+from actionweaver.utils.messages import latest_query_messages, message_content
+
+_CAMEL_CASE = re.compile(r"([a-z0-9])([A-Z])")
+_TOKEN = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase word tokenizer that also splits camelCase and snake_case identifiers."""
+    return _TOKEN.findall(_CAMEL_CASE.sub(r"\1 \2", text or "").lower())
+
+
+def action_document(action: Action) -> str:
+    """Text indexed for an action: its name and description."""
+    return f"{action.name} {action.description or ''}"
+
+
+class ToolSelector(ABC):
+    """Base class for tool selectors.
+
+    A tool selector narrows down the actions sent to the LLM on each iteration of the function calling loop
+    to the `top_k` most relevant ones for the latest user and tool messages.
+    """
+
+    def __init__(self, top_k: int = 10):
+        if top_k < 1:
+            raise ValueError(f"top_k must be a positive integer, found {top_k}")
+        self.top_k = top_k
+
+    @abstractmethod
+    def rank(self, actions: List[Action], query: str) -> List[float]:
+        """Return a relevance score for each action, higher is more relevant."""
+        pass
+
+    def select(self, actions: List[Action], messages: List) -> List[Action]:
+        if len(actions) <= self.top_k:
+            return actions
+
+        query = " ".join(
+            message_content(message) for message in latest_query_messages(messages)
+        )
+        if not query.strip():
+            return actions[: self.top_k]
+
+        indices = self.top_indices(self.rank(actions, query))
+        return [actions[i] for i in sorted(indices)]
+
+    def top_indices(self, scores) -> List[int]:
+        # stable ranking, ties keep the registration order
+        order = sorted(range(len(scores)), key=lambda i: -scores[i])
+        return order[: self.top_k]
+
+
+class _BM25Index:
+    def __init__(self, documents: Sequence[List[str]], k1: float, b: float):
+        self.k1 = k1
+        self.b = b
+        self.term_frequencies = [collections.Counter(doc) for doc in documents]
+        self.doc_lengths = [len(doc) for doc in documents]
+        self.avg_doc_length = (sum(self.doc_lengths) / len(documents)) or 1.0
+
+        document_frequency = collections.Counter()
+        for doc in documents:
+            document_frequency.update(set(doc))
+
+        n = len(documents)
+        self.idf = {
+            term: math.log(1 + (n - df + 0.5) / (df + 0.5))
+            for term, df in document_frequency.items()
+        }
+
+    def scores(self, query_terms: List[str]) -> List[float]:
+        query_terms = [term for term in set(query_terms) if term in self.idf]
+
+        scores = []
+        for tf, length in zip(self.term_frequencies, self.doc_lengths):
+            norm = self.k1 * (1 - self.b + self.b * length / self.avg_doc_length)
+            score = 0.0
+            for term in query_terms:
+                freq = tf.get(term)
+                if freq:
+                    score += self.idf[term] * freq * (self.k1 + 1) / (freq + norm)
+            scores.append(score)
+        return scores
+
+
+class BM25ToolSelector(ToolSelector):
+    """Rank actions with BM25 over their names and descriptions.
+
+    The index is built once per set of actions and reused across loop iterations and requests.
+    """
+
+    def __init__(self, top_k: int = 10, k1: float = 1.5, b: float = 0.75):
+        super().__init__(top_k)
+        self.k1 = k1
+        self.b = b
+        self._indexes: Dict[Tuple[str, ...], _BM25Index] = {}
+
+    def _get_index(self, actions: List[Action]) -> _BM25Index:
+        key = tuple(action.name for action in actions)
+        index = self._indexes.get(key)
+        if index is None:
+            index = _BM25Index(
+                [tokenize(action_document(action)) for action in actions],
+                self.k1,
+                self.b,
+            )
+            self._indexes[key] = index
+        return index
+
+    def rank(self, actions: List[Action], query: str) -> List[float]:
+        return self._get_index(actions).scores(tokenize(query))
+
+
+EmbeddingFunction = Callable[[List[str]], Sequence[Sequence[float]]]
+
+
+def _import_numpy():
+    try:
+        import numpy as np
+    except ImportError:
+        raise ImportError("`numpy` package not found, please run `pip install numpy`")
+    return np
+
+
+class _EmbeddingIndex:
+    def __init__(self, matrix):
+        np = _import_numpy()
+        matrix = np.asarray(matrix, dtype=np.float32)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        self.matrix = matrix / norms
+
+    def scores(self, query_embedding):
+        np = _import_numpy()
+        query = np.asarray(query_embedding, dtype=np.float32).reshape(-1)
+        norm = np.linalg.norm(query)
+        if norm:
+            query = query / norm
+        return self.matrix @ query
+
+
+class EmbeddingToolSelector(ToolSelector):
+    """Rank actions by cosine similarity between the query and the action description embeddings.
+
+    `embedding_function` is any callable mapping a list of texts to a list of vectors, e.g. a local
+    sentence-transformers model. Action embeddings are computed once per set of actions, and saved
+    under `cache_dir` if given, so they are only recomputed when names or descriptions change.
+
+    `model_name` identifies the embedding model in the cache, it is required with `cache_dir` so embeddings of
+    another model are never loaded.
+    """
+
+    def __init__(
+        self,
+        embedding_function: EmbeddingFunction,
+        top_k: int = 10,
+        cache_dir: Optional[str] = None,
+        model_name: Optional[str] = None,
+    ):
+        super().__init__(top_k)
+        _import_numpy()
+        if cache_dir is not None and not model_name:
+            raise ValueError("model_name is required to cache embeddings in cache_dir")
+        self.embedding_function = embedding_function
+        self.cache_dir = cache_dir
+        self.model_name = model_name
+        self._indexes: Dict[Tuple[str, ...], _EmbeddingIndex] = {}
+
+    def _cache_file(self, documents: List[str]) -> Optional[str]:
+        if self.cache_dir is None:
+            return None
+        digest = hashlib.sha256(
+            "\x00".join([self.model_name] + documents).encode("utf-8")
+        ).hexdigest()
+        return os.path.join(self.cache_dir, f"tool_embeddings_{digest[:32]}.npy")
+
+    def _embed_documents(self, documents: List[str], dimension: int):
+        np = _import_numpy()
+
+        path = self._cache_file(documents)
+        if path is not None and os.path.exists(path):
+            matrix = np.load(path)
+            # embeddings of another model are recomputed, they can't be compared with the query
+            if matrix.shape == (len(documents), dimension):
+                return matrix
+
+        matrix = np.asarray(self.embedding_function(documents), dtype=np.float32)
+        if matrix.shape[0] != len(documents):
+            raise ValueError(
+                f"Embedding function returned {matrix.shape[0]} embeddings for {len(documents)} texts"
+            )
+
+        if path is not None:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            np.save(path, matrix)
+        return matrix
+
+    def _get_index(self, actions: List[Action], dimension: int) -> _EmbeddingIndex:
+        key = tuple(action.name for action in actions)
+        index = self._indexes.get(key)
+        if index is None:
+            documents = [action_document(action) for action in actions]
+            index = _EmbeddingIndex(self._embed_documents(documents, dimension))
+            self._indexes[key] = index
+        return index
+
+    def rank(self, actions: List[Action], query: str):
+        (query_embedding,) = self.embedding_function([query])
+        index = self._get_index(actions, len(query_embedding))
+        return index.scores(query_embedding)
+
+    def top_indices(self, scores) -> List[int]:
+        np = _import_numpy()
+        if self.top_k >= len(scores):
+            return list(range(len(scores)))
+        return np.argpartition(-scores, self.top_k - 1)[: self.top_k].tolist()
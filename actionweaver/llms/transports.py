@@ -0,0 +1,287 @@
+import copy
+from abc import ABC, abstractmethod
+from collections import defaultdict
+from itertools import chain
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from openai.types.chat.chat_completion_message import (
+    ChatCompletionMessage,
+    FunctionCall,
+)
+from openai.types.chat.chat_completion_message_tool_call import (
+    ChatCompletionMessageToolCall,
+)
+
+from actionweaver.actions.action import Action
+from actionweaver.llms.azure.functions import Functions
+from actionweaver.llms.openai.tools.tools import Tools
+from actionweaver.utils.stream import get_first_element_and_iterator, merge_dicts
+
+
+class FunctionCallingLoopException(Exception):
+    def __init__(self, message="", extra_info=None):
+        super().__init__(message)
+        self.extra_info = extra_info or {}
+
+    def __str__(self):
+        # Customize the string representation to include extra_info
+        extra_info_str = ", ".join(
+            f"{key}: {value}" for key, value in self.extra_info.items()
+        )
+        return f"{super().__str__()} | Additional Info: [{extra_info_str}]"
+
+
+class TransportException(FunctionCallingLoopException):
+    pass
+
+
+class Transport(ABC):
+    """Request and response shapes of a chat completion API flavour, e.g. tools or (legacy) functions.
+
+    The chat loop engine only deals with toolsets built by the transport, and with tool calls normalized to
+    `{"id": ..., "function": {"name": ..., "arguments": ...}}` dicts.
+    """
+
+    # keyword arguments of the API set by the loop, callers pass actions instead
+    reserved_arguments: Tuple[str, ...] = ()
+    # name of the toolset in `ChatLoopInfo.context` and of the tool definitions in the request
+    toolset_name = ""
+    # role of the messages carrying tool outputs
+    result_role = ""
+
+    def __init__(self, compact_schema: bool = False):
+        # send compact parameter schemas, see `actionweaver.utils.schema.compact_schema`
+        self.compact_schema = compact_schema
+
+    def with_compact_schema(self, compact_schema: bool) -> "Transport":
+        if compact_schema == self.compact_schema:
+            return self
+        transport = copy.copy(self)
+        transport.compact_schema = compact_schema
+        return transport
+
+    @abstractmethod
+    def from_expr(self, expr):
+        """Build the toolset of an orchestration expression: None, an action (forced call) or a list of actions."""
+        pass
+
+    @abstractmethod
+    def definitions(self, toolset) -> List[Dict]:
+        """Tool definitions sent in the request."""
+        pass
+
+    @abstractmethod
+    def is_auto(self, toolset) -> bool:
+        """Whether the model chooses among the tools, as opposed to a forced call."""
+        pass
+
+    @abstractmethod
+    def definition_name(self, definition: Dict) -> str:
+        pass
+
+    @abstractmethod
+    def with_definitions(self, toolset, definitions: List[Dict]):
+        pass
+
+    @abstractmethod
+    def to_arguments(self, toolset, force_final_answer: bool = False) -> Dict:
+        """Keyword arguments of the API call, `force_final_answer` disables tool calls."""
+        pass
+
+    @abstractmethod
+    def tool_calls(self, message) -> List[Dict]:
+        """Normalized tool calls of a response message, empty if the model answered."""
+        pass
+
+    @abstractmethod
+    def assistant_message(self, message, tool_calls: List[Dict]):
+        """Message appended to the conversation for a response with tool calls."""
+        pass
+
+    @abstractmethod
+    def result_message(self, tool_call: Dict, name: str, content: str) -> Dict:
+        """Message carrying the output of a tool call."""
+        pass
+
+    @abstractmethod
+    def stop_content(self, outputs: List[Any]) -> Any:
+        """Result returned by the loop when a `stop` action was called, given the outputs of its calls."""
+        pass
+
+    @abstractmethod
+    def handle_stream(self, chunks: Iterable) -> Tuple[Optional[Iterable], Any]:
+        """Return `(stream, None)` for a streamed answer, returned to the caller as is, or `(None, message)` with the
+        tool calls merged into a message."""
+        pass
+
+    def names(self, toolset) -> List[str]:
+        return [self.definition_name(d) for d in self.definitions(toolset)]
+
+    def from_action(self, action: Action) -> Dict:
+        return self.definitions(self.from_expr([action]))[0]
+
+    def extend(self, toolset, actions: List[Action]):
+        """Add actions to a toolset, unless the orchestration forces a tool choice."""
+        if not actions or not self.is_auto(toolset):
+            return toolset
+
+        names = set(self.names(toolset))
+        extra = [self.from_action(a) for a in actions if a.name not in names]
+        if not extra:
+            return toolset
+        return self.with_definitions(toolset, self.definitions(toolset) + extra)
+
+
+class ToolsTransport(Transport):
+    """`tools` and `tool_choice` arguments, several tool calls per response."""
+
+    reserved_arguments = ("tools", "tool_choice")
+    toolset_name = "tools"
+    result_role = "tool"
+
+    def from_expr(self, expr) -> Tools:
+        return Tools.from_expr(expr, self.compact_schema)
+
+    def definitions(self, toolset: Tools):
+        return toolset.tools or []
+
+    def is_auto(self, toolset: Tools):
+        return toolset.tool_choice == "auto"
+
+    def definition_name(self, definition):
+        return definition["function"]["name"]
+
+    def with_definitions(self, toolset: Tools, definitions):
+        return Tools(tool_choice=toolset.tool_choice, tools=definitions)
+
+    def to_arguments(self, toolset: Tools, force_final_answer=False):
+        arguments = toolset.to_arguments()
+        if force_final_answer:
+            arguments["tool_choice"] = "none"
+        return arguments
+
+    def tool_calls(self, message):
+        return [
+            (
+                tool_call.model_dump()
+                if isinstance(tool_call, ChatCompletionMessageToolCall)
+                else tool_call
+            )
+            for tool_call in message.tool_calls or []
+        ]
+
+    def assistant_message(self, message, tool_calls):
+        return message
+
+    def result_message(self, tool_call, name, content):
+        return {
+            "tool_call_id": tool_call["id"],
+            "role": "tool",
+            "name": name,
+            "content": content,
+        }
+
+    def stop_content(self, outputs):
+        return outputs
+
+    def handle_stream(self, chunks):
+        first_element, iterator = get_first_element_and_iterator(chunks)
+
+        if first_element.choices[0].delta.content is not None:
+            # if the first element is a message, return generator right away.
+            return iterator, None
+
+        # if the first element is a tool call, merge all tool calls into first response and return it
+        deltas = {}
+        for element in iterator:
+            delta = element.choices[0].delta.model_dump()
+            deltas = merge_dicts(deltas, delta)
+
+        chat_completion_message_tool_call = defaultdict(dict)
+        for tool_delta in deltas["tool_calls"]:
+            chat_completion_message_tool_call[tool_delta["index"]] = merge_dicts(
+                chat_completion_message_tool_call[tool_delta["index"]],
+                tool_delta,
+            )
+            tool_delta.pop("index")
+
+        deltas["tool_calls"] = list(chat_completion_message_tool_call.values())
+
+        # (HACK) Remove the 'function_call' field, otherwise calling the API will fail
+        if "function_call" in deltas:
+            del deltas["function_call"]
+
+        return None, ChatCompletionMessage(**deltas)
+
+
+class FunctionsTransport(Transport):
+    """Legacy `functions` and `function_call` arguments, one function call per response."""
+
+    reserved_arguments = ("functions", "function_call")
+    toolset_name = "functions"
+    result_role = "function"
+
+    def from_expr(self, expr) -> Functions:
+        return Functions.from_expr(expr, self.compact_schema)
+
+    def definitions(self, toolset: Functions):
+        return toolset.functions or []
+
+    def is_auto(self, toolset: Functions):
+        return toolset.function_call == "auto"
+
+    def definition_name(self, definition):
+        return definition["name"]
+
+    def with_definitions(self, toolset: Functions, definitions):
+        return Functions(function_call=toolset.function_call, functions=definitions)
+
+    def to_arguments(self, toolset: Functions, force_final_answer=False):
+        arguments = toolset.to_arguments()
+        if force_final_answer:
+            arguments["function_call"] = "none"
+        return arguments
+
+    def tool_calls(self, message):
+        function_call = message.function_call
+        if not function_call:
+            return []
+        if isinstance(function_call, FunctionCall):
+            function_call = function_call.model_dump()
+        return [{"id": None, "function": function_call}]
+
+    def assistant_message(self, message, tool_calls):
+        return {
+            "role": "assistant",
+            "content": None,
+            "function_call": tool_calls[0]["function"],
+        }
+
+    def result_message(self, tool_call, name, content):
+        return {"role": "function", "name": name, "content": content}
+
+    def stop_content(self, outputs):
+        return outputs[0]
+
+    def handle_stream(self, chunks):
+        iterator = iter(chunks)
+        function_call = None
+        for chunk in iterator:
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta
+
+            if delta.function_call:
+                if function_call is None:
+                    # if function call detected, we merge all deltas and treat it as the non-stream response
+                    function_call = FunctionCall(name="", arguments="")
+                function_call.name += delta.function_call.name or ""
+                function_call.arguments += delta.function_call.arguments or ""
+            elif function_call is None and delta.content is not None:
+                # a text answer, its first chunk has an empty content, return as generator right away
+                return chain([chunk], iterator), None
+            # other deltas are empty, e.g. the last chunk only carries the finish reason
+
+        return None, ChatCompletionMessage(
+            role="assistant", content=None, function_call=function_call
+        )
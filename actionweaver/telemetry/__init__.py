@@ -1 +1,12 @@
 from .helpers import get_parent_run_id, traceable
+from .metrics import REGISTRY, Counter, Histogram, MetricsRegistry
+from .sinks import BoundedQueueHandler, JSONLHandler, QueuedLogSink
+from .spans import (
+    InMemorySpanExporter,
+    Span,
+    SpanExporter,
+    Tracer,
+    get_current_span,
+    get_current_tracer,
+    start_span,
+)
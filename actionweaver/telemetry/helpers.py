@@ -1,19 +1,60 @@
 import contextvars
 import functools
 import inspect
+import itertools
 import logging
+import random
 import time
 import traceback
 import uuid
 from typing import Any, Callable, Dict, Optional
 
 _PARENT_RUN_ID = contextvars.ContextVar("_PARENT_RUN_ID", default=None)
+# sampling decision of the current trace, set with _PARENT_RUN_ID by the root run
+_TRACE_SAMPLED = contextvars.ContextVar("_TRACE_SAMPLED", default=True)
+
+# run ids are a random per process prefix + counter, much cheaper than a uuid4 per call
+_RUN_ID_PREFIX = uuid.uuid4().int >> 64 << 64
+_RUN_ID_COUNTER = itertools.count()
+_RUN_ID_MASK = (1 << 64) - 1
 
 
 def get_parent_run_id():
     return _PARENT_RUN_ID.get()
 
 
+def new_run_id() -> uuid.UUID:
+    return uuid.UUID(int=_RUN_ID_PREFIX | (next(_RUN_ID_COUNTER) & _RUN_ID_MASK))
+
+
+def truncate_payload(value, max_chars: int, max_items: Optional[int] = None):
+    """Truncate long strings in a payload, recursing into dicts, lists and tuples.
+
+    `max_items` optionally caps the number of elements kept in lists and tuples. Other objects are left untouched.
+    """
+    if isinstance(value, (str, bytes)):
+        if len(value) <= max_chars:
+            return value
+        marker = f"... [{len(value) - max_chars} chars truncated]"
+        return value[:max_chars] + (
+            marker if isinstance(value, str) else marker.encode()
+        )
+    if isinstance(value, dict):
+        return {
+            key: truncate_payload(item, max_chars, max_items)
+            for key, item in value.items()
+        }
+    if isinstance(value, (list, tuple)):
+        items = value
+        if max_items is not None and len(value) > max_items:
+            items = value[:max_items]
+        truncated = [truncate_payload(item, max_chars, max_items) for item in items]
+        if len(items) < len(value):
+            truncated.append(f"... [{len(value) - len(items)} items truncated]")
+        return truncated if isinstance(value, list) else tuple(truncated)
+    return value
+
+
 def _get_inputs(
     signature: inspect.Signature, *args: Any, **kwargs: Any
 ) -> Dict[str, Any]:
@@ -34,34 +75,122 @@ def _get_inputs(
     return arguments
 
 
+class _InputsBinder:
+    """Same result as `_get_inputs`, with the signature analysis done once at decoration time.
+
+    Calls that need argument validation (e.g. too many positional arguments) fall back to `_get_inputs`.
+    """
+
+    def __init__(self, signature: inspect.Signature):
+        self.signature = signature
+        self.positional = []
+        self.position = {}
+        self.keyword = set()
+        self.defaults = {}
+        self.var_positional = None
+        self.var_keyword = None
+
+        for param in signature.parameters.values():
+            if param.kind == inspect.Parameter.VAR_POSITIONAL:
+                self.var_positional = param.name
+                self.defaults[param.name] = ()
+            elif param.kind == inspect.Parameter.VAR_KEYWORD:
+                self.var_keyword = param.name
+            else:
+                if param.kind != inspect.Parameter.KEYWORD_ONLY:
+                    self.position[param.name] = len(self.positional)
+                    self.positional.append(param.name)
+                if param.kind != inspect.Parameter.POSITIONAL_ONLY:
+                    self.keyword.add(param.name)
+                if param.default is not inspect.Parameter.empty:
+                    self.defaults[param.name] = param.default
+
+    def __call__(self, args, kwargs) -> Dict[str, Any]:
+        n = len(self.positional)
+        if len(args) > n and self.var_positional is None:
+            return _get_inputs(self.signature, *args, **kwargs)
+
+        arguments = dict(self.defaults)
+        arguments.update(zip(self.positional, args))
+        if len(args) > n:
+            arguments[self.var_positional] = args[n:]
+
+        for key, value in kwargs.items():
+            if key in self.keyword:
+                if self.position.get(key, n) < len(args):
+                    # multiple values for the same argument
+                    return _get_inputs(self.signature, *args, **kwargs)
+                arguments[key] = value
+            elif self.var_keyword is not None and key != self.var_keyword:
+                arguments[key] = value
+            else:
+                return _get_inputs(self.signature, *args, **kwargs)
+
+        arguments.pop("self", None)
+        arguments.pop("cls", None)
+        return arguments
+
+
 # inspired by langsmith.run_helpers.traceable
 def traceable(
     name,
     logger,
     metadata: Optional[Dict] = None,
     level=logging.INFO,
+    sample_rate: Optional[float] = None,
+    max_payload_chars: Optional[int] = None,
+    max_payload_items: Optional[int] = None,
 ) -> Callable:
+    """Log inputs, outputs or errors of each call of the decorated function, with run ids linking nested calls.
+
+    `sample_rate` is the fraction of traces logged. It is decided once by the root run and applies to every nested
+    traceable call, so a trace is either complete or absent. Strings in inputs and outputs longer than
+    `max_payload_chars` are truncated, as well as lists longer than `max_payload_items`.
+    """
     original_metadata = metadata or {}
 
     def decorator(func: Callable):
+        get_inputs = _InputsBinder(inspect.signature(func))
+
+        def truncate(value):
+            if max_payload_chars is None:
+                return value
+            return truncate_payload(value, max_payload_chars, max_payload_items)
+
         @functools.wraps(func)
         def wrapper(
             *args: Any,
             logging_extra: Optional[Dict] = None,
             **kwargs: Any,
         ) -> Any:
+            if not logger.isEnabledFor(level):
+                return func(*args, **kwargs)
+
             parent_run_id = _PARENT_RUN_ID.get()
 
-            run_id = uuid.uuid4()
+            if parent_run_id is not None:
+                if not _TRACE_SAMPLED.get():
+                    return func(*args, **kwargs)
+            elif sample_rate is not None and random.random() >= sample_rate:
+                # the root run still sets the context, so nested calls are skipped too
+                token = _PARENT_RUN_ID.set(new_run_id())
+                sampled_token = _TRACE_SAMPLED.set(False)
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    _PARENT_RUN_ID.reset(token)
+                    _TRACE_SAMPLED.reset(sampled_token)
+
+            run_id = new_run_id()
 
-            logging_extra = logging_extra or {}
-            metadata = original_metadata.copy()
-            metadata.update(logging_extra)
+            metadata = original_metadata
+            if logging_extra:
+                metadata = {**original_metadata, **logging_extra}
 
-            signature = inspect.signature(func)
-            inputs = _get_inputs(signature, *args, **kwargs)
+            inputs = truncate(get_inputs(args, kwargs))
 
-            _PARENT_RUN_ID.set(run_id)
+            token = _PARENT_RUN_ID.set(run_id)
+            sampled_token = _TRACE_SAMPLED.set(True) if parent_run_id is None else None
             try:
                 function_result = func(*args, **kwargs)
                 logger.log(
@@ -69,7 +198,7 @@ def traceable(
                     {
                         "name": name,
                         "inputs": inputs,
-                        "outputs": function_result,
+                        "outputs": truncate(function_result),
                         "parent_run_id": parent_run_id,
                         "run_id": run_id,
                         "timestamp": time.time(),
@@ -92,7 +221,9 @@ def traceable(
                 )
                 raise e
             finally:
-                _PARENT_RUN_ID.set(parent_run_id)
+                _PARENT_RUN_ID.reset(token)
+                if sampled_token is not None:
+                    _TRACE_SAMPLED.reset(sampled_token)
             return function_result
 
         return wrapper
@@ -0,0 +1,287 @@
+import bisect
+import http.server
+import math
+import threading
+from abc import ABC, abstractmethod
+from typing import Dict, List, Optional, Sequence, Tuple
+
+DEFAULT_LATENCY_BUCKETS = (
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+    60.0,
+)
+DEFAULT_ITERATION_BUCKETS = (1, 2, 3, 4, 5, 8, 13, 21)
+DEFAULT_TOKEN_BUCKETS = (16, 64, 256, 1024, 4096, 16384, 65536, 262144)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence) -> str:
+    if not names:
+        return ""
+    return (
+        "{"
+        + ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values))
+        + "}"
+    )
+
+
+def _format_value(value) -> str:
+    if isinstance(value, float):
+        if math.isinf(value):
+            return "+Inf" if value > 0 else "-Inf"
+        if value.is_integer():
+            return str(int(value))
+        return repr(value)
+    return str(value)
+
+
+class _Metric(ABC):
+    type = ""
+
+    def __init__(self, name: str, description: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.description = description
+        self.labelnames = tuple(labelnames)
+        # one short lock per metric, only held to update a series
+        self._lock = threading.Lock()
+        self._series: Dict[Tuple, object] = {}
+
+    def _key(self, labels) -> Tuple:
+        try:
+            key = tuple(labels[name] for name in self.labelnames)
+        except KeyError:
+            key = None
+        if key is None or len(labels) != len(self.labelnames):
+            raise ValueError(
+                f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}"
+            )
+        return key
+
+    def clear(self):
+        with self._lock:
+            self._series = {}
+
+    def render(self) -> List[str]:
+        lines = [
+            f"# HELP {self.name} {_escape(self.description)}",
+            f"# TYPE {self.name} {self.type}",
+        ]
+        with self._lock:
+            series = sorted(self._series.items(), key=lambda item: str(item[0]))
+            series = [(key, self._copy(value)) for key, value in series]
+        for key, value in series:
+            lines.extend(self._render_series(key, value))
+        return lines
+
+    def _copy(self, value):
+        return value
+
+    @abstractmethod
+    def _render_series(self, key, value) -> List[str]:
+        """Exposition lines of the series with label values `key`."""
+        pass
+
+
+class Counter(_Metric):
+    """Monotonic counter, e.g. number of failed action calls."""
+
+    type = "counter"
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._series[key] = self._series.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self._series.get(self._key(labels), 0)
+
+    def _render_series(self, key, value):
+        return [
+            f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+        ]
+
+
+class Histogram(_Metric):
+    """Histogram with fixed bucket upper bounds, rendered with cumulative buckets as Prometheus expects."""
+
+    type = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        description: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_LATENCY_BUCKETS,
+    ):
+        super().__init__(name, description, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        # the bucket is found outside of the lock, a series is [bucket counts..., +Inf count, sum]
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * (len(self.buckets) + 1) + [0]
+            series[index] += 1
+            series[-1] += value
+
+    def count(self, **labels) -> int:
+        series = self._series.get(self._key(labels))
+        return sum(series[:-1]) if series else 0
+
+    def sum(self, **labels) -> float:
+        series = self._series.get(self._key(labels))
+        return series[-1] if series else 0
+
+    def _copy(self, value):
+        return list(value)
+
+    def _render_series(self, key, value):
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + (math.inf,), value[:-1]):
+            cumulative += count
+            labels = _format_labels(
+                self.labelnames + ("le",), key + (_format_value(float(bound)),)
+            )
+            lines.append(f"{self.name}_bucket{labels} {cumulative}")
+        labels = _format_labels(self.labelnames, key)
+        lines.append(f"{self.name}_sum{labels} {_format_value(float(value[-1]))}")
+        lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class MetricsRegistry:
+    """Collection of metrics, rendered in the Prometheus text exposition format.
+
+    Example:
+        from actionweaver.telemetry.metrics import REGISTRY
+
+        print(REGISTRY.render_prometheus())
+        server = REGISTRY.serve(9464)  # scrape http://127.0.0.1:9464/metrics
+    """
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def _register(self, cls, name, *args, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, *args, **kwargs)
+            elif not isinstance(metric, cls):
+                raise ValueError(
+                    f"Metric {name} is already registered as a {metric.type}"
+                )
+            return metric
+
+    def counter(
+        self, name: str, description: str, labelnames: Sequence[str] = ()
+    ) -> Counter:
+        return self._register(Counter, name, description, labelnames)
+
+    def histogram(
+        self,
+        name: str,
+        description: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_LATENCY_BUCKETS,
+    ) -> Histogram:
+        return self._register(Histogram, name, description, labelnames, buckets)
+
+    def get(self, name: str) -> Optional[_Metric]:
+        return self._metrics.get(name)
+
+    def clear(self):
+        """Reset the values of every metric, metrics stay registered."""
+        for metric in list(self._metrics.values()):
+            metric.clear()
+
+    def render_prometheus(self) -> str:
+        lines = []
+        for metric in list(self._metrics.values()):
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+    def serve(self, port: int = 9464, host: str = "127.0.0.1"):
+        """Serve the metrics on http://host:port/metrics from a daemon thread, call `shutdown()` on the returned server to stop."""
+        registry = self
+
+        class MetricsHandler(http.server.BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] not in ("/", "/metrics"):
+                    self.send_error(404)
+                    return
+                body = registry.render_prometheus().encode("utf-8")
+                self.send_response(200)
+                self.send_header(
+                    "Content-Type", "text/plain; version=0.0.4; charset=utf-8"
+                )
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        server = http.server.ThreadingHTTPServer((host, port), MetricsHandler)
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        return server
+
+
+REGISTRY = MetricsRegistry()
+
+API_REQUEST_DURATION = REGISTRY.histogram(
+    "actionweaver_api_request_duration_seconds",
+    "Latency of chat completion API calls made by the function calling loop.",
+    ["model"],
+)
+TIME_TO_FIRST_TOKEN = REGISTRY.histogram(
+    "actionweaver_time_to_first_token_seconds",
+    "Time from a streamed chat completion API call to its first chunk.",
+    ["model"],
+)
+ACTION_DURATION = REGISTRY.histogram(
+    "actionweaver_action_duration_seconds",
+    "Execution latency of actions.",
+    ["action"],
+)
+ACTION_ERRORS = REGISTRY.counter(
+    "actionweaver_action_errors_total",
+    "Number of action calls that raised an exception.",
+    ["action"],
+)
+DEDUPLICATED_TOOL_CALLS = REGISTRY.counter(
+    "actionweaver_deduplicated_tool_calls_total",
+    "Action calls saved by deduplicating identical tool calls within one API response.",
+    ["action"],
+)
+LOOP_ITERATIONS = REGISTRY.histogram(
+    "actionweaver_loop_iterations",
+    "Number of API calls per function calling loop.",
+    ["model"],
+    buckets=DEFAULT_ITERATION_BUCKETS,
+)
+TOKENS_PER_REQUEST = REGISTRY.histogram(
+    "actionweaver_tokens_per_request",
+    "Tokens used per chat completion API call, by token type.",
+    ["model", "type"],
+    buckets=DEFAULT_TOKEN_BUCKETS,
+)
@@ -0,0 +1,139 @@
+import itertools
+import json
+import logging
+import logging.handlers
+import queue
+import threading
+from typing import Dict, List
+
+
+class BoundedQueueHandler(logging.handlers.QueueHandler):
+    """Queue handler with a bounded queue, records are dropped and counted when the queue is full.
+
+    Unlike `logging.handlers.QueueHandler`, records are not formatted when they are enqueued, so the `traceable`
+    payloads are only serialized by the handlers of the listener thread, off the request path.
+    Payloads are passed by reference, a mutable input (e.g. the `messages` list) may be serialized in a later state.
+    """
+
+    def __init__(self, maxsize: int = 10000):
+        super().__init__(queue.Queue(maxsize=maxsize))
+        self._enqueued = itertools.count()
+        self._dropped = itertools.count()
+        self.enqueued = 0
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+            # itertools.count is atomic under the GIL
+            self.enqueued = next(self._enqueued) + 1
+        except queue.Full:
+            self.dropped = next(self._dropped) + 1
+
+
+class _QueueListener(logging.handlers.QueueListener):
+    def enqueue_sentinel(self):
+        # the queue may be full when stopping, wait for room instead of raising
+        self.queue.put(self._sentinel)
+
+
+def _json_default(value):
+    if hasattr(value, "model_dump"):
+        return value.model_dump()
+    return str(value)
+
+
+class JSONLHandler(logging.Handler):
+    """Write each record as one JSON line, dict messages (e.g. `traceable` records) are written as is."""
+
+    def __init__(self, filename: str, mode: str = "a", encoding: str = "utf-8"):
+        super().__init__()
+        self.filename = filename
+        self.stream = open(filename, mode, encoding=encoding)
+
+    def emit(self, record: logging.LogRecord):
+        try:
+            if isinstance(record.msg, dict):
+                payload = {"level": record.levelname, **record.msg}
+            else:
+                payload = {
+                    "level": record.levelname,
+                    "message": record.getMessage(),
+                    "timestamp": record.created,
+                }
+            self.stream.write(json.dumps(payload, default=_json_default) + "\n")
+            self.stream.flush()
+        except Exception:
+            self.handleError(record)
+
+    def close(self):
+        self.acquire()
+        try:
+            if self.stream and not self.stream.closed:
+                self.stream.close()
+        finally:
+            self.release()
+        super().close()
+
+
+class QueuedLogSink:
+    """Non-blocking log sink: loggers only enqueue records, a background thread passes them to `handlers`.
+
+    Example:
+        sink = QueuedLogSink([JSONLHandler("traces.jsonl")])
+        sink.attach(logger)
+        sink.start()
+        ...
+        sink.stop()
+    """
+
+    def __init__(self, handlers: List[logging.Handler], maxsize: int = 10000):
+        self.handler = BoundedQueueHandler(maxsize=maxsize)
+        self.handlers = handlers
+        self.listener = _QueueListener(
+            self.handler.queue, *handlers, respect_handler_level=True
+        )
+        self._loggers: List[logging.Logger] = []
+        self._started = False
+        self._lock = threading.Lock()
+
+    def attach(self, logger: logging.Logger) -> logging.Logger:
+        logger.addHandler(self.handler)
+        self._loggers.append(logger)
+        return logger
+
+    def start(self):
+        with self._lock:
+            if not self._started:
+                self.listener.start()
+                self._started = True
+        return self
+
+    def stop(self):
+        """Detach from loggers, flush queued records to the handlers, then close the handlers."""
+        for logger in self._loggers:
+            logger.removeHandler(self.handler)
+        self._loggers = []
+        with self._lock:
+            if self._started:
+                self.listener.stop()
+                self._started = False
+        for handler in self.handlers:
+            handler.close()
+
+    @property
+    def stats(self) -> Dict[str, int]:
+        return {
+            "enqueued": self.handler.enqueued,
+            "dropped": self.handler.dropped,
+            "queued": self.handler.queue.qsize(),
+        }
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
@@ -0,0 +1,142 @@
+import contextlib
+import contextvars
+import random
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import Any, Dict, List, Optional
+
+from pydantic import BaseModel, PrivateAttr
+
+_CURRENT_SPAN = contextvars.ContextVar("_CURRENT_SPAN", default=None)
+_CURRENT_TRACER = contextvars.ContextVar("_CURRENT_TRACER", default=None)
+
+
+def _random_id(bits: int) -> str:
+    return f"{random.getrandbits(bits):0{bits // 4}x}"
+
+
+class Span(BaseModel):
+    """A timed operation, modeled after OpenTelemetry spans.
+
+    Times are epoch nanoseconds. `self_time_ns` is the duration not spent in child spans, e.g. for the chat loop span,
+    the framework overhead outside API calls and actions.
+    """
+
+    name: str
+    trace_id: str
+    span_id: str
+    parent_span_id: Optional[str] = None
+    start_time_ns: int
+    end_time_ns: Optional[int] = None
+    status: str = "UNSET"
+    attributes: Dict[str, Any] = {}
+
+    _children_ns: int = PrivateAttr(default=0)
+
+    @property
+    def duration_ns(self) -> Optional[int]:
+        if self.end_time_ns is None:
+            return None
+        return self.end_time_ns - self.start_time_ns
+
+    @property
+    def self_time_ns(self) -> Optional[int]:
+        if self.end_time_ns is None:
+            return None
+        return self.duration_ns - self._children_ns
+
+    def set_attribute(self, key: str, value: Any):
+        self.attributes[key] = value
+
+    def set_attributes(self, attributes: Dict[str, Any]):
+        self.attributes.update(attributes)
+
+
+class SpanExporter(ABC):
+    """Base class for span exporters, e.g. to forward spans to an OpenTelemetry collector."""
+
+    @abstractmethod
+    def export(self, spans: List[Span]):
+        pass
+
+    def shutdown(self):
+        pass
+
+
+class InMemorySpanExporter(SpanExporter):
+    """Keep finished spans in memory, for tests and debugging."""
+
+    def __init__(self):
+        self._spans: List[Span] = []
+        self._lock = threading.Lock()
+
+    def export(self, spans: List[Span]):
+        with self._lock:
+            self._spans.extend(spans)
+
+    def get_finished_spans(self) -> List[Span]:
+        with self._lock:
+            return list(self._spans)
+
+    def clear(self):
+        with self._lock:
+            self._spans = []
+
+
+class Tracer:
+    """Create spans nested through a contextvar, and pass them to the exporter when they end."""
+
+    def __init__(self, exporter: SpanExporter):
+        self.exporter = exporter
+
+    @contextlib.contextmanager
+    def start_span(self, name: str, attributes: Optional[Dict[str, Any]] = None):
+        parent = _CURRENT_SPAN.get()
+        span = Span(
+            name=name,
+            trace_id=parent.trace_id if parent else _random_id(128),
+            span_id=_random_id(64),
+            parent_span_id=parent.span_id if parent else None,
+            start_time_ns=time.time_ns(),
+            attributes=dict(attributes) if attributes else {},
+        )
+
+        span_token = _CURRENT_SPAN.set(span)
+        tracer_token = _CURRENT_TRACER.set(self)
+        try:
+            yield span
+            span.status = "OK"
+        except BaseException as e:
+            span.status = "ERROR"
+            span.set_attributes(
+                {"exception.type": type(e).__name__, "exception.message": str(e)}
+            )
+            raise
+        finally:
+            span.end_time_ns = time.time_ns()
+            _CURRENT_SPAN.reset(span_token)
+            _CURRENT_TRACER.reset(tracer_token)
+            if parent is not None:
+                parent._children_ns += span.duration_ns
+            self.exporter.export([span])
+
+
+def get_current_span() -> Optional[Span]:
+    return _CURRENT_SPAN.get()
+
+
+def get_current_tracer() -> Optional[Tracer]:
+    return _CURRENT_TRACER.get()
+
+
+def start_span(
+    name: str,
+    attributes: Optional[Dict[str, Any]] = None,
+    tracer: Optional[Tracer] = None,
+):
+    """Start a span with `tracer`, or the tracer of the current span. Does nothing if there is neither."""
+    tracer = tracer or _CURRENT_TRACER.get()
+    if tracer is None:
+        return contextlib.nullcontext()
+    return tracer.start_span(name, attributes)
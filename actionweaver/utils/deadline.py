@@ -0,0 +1,81 @@
+import contextlib
+import contextvars
+import time
+from typing import Optional, Union
+
+_CURRENT_DEADLINE = contextvars.ContextVar("_CURRENT_DEADLINE", default=None)
+
+
+class DeadlineExceededException(TimeoutError):
+    pass
+
+
+class Deadline:
+    """Point in time by which a whole function calling loop, including its API calls and actions, must finish.
+
+    The time left is split across the remaining iterations: API call `iteration` gets
+    `remaining() / (expected_iterations - iteration + 1)`, and the last expected iterations get all the time left.
+    A final API call, e.g. one offering no tools, gets all the time left too.
+
+    The OpenAI client retries timed out requests, each attempt with the full request timeout. Create the client
+    with `max_retries=0` so a request can't overrun the deadline.
+    """
+
+    def __init__(self, timeout: float, expected_iterations: int = 2):
+        self.expires_at = time.monotonic() + timeout
+        self.expected_iterations = expected_iterations
+
+    @classmethod
+    def from_value(cls, value: Union[float, "Deadline", None]) -> Optional["Deadline"]:
+        if value is None or isinstance(value, Deadline):
+            return value
+        return cls(value)
+
+    def remaining(self) -> float:
+        return max(self.expires_at - time.monotonic(), 0.0)
+
+    def expired(self) -> bool:
+        return time.monotonic() >= self.expires_at
+
+    def check(self):
+        if self.expired():
+            raise DeadlineExceededException("Deadline exceeded")
+
+    def request_timeout(self, iteration: int, final: bool = False) -> float:
+        """Timeout of the API call of `iteration`, starting at 1, `final` if no API call can follow it."""
+        if final:
+            return self.remaining()
+        return self.remaining() / max(self.expected_iterations - iteration + 1, 1)
+
+    def earliest(self, other: Optional["Deadline"]) -> "Deadline":
+        if other is None or self.expires_at <= other.expires_at:
+            return self
+        return other
+
+
+def get_current_deadline() -> Optional[Deadline]:
+    """Deadline of the innermost chat loop or `use_deadline` block, actions use it to bound their own work."""
+    return _CURRENT_DEADLINE.get()
+
+
+def remaining_time() -> Optional[float]:
+    """Seconds left before the current deadline, None if there is no deadline."""
+    deadline = _CURRENT_DEADLINE.get()
+    return deadline.remaining() if deadline is not None else None
+
+
+@contextlib.contextmanager
+def use_deadline(deadline: Union[float, Deadline, None]):
+    """Make `deadline` current, it can only be tightened by nested blocks and chat loops."""
+    deadline = Deadline.from_value(deadline)
+    current = _CURRENT_DEADLINE.get()
+    if deadline is None:
+        deadline = current
+    else:
+        deadline = deadline.earliest(current)
+
+    token = _CURRENT_DEADLINE.set(deadline)
+    try:
+        yield deadline
+    finally:
+        _CURRENT_DEADLINE.reset(token)
@@ -0,0 +1,81 @@
+from typing import Any, List
+
+
+def _get(message, key):
+    if isinstance(message, dict):
+        return message.get(key)
+    return getattr(message, key, None)
+
+
+def message_role(message) -> str:
+    """Return the role of a chat message, which is either a dict or an OpenAI message object."""
+    return _get(message, "role")
+
+
+def message_content(message) -> str:
+    """Return the text content of a chat message, or an empty string if it has none."""
+    content = _get(message, "content")
+
+    if content is None:
+        return ""
+    if isinstance(content, list):
+        # multi-part content, keep the text parts only
+        return " ".join(
+            part.get("text", "") for part in content if isinstance(part, dict)
+        )
+    return str(content)
+
+
+def message_tool_calls(message) -> List[Any]:
+    """Return the tool calls of an assistant message as a list of dicts."""
+    tool_calls = _get(message, "tool_calls") or []
+    return [
+        tool_call if isinstance(tool_call, dict) else tool_call.model_dump()
+        for tool_call in tool_calls
+    ]
+
+
+def message_function_call(message):
+    """Return the legacy function call of an assistant message as a dict, or None."""
+    function_call = _get(message, "function_call")
+    if function_call is None or isinstance(function_call, dict):
+        return function_call
+    return function_call.model_dump()
+
+
+def latest_query_messages(messages: List[Any]) -> List[Any]:
+    """Return the latest user message and every tool/function message that follows it."""
+    if not messages:
+        return []
+
+    query = []
+    for message in reversed(messages):
+        role = message_role(message)
+        if role in ("tool", "function"):
+            query.append(message)
+        elif role == "user":
+            query.append(message)
+            break
+    return list(reversed(query))
+
+
+def message_blocks(messages: List[Any]) -> List[List[Any]]:
+    """Group messages into blocks that must be kept or dropped together.
+
+    An assistant message calling tools or a function is grouped with the tool/function messages answering it,
+    the API rejects tool messages whose call is missing. Every other message is a block of its own.
+    """
+    blocks = []
+    for message in messages:
+        if (
+            blocks
+            and message_role(message) in ("tool", "function")
+            and (
+                _get(blocks[-1][0], "tool_calls")
+                or _get(blocks[-1][0], "function_call")
+            )
+        ):
+            blocks[-1].append(message)
+        else:
+            blocks.append([message])
+    return blocks
@@ -0,0 +1,179 @@
+import collections
+import copy
+import functools
+import json
+from typing import Any, Dict, List, Optional, Set
+
+from pydantic import BaseModel
+
+from actionweaver.utils.tokens import TokenEstimator
+
+# keywords whose value is a subschema, or a list or dict of subschemas
+_SUBSCHEMA_KEYWORDS = ("items", "additionalProperties", "not")
+_SUBSCHEMA_LIST_KEYWORDS = ("anyOf", "allOf", "oneOf", "prefixItems")
+_SUBSCHEMA_DICT_KEYWORDS = ("$defs", "definitions")
+
+_NULL = {"type": "null"}
+_DEFS_PREFIX = "#/$defs/"
+
+
+def compact_schema(schema: Dict[str, Any]) -> Dict[str, Any]:
+    """Return a copy of a pydantic JSON schema with fewer tokens and the same meaning for the LLM.
+
+    - `title` keywords are dropped, they repeat the property or model names.
+    - `default: null` is dropped, optional properties are already missing from `required`.
+    - `anyOf: [X, {"type": "null"}]` becomes `X` for optional properties, and `{"type": [t, "null"]}` for required
+      properties of a simple type.
+    - `$defs` used once are inlined, see `inline_defs`.
+    """
+    return _compact(inline_defs(schema), required=True)
+
+
+def compact_model_schema(model) -> Dict[str, Any]:
+    """Compact JSON schema of a pydantic model, cached since tools are sent with every request.
+
+    A copy is returned, callers may change it without changing the cached schema.
+    """
+    return copy.deepcopy(_cached_compact_model_schema(model))
+
+
+@functools.lru_cache(maxsize=1024)
+def _cached_compact_model_schema(model) -> Dict[str, Any]:
+    return compact_schema(model.model_json_schema())
+
+
+def _compact(node: Any, required: bool) -> Any:
+    if not isinstance(node, dict):
+        return node
+
+    node = {
+        key: value
+        for key, value in node.items()
+        if key != "title" and not (key == "default" and value is None)
+    }
+
+    properties = node.get("properties")
+    if isinstance(properties, dict):
+        required_names = set(node.get("required", []))
+        node["properties"] = {
+            name: _compact(prop, name in required_names)
+            for name, prop in properties.items()
+        }
+    for key in _SUBSCHEMA_KEYWORDS:
+        if isinstance(node.get(key), dict):
+            node[key] = _compact(node[key], True)
+    for key in _SUBSCHEMA_LIST_KEYWORDS:
+        if isinstance(node.get(key), list):
+            node[key] = [_compact(s, True) for s in node[key]]
+    for key in _SUBSCHEMA_DICT_KEYWORDS:
+        if isinstance(node.get(key), dict):
+            node[key] = {name: _compact(s, True) for name, s in node[key].items()}
+
+    return _collapse_nullable(node, required)
+
+
+def _collapse_nullable(node: Dict[str, Any], required: bool) -> Dict[str, Any]:
+    variants = node.get("anyOf")
+    if not isinstance(variants, list) or len(variants) != 2 or _NULL not in variants:
+        return node
+
+    other = variants[0] if variants[1] == _NULL else variants[1]
+    rest = {key: value for key, value in node.items() if key != "anyOf"}
+    if not required:
+        return {**other, **rest}
+    if isinstance(other.get("type"), str):
+        return {**other, **rest, "type": [other["type"], "null"]}
+    return node
+
+
+def _refs(node: Any) -> List[str]:
+    """Names of the `$defs` referenced in a schema, once per reference."""
+    if isinstance(node, dict):
+        refs = []
+        ref = node.get("$ref")
+        if isinstance(ref, str) and ref.startswith(_DEFS_PREFIX):
+            refs.append(ref[len(_DEFS_PREFIX) :])
+        for value in node.values():
+            refs += _refs(value)
+        return refs
+    if isinstance(node, list):
+        return [ref for value in node for ref in _refs(value)]
+    return []
+
+
+def _recursive_defs(defs: Dict[str, Any]) -> Set[str]:
+    """Names of the definitions that reference themselves, directly or not."""
+    edges = {name: set(_refs(definition)) for name, definition in defs.items()}
+
+    recursive = set()
+    for name in defs:
+        seen, stack = set(), list(edges[name])
+        while stack:
+            current = stack.pop()
+            if current == name:
+                recursive.add(name)
+                break
+            if current not in seen and current in edges:
+                seen.add(current)
+                stack.extend(edges[current])
+    return recursive
+
+
+def inline_defs(schema: Dict[str, Any]) -> Dict[str, Any]:
+    """Inline the `$defs` referenced once, and drop unused ones.
+
+    Definitions referenced several times, or recursive, stay in `$defs`. Tools can't share definitions, each tool's
+    parameters must be a self-contained schema, so this is the smallest form of the schemas of actions nesting other
+    action models, e.g. built by `combine` or `repeat`.
+    """
+    defs = schema.get("$defs")
+    if not defs:
+        return schema
+
+    counts = collections.Counter(_refs(schema))
+    recursive = _recursive_defs(defs)
+    inlined = {name for name in defs if counts[name] <= 1 and name not in recursive}
+
+    def resolve(node):
+        if isinstance(node, list):
+            return [resolve(value) for value in node]
+        if not isinstance(node, dict):
+            return node
+
+        ref = node.get("$ref")
+        if isinstance(ref, str) and ref[len(_DEFS_PREFIX) :] in inlined:
+            siblings = {key: value for key, value in node.items() if key != "$ref"}
+            return resolve({**defs[ref[len(_DEFS_PREFIX) :]], **siblings})
+        return {key: resolve(value) for key, value in node.items()}
+
+    result = resolve({key: value for key, value in schema.items() if key != "$defs"})
+    kept = {name: resolve(d) for name, d in defs.items() if name not in inlined}
+    if kept:
+        result["$defs"] = kept
+    return result
+
+
+class FlatSchemaModel(BaseModel):
+    """Base model whose JSON schema has its `$defs` inlined where possible, for models nesting other models."""
+
+    @classmethod
+    def model_json_schema(cls, *args, **kwargs) -> Dict[str, Any]:
+        return inline_defs(super().model_json_schema(*args, **kwargs))
+
+
+def schema_token_savings(
+    actions: List[Any], token_estimator: Optional[TokenEstimator] = None
+) -> Dict[str, Dict[str, int]]:
+    """Tokens of each action's parameters schema before and after compaction, keyed by action name."""
+    token_estimator = token_estimator or TokenEstimator()
+
+    savings = {}
+    for action in actions:
+        before = token_estimator.count_text(json.dumps(action.json_schema()))
+        after = token_estimator.count_text(json.dumps(action.json_schema(compact=True)))
+        savings[action.name] = {
+            "before": before,
+            "after": after,
+            "saved": before - after,
+        }
+    return savings
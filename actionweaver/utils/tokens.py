@@ -1,25 +1,430 @@
 import collections
-from typing import Dict
+import contextlib
+import contextvars
+import json
+import math
+import threading
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+from pydantic import BaseModel
+
+from actionweaver.utils.messages import (
+    message_blocks,
+    message_content,
+    message_function_call,
+    message_role,
+    message_tool_calls,
+)
 
 
 class TokenUsageTrackerException(Exception):
     pass
 
 
+class TokenPreflightException(TokenUsageTrackerException):
+    pass
+
+
+def usage_to_dict(usage) -> Dict[str, int]:
+    """Convert an API usage object (e.g. `CompletionUsage`) or dict into a flat dict of token counts."""
+    if usage is None:
+        return {}
+    if hasattr(usage, "model_dump"):
+        usage = usage.model_dump()
+    return {key: value for key, value in dict(usage).items() if isinstance(value, int)}
+
+
+class ModelPrice(BaseModel):
+    """Price of a model in currency units per million tokens.
+
+    `cached_prompt` applies to prompt tokens served from the prompt cache, it defaults to the `prompt` price.
+    """
+
+    prompt: float
+    completion: float
+    cached_prompt: Optional[float] = None
+
+
+def cached_prompt_tokens(usage) -> int:
+    """Cached prompt tokens reported in `usage.prompt_tokens_details`, 0 if the API does not report them."""
+    if usage is None:
+        return 0
+    if hasattr(usage, "model_dump"):
+        usage = usage.model_dump()
+    details = dict(usage).get("prompt_tokens_details") or {}
+    if not isinstance(details, dict):
+        details = getattr(details, "__dict__", {})
+    return details.get("cached_tokens") or 0
+
+
+class PriceTable:
+    """Prices per model, looked up by exact name first, then by the longest matching prefix.
+
+    A prefix lets dated model versions share a price, e.g. "gpt-4o-2024-08-06" uses the price of "gpt-4o".
+
+    Example:
+        prices = PriceTable({"gpt-4o": ModelPrice(prompt=2.5, completion=10, cached_prompt=1.25)})
+    """
+
+    def __init__(self, prices: Optional[Dict[str, ModelPrice]] = None):
+        self.prices = dict(prices or {})
+
+    def price_for(self, model: Optional[str]) -> Optional[ModelPrice]:
+        if not model:
+            return None
+        if model in self.prices:
+            return self.prices[model]
+        matches = [name for name in self.prices if model.startswith(name)]
+        return self.prices[max(matches, key=len)] if matches else None
+
+    def cost(self, model: Optional[str], usage) -> float:
+        price = self.price_for(model)
+        if price is None:
+            return 0.0
+
+        tokens = usage_to_dict(usage)
+        cached = min(cached_prompt_tokens(usage), tokens.get("prompt_tokens", 0))
+        cached_price = (
+            price.cached_prompt if price.cached_prompt is not None else price.prompt
+        )
+        return (
+            (tokens.get("prompt_tokens", 0) - cached) * price.prompt
+            + cached * cached_price
+            + tokens.get("completion_tokens", 0) * price.completion
+        ) / 1_000_000
+
+
+_CURRENT_TRACKER = contextvars.ContextVar("_CURRENT_TRACKER", default=None)
+
+
 class TokenUsageTracker:
-    def __init__(self, budget=None):
+    """Accumulate token usage of API calls, and enforce a token `budget` and a `cost_budget` in currency.
+
+    Cost is computed with `price_table`. Usage and cost are also attributed to the actions whose outputs were sent in
+    each API call, in `by_action`; the first call of a request is attributed to `REQUEST_ATTRIBUTION`.
+
+    Trackers can be nested with `parent`, e.g. tenant > request > sub-agent. Usage is propagated to every ancestor,
+    and each level enforces its own budgets. A `linked` tracker and its ancestors are charged as well, e.g. the
+    enclosing budget of a chat loop given a caller's tracker, see `call_tracker`.
+    """
+
+    REQUEST_ATTRIBUTION = "(request)"
+
+    def __init__(
+        self,
+        budget=None,
+        cost_budget: Optional[float] = None,
+        price_table: Optional[PriceTable] = None,
+        parent: Optional["TokenUsageTracker"] = None,
+        linked: Optional["TokenUsageTracker"] = None,
+    ):
         self.tracker = collections.Counter()
+        self._lock = threading.Lock()
         self.budget = budget
+        self.cost_budget = cost_budget
+        self.parent = parent
+        self.linked = linked
+        self.price_table = (
+            price_table
+            or (parent.price_table if parent else None)
+            or (linked.price_table if linked else None)
+        )
+        self.cost = 0.0
+        self.by_action: Dict[str, collections.Counter] = collections.defaultdict(
+            collections.Counter
+        )
 
     def clear(self):
         self.tracker = collections.Counter()
+        self.cost = 0.0
+        self.by_action = collections.defaultdict(collections.Counter)
         return self
 
-    def track_usage(self, usage: Dict):
-        self.tracker = self.tracker + collections.Counter(usage)
+    def ancestors(self) -> List["TokenUsageTracker"]:
+        """This tracker followed by its parent chain."""
+        trackers = []
+        tracker = self
+        while tracker is not None:
+            trackers.append(tracker)
+            tracker = tracker.parent
+        return trackers
+
+    def charged(self) -> List["TokenUsageTracker"]:
+        """Trackers charged with the usage of this one: its ancestors, and the linked tracker with its ancestors."""
+        trackers = self.ancestors()
+        if self.linked is not None:
+            trackers += self.linked.ancestors()
+        return trackers
+
+    def remaining(self) -> Optional[int]:
+        """Tokens left in the tightest budget of the charged trackers, or None if there is no budget."""
+        remaining = [
+            tracker.budget - tracker.tracker["total_tokens"]
+            for tracker in self.charged()
+            if tracker.budget is not None
+        ]
+        return min(remaining) if remaining else None
+
+    def remaining_cost(self) -> Optional[float]:
+        """Cost left in the tightest cost budget of the charged trackers, or None if there is none."""
+        remaining = [
+            tracker.cost_budget - tracker.cost
+            for tracker in self.charged()
+            if tracker.cost_budget is not None
+        ]
+        return min(remaining) if remaining else None
+
+    def child(self, **kwargs) -> "TokenUsageTracker":
+        return TokenUsageTracker(parent=self, **kwargs)
+
+    def track_usage(
+        self,
+        usage: Dict,
+        model: Optional[str] = None,
+        actions: Optional[List[str]] = None,
+        cost: Optional[float] = None,
+    ):
+        """Add the usage of an API call to `model`, triggered by the outputs of `actions`.
+
+        `cost` is computed with the price table if not given, ancestors are charged the cost computed here.
+        """
+        tokens = collections.Counter(usage_to_dict(usage))
+        if cost is None:
+            cost = self.price_table.cost(model, usage) if self.price_table else 0.0
+
+        # usage may be tracked from other threads, e.g. discarded hedged requests
+        with self._lock:
+            self.tracker = self.tracker + tokens
+            self.cost += cost
+
+            # split the usage evenly between the actions of the iteration
+            names = actions or [self.REQUEST_ATTRIBUTION]
+            for name in names:
+                attribution = self.by_action[name]
+                for key, value in tokens.items():
+                    attribution[key] += value / len(names)
+                attribution["cost"] += cost / len(names)
+                attribution["calls"] += 1
+
+        # ancestors are updated even if this level is over budget, then the first exceeded budget raises
+        if self.parent is not None:
+            self.parent.track_usage(usage, model=model, actions=actions, cost=cost)
+        if self.linked is not None:
+            self.linked.track_usage(usage, model=model, actions=actions, cost=cost)
 
         if self.budget is not None and self.tracker["total_tokens"] > self.budget:
             raise TokenUsageTrackerException(
                 f"Token budget exceeded. Budget: {self.budget}, Usage: {dict(self.tracker)}"
             )
+        if self.cost_budget is not None and self.cost > self.cost_budget:
+            raise TokenUsageTrackerException(
+                f"Cost budget exceeded. Budget: {self.cost_budget}, Cost: {self.cost}"
+            )
         return self.tracker
+
+
+def get_current_tracker() -> Optional[TokenUsageTracker]:
+    """Tracker of the innermost `token_budget` or chat loop, None outside of them."""
+    return _CURRENT_TRACKER.get()
+
+
+@contextlib.contextmanager
+def use_tracker(tracker: TokenUsageTracker):
+    """Make `tracker` the current tracker, chat loops started inside track usage in a child of it."""
+    token = _CURRENT_TRACKER.set(tracker)
+    try:
+        yield tracker
+    finally:
+        _CURRENT_TRACKER.reset(token)
+
+
+def call_tracker(tracker: TokenUsageTracker) -> TokenUsageTracker:
+    """Tracker of a chat loop given a caller's `tracker`: a child of it, linked to the current tracker.
+
+    The usage is charged to the caller's tracker and to the enclosing budget, without changing `tracker`, which
+    may be shared by concurrent calls. If the two share ancestors the usage already reaches, `tracker` is used as is.
+    """
+    current = get_current_tracker()
+    if current is None:
+        return tracker
+    if {id(t) for t in tracker.ancestors()} & {id(t) for t in current.ancestors()}:
+        return tracker
+    return TokenUsageTracker(parent=tracker, linked=current)
+
+
+@contextlib.contextmanager
+def token_budget(
+    budget=None,
+    cost_budget: Optional[float] = None,
+    price_table: Optional[PriceTable] = None,
+):
+    """Scope a budget over every chat loop started inside, including nested loops started by actions.
+
+    The budget is a child of the current tracker, so enclosing budgets are enforced as well.
+
+    Example:
+        with token_budget(budget=100_000) as tenant:
+            with token_budget(budget=10_000):
+                client.create(...)
+    """
+    tracker = TokenUsageTracker(
+        budget=budget,
+        cost_budget=cost_budget,
+        price_table=price_table,
+        parent=get_current_tracker(),
+    )
+    with use_tracker(tracker):
+        yield tracker
+
+
+Tokenizer = Callable[[str], Sequence[Any]]
+
+
+class TokenEstimator:
+    """Estimate the prompt tokens of a chat completion request before it is sent.
+
+    `tokenizer` is any callable returning the tokens of a text, e.g. `tiktoken.encoding_for_model(model).encode`.
+    Without it, a heuristic of ~4 characters per token is used, which needs no extra package.
+
+    Per-message counts are cached by message identity, so when `messages` grows between loop iterations only new
+    messages are counted. Messages are assumed not to be mutated once they are in the conversation.
+    """
+
+    CHARS_PER_TOKEN = 4
+    TOKENS_PER_MESSAGE = 3
+    TOKENS_PER_REQUEST = 3
+    MAX_CACHED_MESSAGES = 10000
+
+    def __init__(
+        self,
+        tokenizer: Optional[Tokenizer] = None,
+        context_window: Optional[int] = None,
+        reserved_completion_tokens: int = 0,
+        on_exceed: str = "raise",
+    ):
+        if on_exceed not in ("raise", "trim"):
+            raise ValueError(f"on_exceed must be 'raise' or 'trim', found {on_exceed}")
+
+        self.tokenizer = tokenizer
+        self.context_window = context_window
+        self.reserved_completion_tokens = reserved_completion_tokens
+        self.on_exceed = on_exceed
+
+        # id(message) -> (message, count), the message is kept alive so its id is not reused
+        self._message_counts: Dict[int, tuple] = {}
+        self._tools_counts: Dict[str, int] = {}
+
+    def count_text(self, text: str) -> int:
+        if not text:
+            return 0
+        if self.tokenizer is not None:
+            return len(self.tokenizer(text))
+        return math.ceil(len(text) / self.CHARS_PER_TOKEN)
+
+    def count_message(self, message) -> int:
+        count = self.TOKENS_PER_MESSAGE
+        count += self.count_text(message_role(message))
+        count += self.count_text(message_content(message))
+
+        name = message.get("name") if isinstance(message, dict) else None
+        if name:
+            count += self.count_text(name) + 1
+
+        for tool_call in message_tool_calls(message):
+            function = tool_call.get("function") or {}
+            count += self.count_text(function.get("name"))
+            count += self.count_text(function.get("arguments"))
+
+        function_call = message_function_call(message)
+        if function_call:
+            count += self.count_text(function_call.get("name"))
+            count += self.count_text(function_call.get("arguments"))
+        return count
+
+    def message_counts(self, messages: List[Any]) -> List[int]:
+        """Token count of each message, served from the cache for messages seen before."""
+        cache = self._message_counts
+        if len(cache) > self.MAX_CACHED_MESSAGES:
+            cache.clear()
+
+        counts = []
+        for message in messages:
+            cached = cache.get(id(message))
+            if cached is None or cached[0] is not message:
+                cached = (message, self.count_message(message))
+                cache[id(message)] = cached
+            counts.append(cached[1])
+        return counts
+
+    def count_messages(self, messages: List[Any]) -> int:
+        return self.TOKENS_PER_REQUEST + sum(self.message_counts(messages))
+
+    def count_tools(self, tools: Optional[List[Dict]]) -> int:
+        if not tools:
+            return 0
+        payload = json.dumps(tools, sort_keys=True, default=str)
+        count = self._tools_counts.get(payload)
+        if count is None:
+            count = self.count_text(payload)
+            self._tools_counts[payload] = count
+        return count
+
+    def estimate(self, messages: List[Any], tools: Optional[List[Dict]] = None) -> int:
+        return self.count_messages(messages) + self.count_tools(tools)
+
+    def limit(self, token_usage_tracker: Optional[TokenUsageTracker] = None):
+        """Maximum prompt tokens allowed for the next request, or None if unbounded."""
+        limits = []
+        if self.context_window is not None:
+            limits.append(self.context_window - self.reserved_completion_tokens)
+        remaining = token_usage_tracker.remaining() if token_usage_tracker else None
+        if remaining is not None:
+            # the tightest budget of the tracker and the budgets enclosing it
+            limits.append(remaining - self.reserved_completion_tokens)
+        return min(limits) if limits else None
+
+    def trim(self, messages: List[Any], max_tokens: int, tools=None) -> List[Any]:
+        """Drop the oldest messages until the request fits in `max_tokens`.
+
+        Leading system messages and the latest message block are always kept, tool calls are dropped
+        together with their tool responses. Returns a new list, `messages` is left untouched.
+        """
+        blocks = message_blocks(messages)
+        head = []
+        while len(blocks) > 1 and message_role(blocks[0][0]) == "system":
+            head += blocks.pop(0)
+
+        total = self.estimate(messages, tools)
+        start = 0
+        while total > max_tokens and start < len(blocks) - 1:
+            total -= sum(self.message_counts(blocks[start]))
+            start += 1
+
+        return head + [message for block in blocks[start:] for message in block]
+
+    def preflight(
+        self,
+        messages: List[Any],
+        tools: Optional[List[Dict]] = None,
+        token_usage_tracker: Optional[TokenUsageTracker] = None,
+    ) -> List[Any]:
+        """Check the request against the remaining budget and the context window before it is sent.
+
+        Returns the messages to send, trimmed if `on_exceed` is 'trim', or raises `TokenPreflightException`.
+        """
+        max_tokens = self.limit(token_usage_tracker)
+        if max_tokens is None:
+            return messages
+
+        estimated = self.estimate(messages, tools)
+        if estimated <= max_tokens:
+            return messages
+
+        if self.on_exceed == "trim":
+            trimmed = self.trim(messages, max_tokens, tools)
+            if self.estimate(trimmed, tools) <= max_tokens:
+                return trimmed
+
+        raise TokenPreflightException(
+            f"Request would exceed the token limit. Estimated prompt tokens: {estimated}, Limit: {max_tokens}"
+        )
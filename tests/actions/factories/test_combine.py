@@ -1,7 +1,10 @@
 from __future__ import annotations
 
+import json
 import unittest
 
+from pydantic.json_schema import model_json_schema
+
 from actionweaver import action
 from actionweaver.actions.factories.combine import combine
 
@@ -27,6 +30,33 @@ class TestCase(unittest.TestCase):
             combined_action(**{"Func1": {"a": 1}, "Func2": {"b": "2"}}), "1\n2"
         )
 
+    def test_flat_schema(self):
+        @action(name="Func1")
+        def func(a: int):
+            """func docstring"""
+            return a
+
+        @action(name="Func2")
+        def bar(b: str):
+            """bar docstring"""
+            return b
+
+        combined_action = combine([func, bar])
+        schema = combined_action.json_schema()
+
+        self.assertNotIn("$defs", schema)
+        self.assertEqual(
+            schema["properties"]["Func1"]["properties"],
+            {"a": {"title": "A", "type": "integer"}},
+        )
+
+        # payload size of the tool, in characters
+        flat = len(json.dumps(schema))
+        nested = len(json.dumps(model_json_schema(combined_action.pydantic_model)))
+        compact = len(json.dumps(combined_action.json_schema(compact=True)))
+        self.assertLess(flat, nested)
+        self.assertLess(compact, flat)
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -1,8 +1,12 @@
 from __future__ import annotations
 
+import json
 import unittest
 
+from pydantic.json_schema import model_json_schema
+
 from actionweaver import action
+from actionweaver.actions.factories.combine import combine
 from actionweaver.actions.factories.repeat import repeat
 
 
@@ -19,6 +23,34 @@ class TestCase(unittest.TestCase):
         self.assertEqual(repeated_action.description, "docstring")
         self.assertEqual(repeated_action(**{"Func1": [{"a": 1}, {"a": 2}]}), "1\n2")
 
+    def test_flat_schema(self):
+        @action(name="Func1")
+        def func(a: int):
+            """docstring"""
+            return a
+
+        @action(name="Func2")
+        def bar(b: str):
+            """docstring"""
+            return b
+
+        repeated_action = repeat(combine([func, bar]))
+        schema = repeated_action.json_schema()
+
+        self.assertNotIn("$defs", schema)
+        items = schema["properties"]["Combine_Func1_Func2"]["items"]
+        self.assertEqual(set(items["properties"]), {"Func1", "Func2"})
+        self.assertEqual(
+            repeated_action(
+                **{"Combine_Func1_Func2": [{"Func1": {"a": 1}, "Func2": {"b": "x"}}]}
+            ),
+            "1\nx",
+        )
+
+        flat = len(json.dumps(schema))
+        nested = len(json.dumps(model_json_schema(repeated_action.pydantic_model)))
+        self.assertLess(flat, nested)
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -1,12 +1,13 @@
 from __future__ import annotations
 
+import asyncio
 import unittest
 from unittest.mock import Mock, call, patch
 from urllib import response
 
 from actionweaver.actions import Action
 from actionweaver.actions.factories.function import action
-from actionweaver.llms.general.action_processor import ActionProcessor
+from actionweaver.llms.general.action_processor import ActionProcessor, ActionResult
 
 
 class TestActionProcessor(unittest.TestCase):
@@ -87,6 +88,54 @@ class TestActionProcessor(unittest.TestCase):
         )
         self.assertTrue(err is None)
 
+    def test_respond_many(self):
+        def double(x: int):
+            """mock method"""
+            return 2 * x
+
+        def fail(x: int):
+            """mock method"""
+            raise RuntimeError("boom")
+
+        ap = ActionProcessor(tools=[action("Double")(double), action("Fail")(fail)])
+        texts = [
+            '{"function": "Double", "parameters": {"x": %d}}' % i for i in range(20)
+        ] + [
+            "hello",
+            '{"function": "Unknown", "parameters": {}}',
+            '{"function": "Fail", "parameters": {"x": 1}}',
+        ]
+
+        for results in (
+            ap.respond_many(texts, max_workers=4),
+            asyncio.run(ap.arespond_many(texts, max_concurrency=4)),
+        ):
+            self.assertEqual(len(results), len(texts))
+            self.assertTrue(all(isinstance(r, ActionResult) for r in results))
+            self.assertEqual([r.response for r in results[:20]], list(range(0, 40, 2)))
+            self.assertTrue(all(r.ok for r in results[:20]))
+            self.assertEqual(
+                results[0].function, {"name": "Double", "parameters": {"x": 0}}
+            )
+
+            extraction_error, not_found, invocation_error = results[20:]
+            self.assertFalse(extraction_error.ok)
+            self.assertIsNone(extraction_error.function)
+            self.assertEqual(not_found.error, "Function or tool not found")
+            self.assertIn("RuntimeError: boom", invocation_error.error)
+
+    def test_arespond_many_async_tool(self):
+        async def greet(name: str):
+            """mock method"""
+            await asyncio.sleep(0)
+            return f"Hello {name}"
+
+        ap = ActionProcessor(tools=[action("Greet")(greet)])
+        results = asyncio.run(
+            ap.arespond_many(['{"function": "Greet", "parameters": {"name": "Ada"}}'])
+        )
+        self.assertEqual(results[0].response, "Hello Ada")
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,151 @@
+from __future__ import annotations
+
+import unittest
+from unittest.mock import Mock
+
+from actionweaver.actions.factories.function import action
+from actionweaver.llms.general.chat import (
+    create_chat_loop,
+    generate_from_client,
+    generate_from_completion,
+)
+from actionweaver.llms.loop_engine import FunctionCallingLoopException
+
+
+def get_weather(location: str):
+    """Get the weather of a location"""
+    return f"Sunny in {location}"
+
+
+class TestGeneralChatLoop(unittest.TestCase):
+    def test_tool_call_then_answer(self):
+        generate = Mock(
+            side_effect=[
+                '{"function": "GetWeather", "parameters": {"location": "Paris"}}',
+                "It is sunny in Paris.",
+            ]
+        )
+        messages = [{"role": "user", "content": "Weather in Paris?"}]
+
+        response = create_chat_loop(generate)(
+            messages, actions=[action("GetWeather")(get_weather)], temperature=0
+        )
+
+        self.assertEqual(response, "It is sunny in Paris.")
+        self.assertEqual(
+            messages[-1]["content"], "Output of GetWeather: Sunny in Paris"
+        )
+
+        request = generate.call_args_list[0].args[0]
+        self.assertEqual(request[0]["role"], "system")
+        self.assertIn("GetWeather", request[0]["content"])
+        self.assertEqual(generate.call_args_list[0].kwargs, {"temperature": 0})
+
+    def test_stop_and_orch(self):
+        generate = Mock(
+            side_effect=[
+                '{"function": "GetWeather", "parameters": {"location": "Paris"}}',
+                '{"function": "Echo", "parameters": {"text": "done"}}',
+            ]
+        )
+        weather = action("GetWeather")(get_weather)
+
+        def echo(text: str):
+            """Echo"""
+            return text
+
+        response = create_chat_loop(generate)(
+            [{"role": "user", "content": "Hi"}],
+            actions=[weather],
+            orch={"GetWeather": [action("Echo", stop=True)(echo)]},
+        )
+
+        self.assertEqual(response, "done")
+        self.assertNotIn(
+            "GetWeather:", generate.call_args_list[1].args[0][0]["content"]
+        )
+
+    def test_invalid_call_is_sent_back(self):
+        generate = Mock(
+            side_effect=[
+                '{"function": "Unknown", "parameters": {}}',
+                "Sorry.",
+            ]
+        )
+        messages = [{"role": "user", "content": "Hi"}]
+
+        response = create_chat_loop(generate)(
+            messages, actions=[action("GetWeather")(get_weather)]
+        )
+
+        self.assertEqual(response, "Sorry.")
+        self.assertEqual(messages[-1]["content"], "Function or tool not found")
+
+    def test_streamed_generation(self):
+        consumed = []
+
+        def stream():
+            for chunk in [
+                "Sure, let me check.\n```json\n",
+                '{"function": "GetWeather", "parameters": {"location": "Pa',
+                'ris"}}\n```',
+                " and then I will keep talking",
+            ]:
+                consumed.append(chunk)
+                yield chunk
+
+        generate = Mock(side_effect=[stream(), "It is sunny in Paris."])
+        messages = [{"role": "user", "content": "Weather in Paris?"}]
+
+        response = create_chat_loop(generate)(
+            messages, actions=[action("GetWeather")(get_weather)]
+        )
+
+        self.assertEqual(response, "It is sunny in Paris.")
+        # the action is dispatched as soon as the JSON object closes
+        self.assertEqual(len(consumed), 3)
+        self.assertEqual(
+            messages[-1]["content"], "Output of GetWeather: Sunny in Paris"
+        )
+
+    def test_streamed_generation_without_tools(self):
+        generate = Mock(return_value=iter(["It is ", "sunny."]))
+
+        response = create_chat_loop(generate)([{"role": "user", "content": "Hi"}])
+
+        self.assertEqual(response, "It is sunny.")
+
+    def test_max_iterations(self):
+        generate = Mock(
+            return_value='{"function": "GetWeather", "parameters": {"location": "Paris"}}'
+        )
+
+        with self.assertRaises(FunctionCallingLoopException):
+            create_chat_loop(generate, max_iterations=3)(
+                [{"role": "user", "content": "Hi"}],
+                actions=[action("GetWeather")(get_weather)],
+            )
+        self.assertEqual(generate.call_count, 3)
+
+    def test_backends(self):
+        client = Mock()
+        client.chat.completions.create.return_value = Mock(
+            choices=[Mock(message=Mock(content="Hi"))]
+        )
+        generate = generate_from_client(client, "llama3", temperature=0)
+
+        self.assertEqual(generate([{"role": "user", "content": "Hello"}]), "Hi")
+        client.chat.completions.create.assert_called_once_with(
+            model="llama3",
+            messages=[{"role": "user", "content": "Hello"}],
+            temperature=0,
+        )
+
+        complete = Mock(return_value="Hi")
+        generate = generate_from_completion(complete)
+        self.assertEqual(generate([{"role": "user", "content": "Hello"}]), "Hi")
+        complete.assert_called_once_with("user: Hello\nassistant:")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,100 @@
+from __future__ import annotations
+
+import unittest
+
+from actionweaver.llms.general.extractor import (
+    StreamingJSONExtractor,
+    extract_json,
+    is_function_call,
+)
+
+
+class TestStreamingJSONExtractor(unittest.TestCase):
+    def test_prose_and_code_fences(self):
+        text = (
+            "I'll look up {the weather} for you.\n"
+            "```json\n"
+            '{"function": "GetWeather", "parameters": {"location": "Paris"}}\n'
+            "```\n"
+            'Then {"function": "Other", "parameters": {}}'
+        )
+        self.assertEqual(
+            extract_json(text, is_function_call),
+            {"function": "GetWeather", "parameters": {"location": "Paris"}},
+        )
+
+    def test_braces_and_escapes_in_strings(self):
+        text = r'{"function": "Echo", "parameters": {"text": "a } \" { b \\"}}'
+        self.assertEqual(
+            extract_json(text)["parameters"]["text"],
+            'a } " { b \\',
+        )
+
+    def test_chunk_by_chunk(self):
+        text = 'ok {"function": "Echo", "parameters": {"text": "x\\"}"}} trailing'
+        for size in (1, 2, 3, 7):
+            extractor = StreamingJSONExtractor(is_function_call)
+            chunks = [text[i : i + size] for i in range(0, len(text), size)]
+
+            results = [extractor.feed(chunk) for chunk in chunks]
+            first = next(i for i, r in enumerate(results) if r is not None)
+            self.assertEqual(
+                results[first],
+                {"function": "Echo", "parameters": {"text": 'x"}'}},
+            )
+            # the object is returned with the chunk of its closing brace
+            self.assertEqual(first, (text.index("}} ") + 1) // size)
+
+    def test_rejected_candidates_are_skipped(self):
+        extractor = StreamingJSONExtractor(is_function_call)
+        self.assertIsNone(extractor.feed('{"a": 1} {not json} '))
+        self.assertEqual(
+            extractor.feed('{"function": "F", "parameters": {}}'),
+            {"function": "F", "parameters": {}},
+        )
+
+    def test_nested_in_rejected_candidate(self):
+        text = '{"a": {"function": "F", "parameters": {"x": "}"}}, "b": 1} tail'
+        self.assertEqual(
+            extract_json(text, is_function_call),
+            {"function": "F", "parameters": {"x": "}"}},
+        )
+
+        # same result chunk by chunk, and objects inside strings are not extracted
+        for size in (1, 4):
+            extractor = StreamingJSONExtractor(is_function_call)
+            for i in range(0, len(text), size):
+                extractor.feed(text[i : i + size])
+            self.assertEqual(extractor.result["function"], "F")
+        with self.assertRaises(ValueError):
+            extract_json(
+                '{"a": "{\\"function\\": \\"F\\", \\"parameters\\": {}}"}',
+                is_function_call,
+            )
+
+    def test_brace_in_string_of_rejected_candidate(self):
+        text = '{"note": "use {"} then {"function": "f", "parameters": {}}'
+        self.assertEqual(
+            extract_json(text, is_function_call), {"function": "f", "parameters": {}}
+        )
+
+        extractor = StreamingJSONExtractor(is_function_call)
+        for i in range(0, len(text), 3):
+            extractor.feed(text[i : i + 3])
+        self.assertEqual(extractor.result["function"], "f")
+
+    def test_many_rejected_candidates(self):
+        text = '{"x": 1} ' * 3000 + '{"function": "f", "parameters": {}}'
+        self.assertEqual(extract_json(text, is_function_call)["function"], "f")
+
+        # nested rejected objects are not rescanned recursively either
+        text = '{"a": ' * 500 + '{"function": "f", "parameters": {}}' + "}" * 500
+        self.assertEqual(extract_json(text, is_function_call)["function"], "f")
+
+    def test_no_object(self):
+        with self.assertRaises(ValueError):
+            extract_json("hello {")
+
+
+if __name__ == "__main__":
+    unittest.main()
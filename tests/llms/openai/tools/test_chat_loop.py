@@ -0,0 +1,596 @@
+from __future__ import annotations
+
+import threading
+import time
+import unittest
+from unittest.mock import Mock
+
+from openai.types.chat.chat_completion import ChatCompletion
+
+from actionweaver.actions.factories.function import action
+from actionweaver.llms.hedging import HedgingPolicy
+from actionweaver.llms.history import SlidingWindowPolicy
+from actionweaver.llms.hooks import ChatLoopHooks
+from actionweaver.llms.loop_guard import LoopGuard, LoopLimitException
+from actionweaver.llms.openai.tools.chat_loop import create_chat_loop
+from actionweaver.llms.tool_output import OutputLimiter, OutputStore, SpillToStore
+from actionweaver.llms.tool_selection import BM25ToolSelector
+from actionweaver.telemetry import InMemorySpanExporter, Tracer
+from actionweaver.telemetry.metrics import (
+    API_REQUEST_DURATION,
+    DEDUPLICATED_TOOL_CALLS,
+    LOOP_ITERATIONS,
+    TOKENS_PER_REQUEST,
+)
+from actionweaver.utils.deadline import DeadlineExceededException, remaining_time
+from actionweaver.utils.tokens import (
+    ModelPrice,
+    PriceTable,
+    TokenEstimator,
+    TokenPreflightException,
+    TokenUsageTracker,
+    TokenUsageTrackerException,
+    token_budget,
+)
+
+
+def generate_function_call_response(names, arguments, usage=None):
+    return ChatCompletion(
+        **{
+            "id": "chatcmpl-8WCZDJ12zHTvK8YltBeeDN0NGn0PI",
+            "choices": [
+                {
+                    "finish_reason": "tool_calls",
+                    "index": 0,
+                    "message": {
+                        "content": None,
+                        "role": "assistant",
+                        "function_call": None,
+                        "tool_calls": [
+                            {
+                                "id": f"call_{i}",
+                                "function": {"arguments": argument, "name": name},
+                                "type": "function",
+                            }
+                            for i, (name, argument) in enumerate(zip(names, arguments))
+                        ],
+                    },
+                    "logprobs": None,
+                }
+            ],
+            "created": 1702685495,
+            "model": "gpt-3.5-turbo-1106",
+            "object": "chat.completion",
+            "system_fingerprint": "fp_772e8125bb",
+            "usage": usage
+            or {"completion_tokens": 70, "prompt_tokens": 130, "total_tokens": 200},
+        }
+    )
+
+
+def generate_message_response(content, usage=None):
+    return ChatCompletion(
+        **{
+            "id": "chatcmpl-8WCdHNVdrYkU8cir7xYcji02Lenuw",
+            "choices": [
+                {
+                    "finish_reason": "stop",
+                    "index": 0,
+                    "message": {
+                        "content": content,
+                        "role": "assistant",
+                        "function_call": None,
+                        "tool_calls": None,
+                    },
+                    "logprobs": None,
+                }
+            ],
+            "created": 1702685747,
+            "model": "gpt-3.5-turbo-1106",
+            "object": "chat.completion",
+            "system_fingerprint": "fp_772e8125bb",
+            "usage": usage
+            or {"completion_tokens": 35, "prompt_tokens": 27, "total_tokens": 62},
+        }
+    )
+
+
+def make_action(name, description, func=None, **kwargs):
+    def echo(text: str):
+        return text
+
+    func = func or echo
+    return action(name, description=description, **kwargs)(func)
+
+
+class TestChatLoop(unittest.TestCase):
+    def test_tool_selector(self):
+        mock_create = Mock()
+        mock_create.side_effect = [
+            generate_function_call_response(["GetWeather"], ['{"text": "Paris"}']),
+            generate_message_response("sunny"),
+        ]
+        actions = [
+            make_action("GetWeather", "Get the current weather for a location"),
+            make_action("SearchFlights", "Search flights between two airports"),
+            make_action("BookHotel", "Book a hotel room in a city"),
+        ]
+
+        messages = [{"role": "user", "content": "What's the weather in Paris?"}]
+        response = create_chat_loop(mock_create)(
+            model="test",
+            messages=messages,
+            actions=actions,
+            tool_selector=BM25ToolSelector(top_k=1),
+        )
+
+        self.assertEqual(response.choices[0].message.content, "sunny")
+        for call in mock_create.call_args_list:
+            self.assertEqual(
+                [tool["function"]["name"] for tool in call.kwargs["tools"]],
+                ["GetWeather"],
+            )
+
+    def test_token_estimator_preflight(self):
+        mock_create = Mock()
+        mock_create.side_effect = [
+            generate_function_call_response(["Echo"], ['{"text": "hi"}']),
+            generate_message_response("done"),
+        ]
+        tracker = TokenUsageTracker(budget=250)
+
+        with self.assertRaises(TokenPreflightException):
+            create_chat_loop(mock_create)(
+                model="test",
+                messages=[{"role": "user", "content": "Hi!"}],
+                actions=[make_action("Echo", "Echo the text")],
+                token_usage_tracker=tracker,
+                token_estimator=TokenEstimator(reserved_completion_tokens=40),
+            )
+
+        # the first call used 200 tokens, the second request is rejected before it is sent
+        self.assertEqual(mock_create.call_count, 1)
+        self.assertEqual(tracker.tracker["total_tokens"], 200)
+
+    def test_token_estimator_preflight_under_budget(self):
+        mock_create = Mock(side_effect=[generate_message_response("done")])
+
+        with token_budget(budget=10):
+            with self.assertRaises(TokenPreflightException):
+                create_chat_loop(mock_create)(
+                    model="test",
+                    messages=[{"role": "user", "content": "Hi! " * 500}],
+                    token_estimator=TokenEstimator(),
+                )
+
+        # the enclosing budget is checked before the request is sent
+        mock_create.assert_not_called()
+
+    def test_history_policy(self):
+        mock_create = Mock()
+        mock_create.side_effect = [
+            generate_function_call_response(["Echo"], ['{"text": "hi"}']),
+            generate_message_response("done"),
+        ]
+        policy = SlidingWindowPolicy(max_messages=2)
+
+        messages = [
+            {"role": "system", "content": "You are a helpful assistant"},
+            {"role": "user", "content": "Hello"},
+            {"role": "assistant", "content": "Hi, how can I help?"},
+            {"role": "user", "content": "Echo hi"},
+        ]
+        create_chat_loop(mock_create)(
+            model="test",
+            messages=messages,
+            actions=[make_action("Echo", "Echo the text")],
+            history_policy=policy,
+        )
+
+        sent = [call.kwargs["messages"] for call in mock_create.call_args_list]
+        self.assertEqual(sent[0], [messages[0], messages[2], messages[3]])
+        # the tool call and its response are sent together
+        self.assertEqual(sent[1], [messages[0], messages[4], messages[5]])
+        # the caller's messages keep the whole history
+        self.assertEqual(len(messages), 6)
+        self.assertEqual(policy.stats["requests"], 2)
+
+    def test_output_limiter_spill_to_store(self):
+        store = OutputStore(page_size=100)
+        mock_create = Mock()
+
+        def read_handle(**kwargs):
+            # the LLM reads the second page of the stored output
+            content = messages[-1]["content"]
+            handle = content.split("stored as ")[1].split(" ")[0]
+            return generate_function_call_response(
+                ["ReadToolOutput"], [f'{{"handle": "{handle}", "page": 2}}']
+            )
+
+        responses = iter(
+            [
+                generate_function_call_response(["Query"], ['{"text": "q"}']),
+                read_handle,
+                generate_message_response("done"),
+            ]
+        )
+
+        def create(**kwargs):
+            response = next(responses)
+            return response(**kwargs) if callable(response) else response
+
+        mock_create.side_effect = create
+
+        messages = [{"role": "user", "content": "run the query"}]
+        create_chat_loop(mock_create)(
+            model="test",
+            messages=messages,
+            actions=[make_action("Query", "Run a query", func=lambda text: "x" * 1000)],
+            output_limiter=OutputLimiter(max_chars=400, strategy=SpillToStore(store)),
+        )
+
+        tools = [
+            [tool["function"]["name"] for tool in call.kwargs["tools"]]
+            for call in mock_create.call_args_list
+        ]
+        self.assertEqual(
+            tools, [["Query"], ["Query", "ReadToolOutput"], ["Query", "ReadToolOutput"]]
+        )
+        self.assertEqual(messages[-1]["name"], "ReadToolOutput")
+        self.assertEqual(messages[-1]["content"], "[page 2/10]\n" + "x" * 100)
+
+    def test_tracer(self):
+        mock_create = Mock()
+        mock_create.side_effect = [
+            generate_function_call_response(["Echo"], ['{"text": "hi"}']),
+            generate_message_response("done"),
+        ]
+
+        exporter = InMemorySpanExporter()
+        create_chat_loop(mock_create)(
+            model="test",
+            messages=[{"role": "user", "content": "say hi"}],
+            actions=[make_action("Echo", "Echo the text")],
+            tracer=Tracer(exporter),
+        )
+
+        spans = exporter.get_finished_spans()
+        self.assertEqual(
+            [span.name for span in spans],
+            [
+                "chat.completions.create",
+                "actionweaver.action",
+                "chat.completions.create",
+                "actionweaver.chat_loop",
+            ],
+        )
+        root = spans[-1]
+        self.assertTrue(all(span.parent_span_id == root.span_id for span in spans[:-1]))
+        self.assertEqual(root.attributes["actionweaver.iterations"], 2)
+        self.assertEqual(spans[0].attributes["gen_ai.usage.prompt_tokens"], 130)
+        self.assertEqual(spans[1].attributes["actionweaver.action.name"], "Echo")
+        self.assertLessEqual(root.self_time_ns, root.duration_ns)
+
+    def test_metrics(self):
+        mock_create = Mock()
+        mock_create.side_effect = [
+            generate_function_call_response(["Echo"], ['{"text": "hi"}']),
+            generate_message_response("done"),
+        ]
+        model = "test_metrics"
+
+        create_chat_loop(mock_create)(
+            model=model,
+            messages=[{"role": "user", "content": "say hi"}],
+            actions=[make_action("Echo", "Echo the text")],
+        )
+
+        self.assertEqual(API_REQUEST_DURATION.count(model=model), 2)
+        self.assertEqual(LOOP_ITERATIONS.count(model=model), 1)
+        self.assertEqual(LOOP_ITERATIONS.sum(model=model), 2)
+        self.assertEqual(
+            TOKENS_PER_REQUEST.sum(model=model, type="prompt_tokens"), 130 + 27
+        )
+
+    def test_hooks(self):
+        events = []
+
+        class RecordingHooks(ChatLoopHooks):
+            def before_request(self, request):
+                events.append(("before_request", len(request["messages"])))
+
+            def after_response(self, request, response):
+                events.append(("after_response", response.choices[0].finish_reason))
+
+            def after_tool(self, name, arguments, output):
+                events.append(("after_tool", name, output))
+
+            def on_loop_end(self, messages, result, error=None):
+                events.append(("on_loop_end", result.choices[0].message.content))
+
+        class CachingHooks(ChatLoopHooks):
+            def before_request(self, request):
+                if len(request["messages"]) > 1:
+                    return generate_message_response("cached")
+
+            def before_tool(self, name, arguments):
+                return arguments["text"].upper()
+
+        mock_create = Mock()
+        mock_create.side_effect = [
+            generate_function_call_response(["Echo"], ['{"text": "hi"}']),
+        ]
+        messages = [{"role": "user", "content": "say hi"}]
+        response = create_chat_loop(mock_create)(
+            model="test",
+            messages=messages,
+            actions=[make_action("Echo", "Echo the text")],
+            hooks=[RecordingHooks(), CachingHooks()],
+        )
+
+        # the second API call is served by the caching hook
+        self.assertEqual(mock_create.call_count, 1)
+        self.assertEqual(response.choices[0].message.content, "cached")
+        self.assertEqual(messages[-1]["content"], "HI")
+        self.assertEqual(
+            events,
+            [
+                ("before_request", 1),
+                ("after_response", "tool_calls"),
+                ("after_tool", "Echo", "HI"),
+                ("before_request", 3),
+                ("after_response", "stop"),
+                ("on_loop_end", "cached"),
+            ],
+        )
+
+    def test_cost_attribution(self):
+        mock_create = Mock()
+        mock_create.side_effect = [
+            generate_function_call_response(["Echo"], ['{"text": "hi"}']),
+            generate_message_response("done"),
+        ]
+
+        tracker = TokenUsageTracker(
+            price_table=PriceTable({"test": ModelPrice(prompt=1, completion=1)})
+        )
+        create_chat_loop(mock_create)(
+            model="test",
+            messages=[{"role": "user", "content": "say hi"}],
+            actions=[make_action("Echo", "Echo the text")],
+            token_usage_tracker=tracker,
+        )
+
+        self.assertAlmostEqual(tracker.cost, (200 + 62) / 1e6)
+        self.assertEqual(tracker.by_action["(request)"]["total_tokens"], 200)
+        self.assertEqual(tracker.by_action["Echo"]["total_tokens"], 62)
+
+    def test_nested_loops_share_budget(self):
+        inner_create = Mock()
+        inner_create.side_effect = [generate_message_response("inner")]
+
+        def delegate(text: str):
+            """Delegate to a sub-agent"""
+            create_chat_loop(inner_create)(
+                model="test", messages=[{"role": "user", "content": text}]
+            )
+            return "delegated"
+
+        mock_create = Mock()
+        mock_create.side_effect = [
+            generate_function_call_response(["Delegate"], ['{"text": "hi"}']),
+            generate_message_response("done"),
+        ]
+
+        with token_budget(budget=300) as budget:
+            with self.assertRaises(TokenUsageTrackerException):
+                create_chat_loop(mock_create)(
+                    model="test",
+                    messages=[{"role": "user", "content": "delegate"}],
+                    actions=[action("Delegate")(delegate)],
+                )
+
+        # outer call (200) + sub-agent call (62) + final outer call (62)
+        self.assertEqual(budget.tracker["total_tokens"], 324)
+
+    def test_passed_tracker_is_charged_to_the_budget(self):
+        mock_create = Mock(side_effect=[generate_message_response("done")])
+        tracker = TokenUsageTracker()
+
+        with token_budget(budget=1000) as budget:
+            create_chat_loop(mock_create)(
+                model="test",
+                messages=[{"role": "user", "content": "hi"}],
+                token_usage_tracker=tracker,
+            )
+
+        self.assertEqual(budget.tracker["total_tokens"], 62)
+        self.assertEqual(tracker.tracker["total_tokens"], 62)
+        self.assertIsNone(tracker.parent)
+
+    def test_hedging_tracks_discarded_tokens(self):
+        release = threading.Event()
+        calls = []
+
+        def create(**kwargs):
+            calls.append(kwargs)
+            if len(calls) == 1:
+                release.wait(5)
+            return generate_message_response("done")
+
+        policy = HedgingPolicy(delay=0.05)
+        tracker = TokenUsageTracker()
+        response = create_chat_loop(create)(
+            model="test",
+            messages=[{"role": "user", "content": "hi"}],
+            token_usage_tracker=tracker,
+            hedging=policy,
+        )
+        self.assertEqual(response.choices[0].message.content, "done")
+        self.assertEqual(tracker.tracker["total_tokens"], 62)
+
+        release.set()
+        policy.shutdown()
+        self.assertEqual(tracker.tracker["total_tokens"], 124)
+        self.assertEqual(tracker.by_action["(hedge)"]["total_tokens"], 62)
+
+    def test_deadline(self):
+        def slow(text: str):
+            """Slow action"""
+            self.assertLessEqual(remaining_time(), 0.2)
+            time.sleep(0.25)
+            return text
+
+        for on_deadline in ("raise", "return"):
+            mock_create = Mock()
+            first_response = generate_function_call_response(
+                ["Slow"], ['{"text": "hi"}']
+            )
+            mock_create.side_effect = [
+                first_response,
+                generate_message_response("done"),
+            ]
+
+            loop = create_chat_loop(mock_create)
+            arguments = dict(
+                model="test",
+                messages=[{"role": "user", "content": "hi"}],
+                actions=[action("Slow")(slow)],
+                deadline=0.2,
+                on_deadline=on_deadline,
+            )
+            if on_deadline == "raise":
+                with self.assertRaises(DeadlineExceededException):
+                    loop(**arguments)
+            else:
+                self.assertIs(loop(**arguments), first_response)
+
+            self.assertEqual(mock_create.call_count, 1)
+            # the first of two expected iterations gets half of the time left
+            self.assertLessEqual(mock_create.call_args.kwargs["timeout"], 0.1)
+
+    def test_deadline_single_call_without_tools(self):
+        mock_create = Mock(side_effect=[generate_message_response("done")])
+
+        create_chat_loop(mock_create)(
+            model="test",
+            messages=[{"role": "user", "content": "hi"}],
+            deadline=10,
+        )
+
+        # no tools are offered, the call is the last one and gets all the time left
+        self.assertGreater(mock_create.call_args.kwargs["timeout"], 9)
+
+    def test_loop_guard(self):
+        calls = []
+
+        def echo(text: str, suffix: str = ""):
+            """Echo the text"""
+            calls.append(text)
+            return text + suffix
+
+        repeated = generate_function_call_response(
+            ["Echo"], ['{"text": "hi", "suffix": "!"}']
+        )
+        reordered = generate_function_call_response(
+            ["Echo"], ['{"suffix": "!", "text": "hi"}']
+        )
+
+        mock_create = Mock()
+        mock_create.side_effect = [
+            repeated,
+            reordered,
+            repeated,
+            generate_message_response("done"),
+        ]
+        guard = LoopGuard(max_repeated_calls=1)
+        messages = [{"role": "user", "content": "hi"}]
+        response = create_chat_loop(mock_create)(
+            model="test",
+            messages=messages,
+            actions=[action("Echo")(echo)],
+            loop_guard=guard,
+        )
+
+        self.assertEqual(response.choices[0].message.content, "done")
+        self.assertEqual(calls, ["hi"])
+        self.assertEqual(messages[-1]["content"], "hi!")
+        self.assertEqual(
+            [call.kwargs["tool_choice"] for call in mock_create.call_args_list],
+            ["auto", "auto", "auto", "none"],
+        )
+        self.assertEqual(guard.stats["memo_hits"], 2)
+        self.assertEqual(guard.stats["limits_reached"], 1)
+
+        mock_create = Mock()
+        mock_create.side_effect = [repeated] * 3
+        with self.assertRaises(LoopLimitException):
+            create_chat_loop(mock_create)(
+                model="test",
+                messages=[{"role": "user", "content": "hi"}],
+                actions=[action("Echo")(echo)],
+                loop_guard=LoopGuard(max_iterations=2, on_limit="raise"),
+            )
+        self.assertEqual(mock_create.call_count, 2)
+
+    def test_dedupe_tool_calls(self):
+        calls = []
+
+        def lookup(key: str, verbose: bool = False):
+            """Look up a key"""
+            calls.append(key)
+            return f"value of {key}"
+
+        mock_create = Mock()
+        mock_create.side_effect = [
+            generate_function_call_response(
+                ["DedupeLookup"] * 3,
+                [
+                    '{"key": "a", "verbose": true}',
+                    '{"verbose": true, "key": "a"}',
+                    '{"key": "b"}',
+                ],
+            ),
+            generate_message_response("done"),
+        ]
+        saved = DEDUPLICATED_TOOL_CALLS.value(action="DedupeLookup")
+
+        messages = [{"role": "user", "content": "look up a and b"}]
+        create_chat_loop(mock_create)(
+            model="test",
+            messages=messages,
+            actions=[action("DedupeLookup")(lookup)],
+            dedupe_tool_calls=True,
+        )
+
+        self.assertEqual(calls, ["a", "b"])
+        self.assertEqual(
+            [(m["tool_call_id"], m["content"]) for m in messages[2:]],
+            [
+                ("call_0", "value of a"),
+                ("call_1", "value of a"),
+                ("call_2", "value of b"),
+            ],
+        )
+        self.assertEqual(
+            DEDUPLICATED_TOOL_CALLS.value(action="DedupeLookup"), saved + 1
+        )
+
+        # off by default, every call is made
+        calls.clear()
+        mock_create.side_effect = [
+            generate_function_call_response(
+                ["DedupeLookup"] * 2, ['{"key": "a"}', '{"key": "a"}']
+            ),
+            generate_message_response("done"),
+        ]
+        create_chat_loop(mock_create)(
+            model="test",
+            messages=[{"role": "user", "content": "look up a twice"}],
+            actions=[action("DedupeLookup")(lookup)],
+        )
+        self.assertEqual(calls, ["a", "a"])
+
+
+if __name__ == "__main__":
+    unittest.main()
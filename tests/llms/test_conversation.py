@@ -0,0 +1,59 @@
+import unittest
+from unittest.mock import Mock
+
+from actionweaver.llms.conversation import Conversation, wire_messages
+
+
+class TestConversation(unittest.TestCase):
+    def test_list_behaviour(self):
+        conversation = Conversation([{"role": "system", "content": "Be brief"}])
+        conversation += [{"role": "user", "content": "Hi"}]
+        conversation.append({"role": "assistant", "content": "Hello"})
+
+        self.assertEqual(len(conversation), 3)
+        self.assertEqual(conversation[-1]["content"], "Hello")
+        self.assertEqual([m["role"] for m in conversation[1:]], ["user", "assistant"])
+        self.assertEqual([m["role"] for m in reversed(conversation)][0], "assistant")
+        with self.assertRaises(IndexError):
+            conversation[3]
+
+    def test_forks_share_prefix(self):
+        conversation = Conversation([{"role": "user", "content": "Hi"}])
+        a, b = conversation.fork(), conversation.fork()
+
+        a.append({"role": "assistant", "content": "A"})
+        # no copy until another fork appends
+        self.assertIs(a._log, conversation._log)
+
+        b.append({"role": "assistant", "content": "B"})
+        self.assertIsNot(b._log, a._log)
+
+        self.assertEqual(len(conversation), 1)
+        self.assertEqual(a[-1]["content"], "A")
+        self.assertEqual(b[-1]["content"], "B")
+        self.assertIs(a[0], b[0])
+
+    def test_wire_format_is_cached(self):
+        message = Mock()
+        message.model_dump.return_value = {"role": "assistant", "content": "Hello"}
+        conversation = Conversation([{"role": "user", "content": "Hi"}, message])
+
+        self.assertEqual(
+            conversation.to_wire(),
+            [
+                {"role": "user", "content": "Hi"},
+                {"role": "assistant", "content": "Hello"},
+            ],
+        )
+        fork = conversation.fork()
+        fork.append({"role": "user", "content": "Bye"})
+        self.assertEqual(len(fork.to_wire()), 3)
+        self.assertEqual(len(conversation.to_wire()), 2)
+        message.model_dump.assert_called_once_with(exclude_none=True)
+
+        messages = [{"role": "user", "content": "Hi"}]
+        self.assertIs(wire_messages(messages), messages)
+
+
+if __name__ == "__main__":
+    unittest.main()
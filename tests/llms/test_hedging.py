@@ -0,0 +1,79 @@
+import threading
+import time
+import unittest
+
+from actionweaver.llms.hedging import HedgingPolicy
+
+
+class TestHedgingPolicy(unittest.TestCase):
+    def test_hedge_delay_from_observed_latencies(self):
+        policy = HedgingPolicy(percentile=0.9, min_samples=10)
+        for latency in range(1, 10):
+            policy.observe(latency)
+        self.assertIsNone(policy.hedge_delay())
+
+        policy.observe(10)
+        self.assertEqual(policy.hedge_delay(), 9)
+        self.assertEqual(HedgingPolicy(delay=0.5).hedge_delay(), 0.5)
+
+    def test_fast_call_is_not_hedged(self):
+        policy = HedgingPolicy(delay=1)
+        calls = []
+
+        def create(**kwargs):
+            calls.append(kwargs)
+            return "response"
+
+        self.assertEqual(policy.call(create, model="m"), "response")
+        self.assertEqual(calls, [{"model": "m"}])
+        self.assertEqual(policy.stats["hedged"], 0)
+        policy.shutdown()
+
+    def test_slow_call_is_hedged(self):
+        policy = HedgingPolicy(delay=0.05)
+        release = threading.Event()
+        discarded = []
+        calls = []
+
+        def create(**kwargs):
+            calls.append(kwargs)
+            if len(calls) == 1:
+                release.wait(5)
+                return "slow"
+            return "fast"
+
+        response = policy.call(create, on_discarded=discarded.append, model="m")
+        self.assertEqual(response, "fast")
+        self.assertEqual(len(calls), 2)
+        self.assertEqual(policy.stats["hedge_wins"], 1)
+
+        # the losing call completes in the background and is reported as discarded
+        release.set()
+        policy.shutdown()
+        self.assertEqual(discarded, ["slow"])
+
+    def test_error_of_one_call_uses_the_other(self):
+        policy = HedgingPolicy(delay=0.01)
+        calls = []
+
+        def create():
+            calls.append(None)
+            if len(calls) == 1:
+                time.sleep(0.05)
+                raise ValueError("primary failed")
+            time.sleep(0.1)
+            return "hedge"
+
+        self.assertEqual(policy.call(create), "hedge")
+        policy.shutdown()
+
+        def fail():
+            time.sleep(0.02)
+            raise ValueError("failed")
+
+        with self.assertRaises(ValueError):
+            HedgingPolicy(delay=0.01).call(fail)
+
+
+if __name__ == "__main__":
+    unittest.main()
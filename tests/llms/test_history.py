@@ -0,0 +1,106 @@
+from __future__ import annotations
+
+import unittest
+
+from actionweaver.llms.history import (
+    SlidingWindowPolicy,
+    SummarizationPolicy,
+    TokenBudgetPolicy,
+)
+
+
+def tool_call_pair(call_id, content):
+    return [
+        {
+            "role": "assistant",
+            "content": None,
+            "tool_calls": [
+                {
+                    "id": call_id,
+                    "type": "function",
+                    "function": {"name": "Search", "arguments": "{}"},
+                }
+            ],
+        },
+        {"role": "tool", "tool_call_id": call_id, "name": "Search", "content": content},
+    ]
+
+
+class TestHistoryPolicies(unittest.TestCase):
+    def setUp(self):
+        self.messages = (
+            [
+                {"role": "system", "content": "You are a helpful assistant"},
+                {"role": "user", "content": "u" * 40},
+            ]
+            + tool_call_pair("call_1", "a" * 40)
+            + tool_call_pair("call_2", "b" * 40)
+            + [{"role": "user", "content": "and now?"}]
+        )
+
+    def test_sliding_window_keeps_tool_call_pairs(self):
+        policy = SlidingWindowPolicy(max_messages=2)
+        result = policy.apply(self.messages)
+
+        self.assertEqual(result, [self.messages[0], self.messages[-1]])
+
+        policy = SlidingWindowPolicy(max_messages=3)
+        self.assertEqual(
+            policy.apply(self.messages), [self.messages[0]] + self.messages[-3:]
+        )
+        self.assertEqual(policy.stats["requests"], 1)
+        self.assertEqual(policy.stats["messages_dropped"], 3)
+        self.assertGreater(policy.stats["tokens_saved"], 0)
+
+    def test_token_budget(self):
+        policy = TokenBudgetPolicy(max_tokens=50)
+        result = policy.apply(self.messages)
+
+        self.assertEqual(result, [self.messages[0]] + self.messages[-3:])
+        self.assertEqual(
+            policy.stats["tokens_saved"],
+            policy.stats["tokens_before"] - policy.stats["tokens_after"],
+        )
+
+    def test_summarization_is_incremental(self):
+        summarized = []
+
+        def summarizer(messages):
+            summarized.append(messages)
+            return f"summary of {len(messages)} messages"
+
+        policy = SummarizationPolicy(summarizer, max_tokens=50, keep_recent_tokens=10)
+        result = policy.apply(self.messages)
+
+        self.assertEqual(len(summarized), 1)
+        self.assertEqual(summarized[0], self.messages[1:6])
+        self.assertEqual(
+            result,
+            [
+                self.messages[0],
+                {
+                    "role": "system",
+                    "content": "Summary of the earlier conversation: summary of 5 messages",
+                },
+                self.messages[-1],
+            ],
+        )
+
+        # the same history does not trigger a new summary
+        policy.apply(self.messages)
+        self.assertEqual(len(summarized), 1)
+
+        # new messages only summarize what left the recent window
+        messages = self.messages + [{"role": "assistant", "content": "c" * 40}]
+        messages += [{"role": "user", "content": "ok"}]
+        policy.apply(messages)
+        self.assertEqual(len(summarized), 2)
+        self.assertEqual(summarized[1], [result[1], self.messages[-1], messages[-2]])
+
+    def test_short_history_is_unchanged(self):
+        policy = SummarizationPolicy(lambda m: "", max_tokens=10000)
+        self.assertEqual(policy.apply(self.messages), self.messages)
+
+
+if __name__ == "__main__":
+    unittest.main()
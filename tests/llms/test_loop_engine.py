@@ -0,0 +1,330 @@
+import unittest
+from unittest.mock import MagicMock, Mock
+
+from openai import Stream
+from openai.types.chat.chat_completion import ChatCompletion
+from openai.types.chat.chat_completion_chunk import ChatCompletionChunk
+
+from actionweaver.actions.factories.function import action
+from actionweaver.llms.conversation import Conversation
+from actionweaver.llms.loop_engine import (
+    FunctionCallingLoopException,
+    create_chat_loop,
+)
+from actionweaver.llms.loop_guard import LoopGuard
+from actionweaver.llms.transports import FunctionsTransport, ToolsTransport
+
+
+def generate_function_call_response(name, arguments):
+    return ChatCompletion(
+        **{
+            "id": "chatcmpl-8J02pR3nTveTRRgDsAP94HpG2pyi9",
+            "choices": [
+                {
+                    "finish_reason": "function_call",
+                    "index": 0,
+                    "message": {
+                        "content": None,
+                        "role": "assistant",
+                        "function_call": {"arguments": arguments, "name": name},
+                        "tool_calls": None,
+                    },
+                    "logprobs": None,
+                }
+            ],
+            "created": 1699539095,
+            "model": "gpt-3.5-turbo-0613",
+            "object": "chat.completion",
+            "usage": {
+                "completion_tokens": 18,
+                "prompt_tokens": 83,
+                "total_tokens": 101,
+            },
+        }
+    )
+
+
+def generate_tool_call_response(name, arguments):
+    return ChatCompletion(
+        **{
+            "id": "chatcmpl-8J02pR3nTveTRRgDsAP94HpG2pyi9",
+            "choices": [
+                {
+                    "finish_reason": "tool_calls",
+                    "index": 0,
+                    "message": {
+                        "content": None,
+                        "role": "assistant",
+                        "tool_calls": [
+                            {
+                                "id": "call_1",
+                                "type": "function",
+                                "function": {"arguments": arguments, "name": name},
+                            }
+                        ],
+                    },
+                    "logprobs": None,
+                }
+            ],
+            "created": 1699539095,
+            "model": "gpt-3.5-turbo-0613",
+            "object": "chat.completion",
+            "usage": {
+                "completion_tokens": 18,
+                "prompt_tokens": 83,
+                "total_tokens": 101,
+            },
+        }
+    )
+
+
+def generate_message_response(content, finish_reason="stop"):
+    return ChatCompletion(
+        **{
+            "id": "chatcmpl-8IzsbGIxAwpvBncWoh3Hy4jFCqo35",
+            "choices": [
+                {
+                    "finish_reason": finish_reason,
+                    "index": 0,
+                    "message": {"content": content, "role": "assistant"},
+                    "logprobs": None,
+                }
+            ],
+            "created": 1699538461,
+            "model": "gpt-3.5-turbo-0613",
+            "object": "chat.completion",
+            "usage": {"completion_tokens": 9, "prompt_tokens": 19, "total_tokens": 28},
+        }
+    )
+
+
+def generate_stream(deltas):
+    chunks = [
+        ChatCompletionChunk(
+            **{
+                "id": "chatcmpl-8Izk9ayIEYUKWLhGmdpBqJOomrdpR",
+                "choices": [
+                    {
+                        "delta": delta,
+                        "finish_reason": finish_reason,
+                        "index": 0,
+                    }
+                ],
+                "created": 1699537937,
+                "model": "gpt-3.5-turbo-0613",
+                "object": "chat.completion.chunk",
+            }
+        )
+        for delta, finish_reason in deltas
+    ]
+    stream = MagicMock(spec=Stream)
+    stream.__iter__.return_value = iter(chunks)
+    return stream
+
+
+def make_action(name, stop=False):
+    def echo(text: str):
+        """echo"""
+        return text
+
+    return action(name, stop=stop)(echo)
+
+
+class TestLoopEngine(unittest.TestCase):
+    def test_functions_transport_stop(self):
+        mock_create = Mock(
+            side_effect=[generate_function_call_response("Echo", '{"text": "hi"}')]
+        )
+        messages = [{"role": "user", "content": "Hi!"}]
+
+        response = create_chat_loop(mock_create, FunctionsTransport())(
+            model="test", messages=messages, actions=[make_action("Echo", stop=True)]
+        )
+
+        # a single output is returned for the functions API, which calls one function per response
+        self.assertEqual(response, "hi")
+        self.assertEqual(
+            messages[1:],
+            [
+                {
+                    "role": "assistant",
+                    "content": None,
+                    "function_call": {"arguments": '{"text": "hi"}', "name": "Echo"},
+                },
+                {"role": "function", "name": "Echo", "content": "hi"},
+            ],
+        )
+
+    def test_functions_transport_loop_guard(self):
+        mock_create = Mock(
+            side_effect=[
+                generate_function_call_response("Echo", '{"text": "hi"}'),
+                generate_function_call_response("Echo", '{"text": "hi"}'),
+                generate_message_response("done"),
+            ]
+        )
+        echo = make_action("Echo")
+
+        response = create_chat_loop(mock_create, FunctionsTransport())(
+            model="test",
+            messages=[{"role": "user", "content": "Hi!"}],
+            actions=[echo],
+            loop_guard=LoopGuard(max_repeated_calls=0),
+        )
+
+        self.assertEqual(response.choices[0].message.content, "done")
+        self.assertEqual(mock_create.call_args_list[0].kwargs["function_call"], "auto")
+        self.assertEqual(mock_create.call_args_list[2].kwargs["function_call"], "none")
+
+    def test_functions_transport_streamed_text(self):
+        mock_create = Mock(
+            side_effect=[
+                generate_stream(
+                    [
+                        ({"role": "assistant", "content": ""}, None),
+                        ({"content": "Hello"}, None),
+                        ({"content": "!"}, None),
+                        ({}, "stop"),
+                    ]
+                )
+            ]
+        )
+
+        response = create_chat_loop(mock_create, FunctionsTransport())(
+            model="test",
+            messages=[{"role": "user", "content": "Hi!"}],
+            actions=[make_action("Echo")],
+            stream=True,
+        )
+
+        self.assertEqual(
+            "".join(chunk.choices[0].delta.content or "" for chunk in response),
+            "Hello!",
+        )
+
+    def test_functions_transport_streamed_function_call(self):
+        mock_create = Mock(
+            side_effect=[
+                generate_stream(
+                    [
+                        (
+                            {
+                                "role": "assistant",
+                                "content": None,
+                                "function_call": {"name": "Echo", "arguments": ""},
+                            },
+                            None,
+                        ),
+                        ({"function_call": {"arguments": '{"text"'}}, None),
+                        ({"function_call": {"arguments": ': "hi"}'}}, None),
+                        ({}, "function_call"),
+                    ]
+                )
+            ]
+        )
+
+        response = create_chat_loop(mock_create, FunctionsTransport())(
+            model="test",
+            messages=[{"role": "user", "content": "Hi!"}],
+            actions=[make_action("Echo", stop=True)],
+            stream=True,
+        )
+
+        self.assertEqual(response, "hi")
+
+    def test_reserved_arguments(self):
+        for transport, argument in (
+            (ToolsTransport(), "tools"),
+            (FunctionsTransport(), "functions"),
+        ):
+            with self.assertRaises(FunctionCallingLoopException):
+                create_chat_loop(Mock(), transport)(
+                    model="test", messages=[], **{argument: []}
+                )
+
+    def test_truncated_answer_is_returned(self):
+        mock_create = Mock(side_effect=[generate_message_response("trunc", "length")])
+
+        response = create_chat_loop(mock_create, ToolsTransport())(
+            model="test", messages=[{"role": "user", "content": "Hi!"}]
+        )
+
+        mock_create.assert_called_once()
+        self.assertEqual(response.choices[0].message.content, "trunc")
+
+    def test_compact_schemas(self):
+        mock_create = Mock(side_effect=[generate_message_response("Hi")])
+
+        create_chat_loop(mock_create, ToolsTransport())(
+            model="test",
+            messages=[{"role": "user", "content": "Hi!"}],
+            actions=[make_action("Echo")],
+            compact_schemas=True,
+        )
+
+        parameters = mock_create.call_args.kwargs["tools"][0]["function"]["parameters"]
+        self.assertEqual(
+            parameters,
+            {
+                "properties": {"text": {"type": "string"}},
+                "required": ["text"],
+                "type": "object",
+            },
+        )
+
+    def test_conversation(self):
+        mock_create = Mock(
+            side_effect=[
+                generate_tool_call_response("Echo", '{"text": "hi"}'),
+                generate_message_response("Done"),
+            ]
+        )
+        conversation = Conversation([{"role": "user", "content": "Hi!"}])
+        fork = conversation.fork()
+
+        create_chat_loop(mock_create, ToolsTransport())(
+            model="test", messages=conversation, actions=[make_action("Echo")]
+        )
+
+        self.assertEqual(len(conversation), 3)
+        self.assertEqual(len(fork), 1)
+        # the assistant message object is sent in the wire format
+        self.assertEqual(
+            mock_create.call_args.kwargs["messages"],
+            [
+                {"role": "user", "content": "Hi!"},
+                {
+                    "role": "assistant",
+                    "tool_calls": [
+                        {
+                            "id": "call_1",
+                            "type": "function",
+                            "function": {"arguments": '{"text": "hi"}', "name": "Echo"},
+                        }
+                    ],
+                },
+                {
+                    "tool_call_id": "call_1",
+                    "role": "tool",
+                    "name": "Echo",
+                    "content": "hi",
+                },
+            ],
+        )
+
+    def test_extend(self):
+        transport = FunctionsTransport()
+        functions = transport.from_expr([make_action("Echo")])
+
+        extended = transport.extend(
+            functions, [make_action("Echo"), make_action("More")]
+        )
+        self.assertEqual(transport.names(extended), ["Echo", "More"])
+
+        # forced function calls are left untouched
+        forced = transport.from_expr(make_action("Echo"))
+        self.assertIs(transport.extend(forced, [make_action("More")]), forced)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,43 @@
+import unittest
+
+from actionweaver.llms.loop_guard import LoopGuard, canonical_arguments
+
+
+class TestLoopGuard(unittest.TestCase):
+    def test_canonical_arguments(self):
+        self.assertEqual(
+            canonical_arguments({"b": 1, "a": {"y": 2, "x": 1}}),
+            canonical_arguments({"a": {"x": 1, "y": 2}, "b": 1}),
+        )
+        self.assertNotEqual(
+            canonical_arguments({"a": 1}), canonical_arguments({"a": 2})
+        )
+
+    def test_memo_and_repeat_limit(self):
+        guard = LoopGuard(max_repeated_calls=1)
+        state = guard.new_state()
+
+        self.assertEqual(state.lookup("Search", {"q": "x"}), (False, None))
+        state.store("Search", {"q": "x"}, "result")
+
+        self.assertEqual(state.lookup("Search", {"q": "x"}), (True, "result"))
+        self.assertFalse(state.limit_reached(2))
+        self.assertEqual(state.lookup("Search", {"q": "x"}), (True, "result"))
+        self.assertTrue(state.limit_reached(3))
+        self.assertEqual(guard.stats["memo_hits"], 2)
+
+        # each loop has its own memo
+        self.assertEqual(guard.new_state().lookup("Search", {"q": "x"}), (False, None))
+
+    def test_max_iterations(self):
+        state = LoopGuard(max_iterations=3).new_state()
+        self.assertFalse(state.limit_reached(3))
+        self.assertTrue(state.limit_reached(4))
+
+    def test_invalid_on_limit(self):
+        with self.assertRaises(ValueError):
+            LoopGuard(on_limit="ignore")
+
+
+if __name__ == "__main__":
+    unittest.main()
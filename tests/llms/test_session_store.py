@@ -0,0 +1,89 @@
+import os
+import tempfile
+import unittest
+
+from actionweaver.actions.factories.function import action
+from actionweaver.llms.session_store import SessionStore, SessionStoreException
+from actionweaver.utils import DEFAULT_ACTION_SCOPE
+
+
+def get_time():
+    """Get the current time"""
+    return "12:00"
+
+
+def get_date():
+    """Get the current date"""
+    return "2024-01-01"
+
+
+class TestSessionStore(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.store = SessionStore(self.tmp.name)
+        self.actions = [action("GetTime")(get_time), action("GetDate")(get_date)]
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_resume(self):
+        session = self.store.open("user-42", actions=self.actions)
+        self.assertEqual(len(session.messages), 0)
+
+        session.messages += [
+            {"role": "user", "content": "what time is it"},
+            {"role": "assistant", "content": "12:00"},
+        ]
+        session.orch = {"GetTime": [self.actions[1]], DEFAULT_ACTION_SCOPE: None}
+        session.tracker.track_usage({"prompt_tokens": 10, "total_tokens": 12})
+        self.assertEqual(session.save(), 4)
+        # nothing changed since the last save
+        self.assertEqual(session.save(), 0)
+
+        session.messages += [{"role": "user", "content": "and the date?"}]
+        session.tracker.track_usage({"prompt_tokens": 20, "total_tokens": 25})
+        self.assertEqual(session.save(), 2)
+
+        resumed = SessionStore(self.tmp.name).open("user-42", actions=self.actions)
+        self.assertEqual(
+            [m["content"] for m in resumed.messages],
+            ["what time is it", "12:00", "and the date?"],
+        )
+        self.assertEqual(resumed.orch["GetTime"], [self.actions[1]])
+        self.assertEqual(resumed.tracker.tracker["total_tokens"], 37)
+        self.assertEqual(self.store.sessions(), ["user-42"])
+
+        with self.assertRaises(SessionStoreException):
+            self.store.open("user-42")
+
+    def test_compaction(self):
+        store = SessionStore(self.tmp.name, compact_every=5)
+        session = store.open("s")
+        for i in range(6):
+            session.messages.append({"role": "user", "content": str(i)})
+            session.save()
+
+        records = list(store.records("s"))
+        self.assertEqual([r["type"] for r in records], ["snapshot", "message"])
+        self.assertEqual(len(store.open("s").messages), 6)
+
+    def test_partial_line_is_dropped(self):
+        session = self.store.open("s")
+        session.messages.append({"role": "user", "content": "Hi"})
+        session.save()
+        with open(self.store.path("s"), "a") as f:
+            f.write('{"type": "message", "mess')
+
+        session = self.store.open("s")
+        self.assertEqual(len(session.messages), 1)
+        session.messages.append({"role": "user", "content": "Bye"})
+        session.save()
+        self.assertEqual(len(self.store.open("s").messages), 2)
+
+    def test_invalid_session_id(self):
+        with self.assertRaises(SessionStoreException):
+            self.store.open(os.path.join("..", "escape"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,108 @@
+from __future__ import annotations
+
+import unittest
+
+from actionweaver.llms.tool_output import (
+    HeadTailTruncation,
+    OutputLimit,
+    OutputLimiter,
+    OutputStore,
+    SpillToStore,
+    StructuredSummary,
+)
+
+
+class TestOutputLimiter(unittest.TestCase):
+    def test_small_outputs_are_unchanged(self):
+        limiter = OutputLimiter(max_chars=100)
+        self.assertEqual(limiter.render("Action", {"a": 1}), "{'a': 1}")
+        self.assertEqual(limiter.stats["limited_outputs"], 0)
+
+    def test_head_tail_truncation(self):
+        limiter = OutputLimiter(max_chars=50, strategy=HeadTailTruncation(0.5))
+        content = limiter.render("Action", "a" * 5 + "b" * 100 + "c" * 5)
+
+        # the marker is part of the budget
+        self.assertEqual(content, "aaaaabb\n... [96 characters truncated] ...\nbbccccc")
+        self.assertLessEqual(len(content), 50)
+        self.assertEqual(limiter.stats["limited_outputs"], 1)
+        self.assertEqual(limiter.stats["chars_saved"], 110 - len(content))
+
+        # slightly over the limit, the output never grows
+        self.assertEqual(len(limiter.render("Action", "x" * 51)), 50)
+        self.assertEqual(
+            OutputLimiter(max_chars=10).render("Action", "x" * 101), "x" * 10
+        )
+
+    def test_structured_summary(self):
+        limiter = OutputLimiter(max_chars=200, strategy=StructuredSummary(max_items=1))
+        rows = [{"id": i, "name": f"row{i}"} for i in range(100)]
+
+        self.assertEqual(
+            limiter.render("Query", rows),
+            'list with 100 items\nitem keys: id, name\nfirst 1 items: [{"id": 0, "name": "row0"}]',
+        )
+
+    def test_per_action_limits(self):
+        limiter = OutputLimiter(
+            max_chars=1000, per_action={"Small": OutputLimit(max_chars=5)}
+        )
+        self.assertEqual(limiter.render("Big", "x" * 100), "x" * 100)
+        self.assertNotEqual(limiter.render("Small", "x" * 100), "x" * 100)
+
+    def test_spill_to_store(self):
+        store = OutputStore(page_size=50)
+        limiter = OutputLimiter(max_chars=100, strategy=SpillToStore(store))
+        text = "".join(str(i % 10) for i in range(120))
+
+        content = limiter.render("Query", text)
+        self.assertTrue(content.startswith("[Output of Query has 120 characters"))
+
+        (read_action,) = limiter.actions()
+        self.assertEqual(read_action.name, "ReadToolOutput")
+
+        handle = content.split("stored as ")[1].split(" ")[0]
+        page = read_action(handle=handle, page=3)
+        self.assertEqual(page, "[page 3/3]\n" + text[100:])
+
+        # the notice alone exceeds `max_chars`, the LLM reads from the first page
+        self.assertIn("page 1 to read more", content)
+
+        # pages read by the LLM are not limited again
+        self.assertEqual(limiter.render("ReadToolOutput", "y" * 500), "y" * 500)
+
+    def test_spill_to_several_stores(self):
+        limiter = OutputLimiter(
+            per_action={
+                "A": OutputLimit(300, SpillToStore()),
+                "B": OutputLimit(300, SpillToStore()),
+            }
+        )
+        (read_action,) = limiter.actions()
+
+        for name in ("A", "B"):
+            content = limiter.render(name, name * 1000)
+            handle = content.split("stored as ")[1].split(" ")[0]
+            page = read_action(handle=handle, page=2)
+            self.assertTrue(page.startswith("[page 2/"), page)
+            self.assertIn(name * 10, page)
+
+    def test_spill_to_store_pages_by_max_chars(self):
+        store = OutputStore(page_size=4000)
+        limiter = OutputLimiter(max_chars=300, strategy=SpillToStore(store))
+        text = "".join(str(i % 10) for i in range(1000))
+
+        content = limiter.render("Query", text)
+        self.assertLessEqual(len(content), 300)
+        self.assertIn("page 2 to read more", content)
+
+        # the first page is sent whole, and every character can be read
+        handle = content.split("stored as ")[1].split(" ")[0]
+        read = content.split("]\n", 2)[2]
+        for page in range(2, store.pages(handle) + 1):
+            read += store.read(handle, page).split("\n", 1)[1]
+        self.assertEqual(read, text)
+
+
+if __name__ == "__main__":
+    unittest.main()
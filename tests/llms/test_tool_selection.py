@@ -0,0 +1,163 @@
+from __future__ import annotations
+
+import unittest
+
+from actionweaver.actions.factories.function import action
+from actionweaver.llms.tool_selection import BM25ToolSelector, tokenize
+
+
+def make_action(name, description):
+    def func(text: str):
+        return text
+
+    func.__doc__ = description
+    return action(name)(func)
+
+
+class TestBM25ToolSelector(unittest.TestCase):
+    def setUp(self):
+        self.actions = [
+            make_action("GetWeather", "Get the current weather for a location"),
+            make_action("SearchFlights", "Search flights between two airports"),
+            make_action("BookHotel", "Book a hotel room in a city"),
+            make_action("SendEmail", "Send an email to a recipient"),
+        ]
+
+    def test_tokenize(self):
+        self.assertEqual(
+            tokenize("GetCurrentWeather get_time"),
+            ["get", "current", "weather", "get", "time"],
+        )
+
+    def test_select_top_k(self):
+        selector = BM25ToolSelector(top_k=2)
+        messages = [
+            {"role": "system", "content": "You are a travel assistant"},
+            {"role": "user", "content": "What's the weather like in Paris?"},
+        ]
+        selected = selector.select(self.actions, messages)
+
+        self.assertEqual(len(selected), 2)
+        self.assertIn("GetWeather", [a.name for a in selected])
+
+    def test_select_uses_tool_messages(self):
+        selector = BM25ToolSelector(top_k=1)
+        messages = [
+            {"role": "user", "content": "Plan my trip"},
+            {
+                "role": "tool",
+                "name": "x",
+                "content": "now book a hotel",
+                "tool_call_id": "1",
+            },
+        ]
+        self.assertEqual(
+            [a.name for a in selector.select(self.actions, messages)], ["BookHotel"]
+        )
+
+    def test_select_keeps_all_when_under_top_k(self):
+        selector = BM25ToolSelector(top_k=10)
+        self.assertEqual(
+            selector.select(self.actions, [{"role": "user", "content": "hi"}]),
+            self.actions,
+        )
+
+    def test_index_is_built_once(self):
+        selector = BM25ToolSelector(top_k=1)
+        messages = [{"role": "user", "content": "send an email"}]
+        selector.select(self.actions, messages)
+        selector.select(self.actions, messages)
+        self.assertEqual(len(selector._indexes), 1)
+
+
+try:
+    import numpy  # noqa: F401
+
+    HAS_NUMPY = True
+except ImportError:
+    HAS_NUMPY = False
+
+
+VOCABULARY = ["weather", "flight", "hotel", "email"]
+
+
+def bag_of_words_embedding(texts):
+    return [[float(word in text.lower()) for word in VOCABULARY] for text in texts]
+
+
+@unittest.skipUnless(HAS_NUMPY, "numpy is not installed")
+class TestEmbeddingToolSelector(unittest.TestCase):
+    def setUp(self):
+        self.actions = [
+            make_action("GetWeather", "Get the current weather for a location"),
+            make_action("SearchFlights", "Search flight between two airports"),
+            make_action("BookHotel", "Book a hotel room in a city"),
+            make_action("SendEmail", "Send an email to a recipient"),
+        ]
+
+    def test_select_top_k(self):
+        from actionweaver.llms.tool_selection import EmbeddingToolSelector
+
+        selector = EmbeddingToolSelector(bag_of_words_embedding, top_k=2)
+        selected = selector.select(
+            self.actions,
+            [{"role": "user", "content": "Find a flight and a hotel in Rome"}],
+        )
+        self.assertEqual([a.name for a in selected], ["SearchFlights", "BookHotel"])
+
+    def test_embeddings_are_persisted(self):
+        import tempfile
+
+        from actionweaver.llms.tool_selection import EmbeddingToolSelector
+
+        calls = []
+
+        def embedding_function(texts):
+            calls.append(len(texts))
+            return bag_of_words_embedding(texts)
+
+        messages = [{"role": "user", "content": "send an email"}]
+        with tempfile.TemporaryDirectory() as cache_dir:
+            EmbeddingToolSelector(
+                embedding_function, top_k=1, cache_dir=cache_dir, model_name="bow"
+            ).select(self.actions, messages)
+            selected = EmbeddingToolSelector(
+                embedding_function, top_k=1, cache_dir=cache_dir, model_name="bow"
+            ).select(self.actions, messages)
+
+            self.assertEqual([a.name for a in selected], ["SendEmail"])
+            # the second selector loads action embeddings from disk and only embeds the query
+            self.assertEqual(calls, [1, 4, 1])
+
+            # another model doesn't use the cached embeddings
+            EmbeddingToolSelector(
+                embedding_function, top_k=1, cache_dir=cache_dir, model_name="other"
+            ).select(self.actions, messages)
+            self.assertEqual(calls, [1, 4, 1, 1, 4])
+
+            with self.assertRaises(ValueError):
+                EmbeddingToolSelector(embedding_function, cache_dir=cache_dir)
+
+    def test_cached_embeddings_of_another_dimension(self):
+        import tempfile
+
+        from actionweaver.llms.tool_selection import EmbeddingToolSelector
+
+        messages = [{"role": "user", "content": "send an email"}]
+        with tempfile.TemporaryDirectory() as cache_dir:
+            EmbeddingToolSelector(
+                lambda texts: [[1.0, 0.0] for _ in texts],
+                cache_dir=cache_dir,
+                model_name="bow",
+            ).select(self.actions, messages)
+
+            # same model name but the dimension changed, embeddings are recomputed
+            selected = EmbeddingToolSelector(
+                bag_of_words_embedding, top_k=1, cache_dir=cache_dir, model_name="bow"
+            ).select(self.actions, messages)
+
+        self.assertEqual([a.name for a in selected], ["SendEmail"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,50 @@
+"""Per-call overhead of `traceable`.
+
+Run with `python -m tests.telemetry.benchmark_traceable`.
+"""
+
+import logging
+import timeit
+
+from actionweaver.telemetry import traceable
+
+N = 100_000
+
+
+def get_current_weather(location, unit="fahrenheit", **kwargs):
+    return location
+
+
+def bench(label, func):
+    seconds = min(
+        timeit.repeat(lambda: func("Berlin", unit="celsius"), number=N, repeat=5)
+    )
+    print(f"{label:<32} {seconds / N * 1e6:8.2f} us/call")
+    return seconds / N
+
+
+def main():
+    enabled = logging.getLogger("actionweaver.benchmark.enabled")
+    enabled.addHandler(logging.NullHandler())
+    enabled.setLevel(logging.INFO)
+    enabled.propagate = False
+
+    disabled = logging.getLogger("actionweaver.benchmark.disabled")
+    disabled.setLevel(logging.WARNING)
+
+    baseline = bench("undecorated", get_current_weather)
+    traced = bench(
+        "traceable, level enabled",
+        traceable("GetCurrentWeather", enabled)(get_current_weather),
+    )
+    skipped = bench(
+        "traceable, level disabled",
+        traceable("GetCurrentWeather", disabled)(get_current_weather),
+    )
+
+    print(f"overhead enabled:  {(traced - baseline) * 1e6:8.2f} us/call")
+    print(f"overhead disabled: {(skipped - baseline) * 1e6:8.2f} us/call")
+
+
+if __name__ == "__main__":
+    main()
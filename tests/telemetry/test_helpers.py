@@ -1,9 +1,12 @@
+import inspect
 import logging
 import unittest
+import uuid
 from unittest import mock
 from unittest.mock import Mock
 
 from actionweaver.telemetry import get_parent_run_id, traceable
+from actionweaver.telemetry.helpers import _get_inputs, _InputsBinder, truncate_payload
 
 
 class TestTraceable(unittest.TestCase):
@@ -41,6 +44,9 @@ class TestTraceable(unittest.TestCase):
             mock_logger.log.call_args_list[0].args[1]["parent_run_id"], None
         )
         self.assertTrue("run_id" in mock_logger.log.call_args_list[0].args[1])
+        self.assertIsInstance(
+            mock_logger.log.call_args_list[0].args[1]["run_id"], uuid.UUID
+        )
 
     def test_traceable_with_exception(self):
         mock_logger = Mock()
@@ -253,3 +259,102 @@ class TestTraceable(unittest.TestCase):
             in mock_logger.log.call_args_list[0].args[1]["error"]
         )
         self.assertTrue("run_id" in mock_logger.log.call_args_list[1].args[1])
+
+    def test_traceable_skips_disabled_level(self):
+        logger = logging.getLogger("test_traceable_skips_disabled_level")
+        logger.setLevel(logging.WARNING)
+
+        with mock.patch.object(logger, "log") as mock_log:
+
+            @traceable("MockFunction", logger, level=logging.INFO)
+            def mock_method(number: int):
+                """mock method"""
+                return get_parent_run_id()
+
+            self.assertIsNone(mock_method(1))
+            mock_log.assert_not_called()
+
+    def test_inputs_binder_matches_signature_binding(self):
+        def f1(a, b=2, *args, c, d=4, **kwargs):
+            pass
+
+        def f2(self, a, /, b, *, c=3):
+            pass
+
+        def f3(*args, **kwargs):
+            pass
+
+        cases = [
+            (f1, (1,), {"c": 3}),
+            (f1, (1, 2, 3, 4), {"c": 3, "e": 5}),
+            (f1, (), {"a": 1, "c": 3}),
+            (f2, ("self", 1, 2), {}),
+            (f2, ("self", 1), {"b": 2, "c": 5}),
+            (f3, (1, 2), {"x": 1}),
+        ]
+        for func, args, kwargs in cases:
+            signature = inspect.signature(func)
+            self.assertEqual(
+                _InputsBinder(signature)(args, kwargs),
+                _get_inputs(signature, *args, **kwargs),
+            )
+
+    def test_traceable_sampling_is_all_or_nothing(self):
+        mock_logger = Mock()
+
+        @traceable("Child", mock_logger, level=logging.INFO)
+        def child(number: int):
+            """mock method"""
+            return number + 1
+
+        @traceable("Root", mock_logger, level=logging.INFO, sample_rate=0.5)
+        def root(number: int):
+            """mock method"""
+            return child(number) + 1
+
+        with mock.patch("actionweaver.telemetry.helpers.random.random") as rand:
+            rand.return_value = 0.9
+            self.assertEqual(root(1), 3)
+            self.assertEqual(len(mock_logger.log.call_args_list), 0)
+            self.assertIsNone(get_parent_run_id())
+
+            rand.return_value = 0.1
+            self.assertEqual(root(1), 3)
+            self.assertEqual(
+                [c.args[1]["name"] for c in mock_logger.log.call_args_list],
+                ["Child", "Root"],
+            )
+
+        # a child called outside of the sampled root is a root of its own
+        self.assertEqual(child(1), 2)
+        self.assertEqual(len(mock_logger.log.call_args_list), 3)
+
+    def test_traceable_truncates_payloads(self):
+        mock_logger = Mock()
+
+        @traceable("Echo", mock_logger, max_payload_chars=5, max_payload_items=2)
+        def echo(text, items):
+            """mock method"""
+            return text
+
+        self.assertEqual(echo("abcdefgh", [1, 2, 3]), "abcdefgh")
+
+        record = mock_logger.log.call_args_list[0].args[1]
+        self.assertEqual(
+            record["inputs"],
+            {
+                "text": "abcde... [3 chars truncated]",
+                "items": [1, 2, "... [1 items truncated]"],
+            },
+        )
+        self.assertEqual(record["outputs"], "abcde... [3 chars truncated]")
+
+    def test_truncate_payload(self):
+        self.assertEqual(
+            truncate_payload({"a": ("xyz" * 3, b"0123456789")}, 4),
+            {"a": ("xyzx... [5 chars truncated]", b"0123... [6 chars truncated]")},
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,89 @@
+import unittest
+import urllib.request
+
+from actionweaver.actions.factories.function import action
+from actionweaver.telemetry.metrics import (
+    ACTION_DURATION,
+    ACTION_ERRORS,
+    MetricsRegistry,
+)
+
+
+class TestMetrics(unittest.TestCase):
+    def test_counter(self):
+        registry = MetricsRegistry()
+        counter = registry.counter("errors_total", "Errors.", ["action"])
+        counter.inc(action="a")
+        counter.inc(2, action="a")
+
+        self.assertEqual(counter.value(action="a"), 3)
+        self.assertEqual(counter.value(action="b"), 0)
+        self.assertIs(registry.counter("errors_total", "Errors.", ["action"]), counter)
+        with self.assertRaises(ValueError):
+            counter.inc(model="m")
+        with self.assertRaises(ValueError):
+            registry.histogram("errors_total", "Errors.")
+
+    def test_histogram_prometheus_format(self):
+        registry = MetricsRegistry()
+        histogram = registry.histogram(
+            "latency_seconds", "Latency.", ["model"], buckets=[0.1, 1]
+        )
+        for value in (0.05, 0.1, 0.5, 3):
+            histogram.observe(value, model="gpt")
+
+        self.assertEqual(histogram.count(model="gpt"), 4)
+        self.assertAlmostEqual(histogram.sum(model="gpt"), 3.65)
+        self.assertEqual(
+            registry.render_prometheus().splitlines(),
+            [
+                "# HELP latency_seconds Latency.",
+                "# TYPE latency_seconds histogram",
+                'latency_seconds_bucket{model="gpt",le="0.1"} 2',
+                'latency_seconds_bucket{model="gpt",le="1"} 3',
+                'latency_seconds_bucket{model="gpt",le="+Inf"} 4',
+                'latency_seconds_sum{model="gpt"} 3.65',
+                'latency_seconds_count{model="gpt"} 4',
+            ],
+        )
+
+        registry.clear()
+        self.assertEqual(histogram.count(model="gpt"), 0)
+
+    def test_serve(self):
+        registry = MetricsRegistry()
+        registry.counter("calls_total", "Calls.").inc()
+
+        server = registry.serve(port=0)
+        try:
+            port = server.server_address[1]
+            with urllib.request.urlopen(f"http://127.0.0.1:{port}/metrics") as r:
+                body = r.read().decode()
+        finally:
+            server.shutdown()
+            server.server_close()
+        self.assertIn("calls_total 1", body)
+
+    def test_action_metrics(self):
+        @action("MetricsAdd")
+        def add(a: int, b: int):
+            """Add two numbers"""
+            return a + b
+
+        @action("MetricsFail")
+        def fail():
+            """Always fail"""
+            raise ValueError("boom")
+
+        count = ACTION_DURATION.count(action="MetricsAdd")
+        add(1, 2)
+        with self.assertRaises(ValueError):
+            fail()
+
+        self.assertEqual(ACTION_DURATION.count(action="MetricsAdd"), count + 1)
+        self.assertEqual(ACTION_ERRORS.value(action="MetricsFail"), 1)
+        self.assertEqual(ACTION_ERRORS.value(action="MetricsAdd"), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,93 @@
+import json
+import logging
+import os
+import tempfile
+import threading
+import unittest
+
+from actionweaver.telemetry import traceable
+from actionweaver.telemetry.sinks import (
+    BoundedQueueHandler,
+    JSONLHandler,
+    QueuedLogSink,
+)
+
+
+class BlockingHandler(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.unblock = threading.Event()
+        self.records = []
+
+    def emit(self, record):
+        self.unblock.wait()
+        self.records.append(record)
+
+
+class TestSinks(unittest.TestCase):
+    def test_bounded_queue_handler_drops_on_overflow(self):
+        handler = BoundedQueueHandler(maxsize=2)
+        logger = logging.getLogger("test_bounded_queue_handler_drops_on_overflow")
+        logger.propagate = False
+        logger.addHandler(handler)
+
+        for i in range(5):
+            logger.warning({"i": i})
+
+        self.assertEqual(handler.enqueued, 2)
+        self.assertEqual(handler.dropped, 3)
+        # records are not formatted on enqueue
+        self.assertEqual(handler.queue.get_nowait().msg, {"i": 0})
+
+    def test_slow_handler_does_not_block_traceable(self):
+        slow = BlockingHandler()
+        logger = logging.getLogger("test_slow_handler_does_not_block_traceable")
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
+
+        sink = QueuedLogSink([slow], maxsize=100)
+        sink.attach(logger)
+        with sink:
+
+            @traceable("Add", logger)
+            def add(a, b):
+                return a + b
+
+            self.assertEqual(add(1, 2), 3)
+            self.assertEqual(slow.records, [])
+            slow.unblock.set()
+
+        self.assertEqual(len(slow.records), 1)
+        self.assertEqual(slow.records[0].msg["outputs"], 3)
+        self.assertEqual(sink.stats["enqueued"], 1)
+        self.assertEqual(sink.stats["dropped"], 0)
+        self.assertEqual(logger.handlers, [])
+
+    def test_jsonl_handler(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "traces.jsonl")
+            logger = logging.getLogger("test_jsonl_handler")
+            logger.setLevel(logging.INFO)
+            logger.propagate = False
+
+            with QueuedLogSink([JSONLHandler(path)]) as sink:
+                sink.attach(logger)
+
+                @traceable("Echo", logger)
+                def echo(text):
+                    return {"text": text}
+
+                echo("hi")
+                logger.info("plain message")
+
+            with open(path) as f:
+                lines = [json.loads(line) for line in f]
+
+        self.assertEqual(lines[0]["name"], "Echo")
+        self.assertEqual(lines[0]["inputs"], {"text": "hi"})
+        self.assertEqual(lines[0]["outputs"], {"text": "hi"})
+        self.assertEqual(lines[1]["message"], "plain message")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,70 @@
+import time
+import unittest
+
+from actionweaver.actions.factories.function import action
+from actionweaver.telemetry import (
+    InMemorySpanExporter,
+    Tracer,
+    get_current_span,
+    start_span,
+)
+
+
+class TestSpans(unittest.TestCase):
+    def test_nested_spans(self):
+        exporter = InMemorySpanExporter()
+        tracer = Tracer(exporter)
+
+        with tracer.start_span("root", {"key": "value"}) as root:
+            self.assertIs(get_current_span(), root)
+            # the tracer of the current span is used when none is given
+            with start_span("child") as child:
+                time.sleep(0.01)
+        self.assertIsNone(get_current_span())
+
+        spans = exporter.get_finished_spans()
+        self.assertEqual([span.name for span in spans], ["child", "root"])
+        self.assertEqual(child.parent_span_id, root.span_id)
+        self.assertEqual(child.trace_id, root.trace_id)
+        self.assertEqual(root.status, "OK")
+        self.assertEqual(root.attributes, {"key": "value"})
+        self.assertEqual(root.self_time_ns, root.duration_ns - child.duration_ns)
+        self.assertLess(root.self_time_ns, child.duration_ns)
+
+    def test_error_status(self):
+        exporter = InMemorySpanExporter()
+        tracer = Tracer(exporter)
+
+        with self.assertRaises(ValueError):
+            with tracer.start_span("root"):
+                raise ValueError("boom")
+
+        (span,) = exporter.get_finished_spans()
+        self.assertEqual(span.status, "ERROR")
+        self.assertEqual(span.attributes["exception.type"], "ValueError")
+        self.assertEqual(span.attributes["exception.message"], "boom")
+
+    def test_no_tracer(self):
+        with start_span("noop") as span:
+            self.assertIsNone(span)
+
+    def test_action_span(self):
+        exporter = InMemorySpanExporter()
+
+        @action("Add")
+        def add(a: int, b: int):
+            """Add two numbers"""
+            return a + b
+
+        self.assertEqual(add(1, 2), 3)
+        with Tracer(exporter).start_span("root"):
+            self.assertEqual(add(1, 2), 3)
+
+        action_span, root = exporter.get_finished_spans()
+        self.assertEqual(action_span.name, "actionweaver.action")
+        self.assertEqual(action_span.attributes["actionweaver.action.name"], "Add")
+        self.assertEqual(action_span.parent_span_id, root.span_id)
+
+
+if __name__ == "__main__":
+    unittest.main()
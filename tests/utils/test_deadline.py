@@ -0,0 +1,47 @@
+import time
+import unittest
+
+from actionweaver.utils.deadline import (
+    Deadline,
+    DeadlineExceededException,
+    get_current_deadline,
+    remaining_time,
+    use_deadline,
+)
+
+
+class TestDeadline(unittest.TestCase):
+    def test_request_timeout_is_split_across_iterations(self):
+        deadline = Deadline(10, expected_iterations=4)
+        self.assertAlmostEqual(deadline.request_timeout(1), 2.5, places=2)
+        self.assertAlmostEqual(deadline.request_timeout(3), 5, places=2)
+        # past the expected iterations, a request gets all the time left
+        self.assertAlmostEqual(deadline.request_timeout(6), 10, places=2)
+        # a final request, e.g. without tools, gets all the time left
+        self.assertAlmostEqual(deadline.request_timeout(1, final=True), 10, places=2)
+
+    def test_check(self):
+        deadline = Deadline(0.01)
+        deadline.check()
+        time.sleep(0.02)
+        self.assertTrue(deadline.expired())
+        self.assertEqual(deadline.remaining(), 0)
+        with self.assertRaises(DeadlineExceededException):
+            deadline.check()
+
+    def test_nested_deadlines_only_tighten(self):
+        self.assertIsNone(remaining_time())
+        with use_deadline(1) as outer:
+            with use_deadline(10) as inner:
+                self.assertIs(inner, outer)
+            with use_deadline(None) as inner:
+                self.assertIs(inner, outer)
+            with use_deadline(0.5) as inner:
+                self.assertIs(get_current_deadline(), inner)
+                self.assertLessEqual(remaining_time(), 0.5)
+            self.assertIs(get_current_deadline(), outer)
+        self.assertIsNone(get_current_deadline())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,139 @@
+import unittest
+from typing import Optional
+
+from pydantic import BaseModel
+
+from actionweaver.actions.factories.function import action
+from actionweaver.utils.schema import (
+    compact_schema,
+    inline_defs,
+    schema_token_savings,
+)
+
+
+class Address(BaseModel):
+    city: str
+    zip: Optional[str] = None
+
+
+def get_weather(
+    location: str,
+    unit: str = "celsius",
+    days: Optional[int] = None,
+    address: Optional[Address] = None,
+):
+    """Get the weather"""
+
+
+class TestSchema(unittest.TestCase):
+    def test_compact_schema(self):
+        schema = action("GetWeather")(get_weather).json_schema(compact=True)
+
+        self.assertEqual(
+            schema,
+            {
+                "properties": {
+                    "location": {"type": "string"},
+                    "unit": {"default": "celsius", "type": "string"},
+                    "days": {"type": "integer"},
+                    "address": {
+                        "properties": {
+                            "city": {"type": "string"},
+                            "zip": {"type": "string"},
+                        },
+                        "required": ["city"],
+                        "type": "object",
+                    },
+                },
+                "required": ["location"],
+                "type": "object",
+            },
+        )
+
+    def test_required_nullable(self):
+        schema = {
+            "properties": {
+                "title": {
+                    "anyOf": [{"type": "string"}, {"type": "null"}],
+                    "title": "Title",
+                },
+                "ref": {"anyOf": [{"$ref": "#/$defs/A"}, {"type": "null"}]},
+            },
+            "required": ["title", "ref"],
+            "title": "Model",
+            "type": "object",
+        }
+
+        # a property named `title` is kept, a required nullable reference keeps its union
+        self.assertEqual(
+            compact_schema(schema)["properties"],
+            {
+                "title": {"type": ["string", "null"]},
+                "ref": {"anyOf": [{"$ref": "#/$defs/A"}, {"type": "null"}]},
+            },
+        )
+        self.assertIn("title", schema)
+
+    def test_inline_defs(self):
+        schema = {
+            "$defs": {
+                "Once": {
+                    "type": "object",
+                    "properties": {"p": {"$ref": "#/$defs/Point"}},
+                },
+                "Point": {"type": "object"},
+                "Node": {
+                    "type": "object",
+                    "properties": {"next": {"$ref": "#/$defs/Node"}},
+                },
+                "Unused": {"type": "object"},
+            },
+            "properties": {
+                "once": {"$ref": "#/$defs/Once", "description": "used once"},
+                "point": {"$ref": "#/$defs/Point"},
+                "node": {"$ref": "#/$defs/Node"},
+            },
+        }
+
+        # shared and recursive definitions stay in `$defs`
+        self.assertEqual(
+            inline_defs(schema),
+            {
+                "properties": {
+                    "once": {
+                        "type": "object",
+                        "properties": {"p": {"$ref": "#/$defs/Point"}},
+                        "description": "used once",
+                    },
+                    "point": {"$ref": "#/$defs/Point"},
+                    "node": {"$ref": "#/$defs/Node"},
+                },
+                "$defs": {
+                    "Point": {"type": "object"},
+                    "Node": {
+                        "type": "object",
+                        "properties": {"next": {"$ref": "#/$defs/Node"}},
+                    },
+                },
+            },
+        )
+
+    def test_cached_and_savings(self):
+        weather = action("GetWeather")(get_weather)
+        schema = weather.json_schema(compact=True)
+        self.assertEqual(schema, weather.json_schema(compact=True))
+
+        # callers get a copy of the cached schema
+        schema["properties"]["location"]["description"] = "changed"
+        self.assertNotIn(
+            "description",
+            weather.json_schema(compact=True)["properties"]["location"],
+        )
+
+        savings = schema_token_savings([weather])["GetWeather"]
+        self.assertGreater(savings["saved"], 0)
+        self.assertEqual(savings["before"] - savings["after"], savings["saved"])
+
+
+if __name__ == "__main__":
+    unittest.main()
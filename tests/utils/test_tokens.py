@@ -0,0 +1,224 @@
+import unittest
+
+from openai.types.chat.chat_completion_message import ChatCompletionMessage
+from openai.types.completion_usage import CompletionUsage
+
+from actionweaver.utils.tokens import (
+    ModelPrice,
+    PriceTable,
+    TokenEstimator,
+    TokenPreflightException,
+    TokenUsageTracker,
+    TokenUsageTrackerException,
+    call_tracker,
+    get_current_tracker,
+    token_budget,
+)
+
+
+class TestTokenUsageTracker(unittest.TestCase):
+    def test_track_usage_with_completion_usage(self):
+        tracker = TokenUsageTracker(budget=100)
+        tracker.track_usage(
+            CompletionUsage(completion_tokens=10, prompt_tokens=20, total_tokens=30)
+        )
+        self.assertEqual(tracker.tracker["total_tokens"], 30)
+        self.assertEqual(tracker.remaining(), 70)
+
+        with self.assertRaises(TokenUsageTrackerException):
+            tracker.track_usage(
+                {"completion_tokens": 50, "prompt_tokens": 50, "total_tokens": 100}
+            )
+
+    def test_price_table(self):
+        prices = PriceTable(
+            {
+                "gpt-4o": ModelPrice(prompt=2.5, completion=10, cached_prompt=1.25),
+                "gpt-4o-mini": ModelPrice(prompt=0.15, completion=0.6),
+            }
+        )
+        self.assertEqual(prices.price_for("gpt-4o-mini-2024-07-18").prompt, 0.15)
+        self.assertEqual(prices.price_for("gpt-4o-2024-08-06").prompt, 2.5)
+        self.assertIsNone(prices.price_for("claude"))
+
+        usage = {
+            "prompt_tokens": 1000,
+            "completion_tokens": 100,
+            "total_tokens": 1100,
+            "prompt_tokens_details": {"cached_tokens": 400},
+        }
+        self.assertAlmostEqual(
+            prices.cost("gpt-4o", usage), (600 * 2.5 + 400 * 1.25 + 100 * 10) / 1e6
+        )
+        self.assertEqual(prices.cost("claude", usage), 0)
+
+    def test_cost_budget_and_attribution(self):
+        tracker = TokenUsageTracker(
+            cost_budget=0.01,
+            price_table=PriceTable({"m": ModelPrice(prompt=1, completion=2)}),
+        )
+        usage = {"prompt_tokens": 1000, "completion_tokens": 500, "total_tokens": 1500}
+        tracker.track_usage(usage, model="m")
+        tracker.track_usage(usage, model="m", actions=["Search", "Fetch"])
+
+        self.assertAlmostEqual(tracker.cost, 0.004)
+        self.assertAlmostEqual(tracker.remaining_cost(), 0.006)
+        self.assertAlmostEqual(tracker.by_action["(request)"]["cost"], 0.002)
+        self.assertAlmostEqual(tracker.by_action["Search"]["cost"], 0.001)
+        self.assertEqual(tracker.by_action["Fetch"]["prompt_tokens"], 500)
+        self.assertEqual(tracker.by_action["Fetch"]["calls"], 1)
+
+        with self.assertRaises(TokenUsageTrackerException):
+            for _ in range(4):
+                tracker.track_usage(usage, model="m", actions=["Search"])
+
+    def test_nested_budgets(self):
+        usage = {"prompt_tokens": 40, "completion_tokens": 10, "total_tokens": 50}
+
+        with token_budget(budget=120) as tenant:
+            with token_budget(budget=1000) as request:
+                self.assertIs(get_current_tracker(), request)
+                self.assertIs(request.parent, tenant)
+                self.assertEqual(request.remaining(), 120)
+
+                request.child().track_usage(usage)
+                request.track_usage(usage)
+                self.assertEqual(tenant.tracker["total_tokens"], 100)
+                self.assertEqual(request.remaining(), 20)
+
+                # the tenant budget is enforced even though the request budget is not exceeded
+                with self.assertRaises(TokenUsageTrackerException):
+                    request.child().track_usage(usage)
+                self.assertEqual(tenant.tracker["total_tokens"], 150)
+        self.assertIsNone(get_current_tracker())
+
+    def test_parent_is_charged_the_child_cost(self):
+        usage = {"prompt_tokens": 1000, "completion_tokens": 0, "total_tokens": 1000}
+        prices = PriceTable({"m": ModelPrice(prompt=1.0, completion=2.0)})
+
+        parent = TokenUsageTracker(cost_budget=0.0015)
+        child = parent.child(price_table=prices)
+        child.track_usage(usage, model="m")
+        self.assertAlmostEqual(parent.cost, 0.001)
+
+        # the parent's cost budget is enforced without a price table of its own
+        with self.assertRaises(TokenUsageTrackerException):
+            child.track_usage(usage, model="m")
+
+    def test_call_tracker(self):
+        usage = {"prompt_tokens": 40, "completion_tokens": 10, "total_tokens": 50}
+        tracker = TokenUsageTracker()
+
+        with token_budget(budget=60) as budget:
+            child = call_tracker(tracker)
+            self.assertIs(child.parent, tracker)
+            self.assertEqual(child.remaining(), 60)
+            child.track_usage(usage)
+            # concurrent calls get their own child, the shared tracker is not changed
+            self.assertIsNot(call_tracker(tracker), child)
+            with self.assertRaises(TokenUsageTrackerException):
+                call_tracker(tracker).track_usage(usage)
+        self.assertIsNone(tracker.parent)
+        self.assertEqual(tracker.tracker["total_tokens"], 100)
+        self.assertEqual(budget.tracker["total_tokens"], 100)
+
+        # outside of a budget, or within its own budget, the tracker is used as is
+        self.assertIs(call_tracker(tracker), tracker)
+        with token_budget() as enclosing:
+            nested = enclosing.child()
+            self.assertIs(call_tracker(nested), nested)
+
+
+class TestTokenEstimator(unittest.TestCase):
+    def test_count_messages_is_incremental(self):
+        counted = []
+
+        def tokenizer(text):
+            counted.append(text)
+            return text.split()
+
+        estimator = TokenEstimator(tokenizer=tokenizer)
+        messages = [{"role": "user", "content": "what is the weather"}]
+        first = estimator.count_messages(messages)
+        self.assertEqual(first, 3 + 3 + 1 + 4)
+
+        messages += [
+            ChatCompletionMessage(
+                role="assistant",
+                content=None,
+                tool_calls=[
+                    {
+                        "id": "call_1",
+                        "type": "function",
+                        "function": {"name": "GetWeather", "arguments": "{}"},
+                    }
+                ],
+            )
+        ]
+        counted.clear()
+        second = estimator.count_messages(messages)
+
+        # only the new message is tokenized
+        self.assertEqual(counted, ["assistant", "GetWeather", "{}"])
+        self.assertEqual(second, first + 3 + 1 + 1 + 1)
+
+    def test_heuristic_tokenizer(self):
+        estimator = TokenEstimator()
+        self.assertEqual(estimator.count_text("a" * 9), 3)
+
+    def test_preflight_raises_on_context_window(self):
+        estimator = TokenEstimator(context_window=20)
+        with self.assertRaises(TokenPreflightException):
+            estimator.preflight([{"role": "user", "content": "x" * 200}])
+
+    def test_preflight_raises_on_remaining_budget(self):
+        tracker = TokenUsageTracker(budget=100)
+        tracker.track_usage({"total_tokens": 95})
+        estimator = TokenEstimator()
+        with self.assertRaises(TokenPreflightException):
+            estimator.preflight(
+                [{"role": "user", "content": "hello there"}], None, tracker
+            )
+
+    def test_preflight_trim_keeps_tool_call_pairs(self):
+        estimator = TokenEstimator(context_window=40, on_exceed="trim")
+        assistant = {
+            "role": "assistant",
+            "content": None,
+            "tool_calls": [
+                {
+                    "id": "call_1",
+                    "type": "function",
+                    "function": {"name": "Search", "arguments": "{}"},
+                }
+            ],
+        }
+        tool = {
+            "role": "tool",
+            "tool_call_id": "call_1",
+            "name": "Search",
+            "content": "r" * 80,
+        }
+        messages = [
+            {"role": "system", "content": "be brief"},
+            {"role": "user", "content": "u" * 80},
+            assistant,
+            tool,
+            {"role": "user", "content": "thanks"},
+        ]
+
+        trimmed = estimator.preflight(messages)
+
+        self.assertEqual(
+            trimmed,
+            [
+                {"role": "system", "content": "be brief"},
+                {"role": "user", "content": "thanks"},
+            ],
+        )
+        # caller's messages are untouched
+        self.assertEqual(len(messages), 5)
+
+
+if __name__ == "__main__":
+    unittest.main()